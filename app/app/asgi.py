@@ -12,5 +12,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+# Route the API to the async viewsets, see ASYNC_API in settings
+os.environ.setdefault('ASYNC_API', '1')
 
 application = get_asgi_application()
+
+# Connect the database threads before the first request needs them
+from core.concurrency import warm_db_pool  # noqa: E402
+
+warm_db_pool()
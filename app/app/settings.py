@@ -86,10 +86,33 @@ DATABASES = {
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        # Seconds a worker keeps its connection; 0 reconnects per request
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
     }
 }
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/3.2/topics/auth/passwords/
+
+PASSWORD_HASHERS = [
+    'core.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+# Hashing runs on a pool of WORKERS threads. Once MAX_PENDING hashes are
+# queued, callers wait up to QUEUE_TIMEOUT seconds and then get a 503.
+# Changing ITERATIONS rehashes each password on its next successful login.
+
+PASSWORD_HASHING = {
+    'ITERATIONS': int(os.environ.get('PASSWORD_ITERATIONS', 260000)),
+    'WORKERS': os.cpu_count() or 1,
+    'MAX_PENDING': 32,
+    'QUEUE_TIMEOUT': 5,
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -132,9 +155,106 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
 
+# Uploads are stored once per distinct content, see core.storage
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+
+# How core.views.serve_media delivers media files. Files under PREFIXES are
+# served only to the owner of a recipe using them, authenticated by API token
+# or session. With nginx in front, set BACKEND to 'x-accel-redirect' and add
+# an internal location, e.g.
+#     location /protected-media/ { internal; alias /vol/web/media/; }
+
+MEDIA_SERVE = {
+    'BACKEND': None,
+    'INTERNAL_PREFIX': '/protected-media/',
+    'PREFIXES': ('uploads/',),
+    'MAX_AGE': 365 * 24 * 60 * 60,
+}
+
+# Limits checked while recipe images stream in, before they are decoded
+
+RECIPE_IMAGE_UPLOAD = {
+    'MAX_BYTES': 10 * 2 ** 20,
+    'MAX_PIXELS': 40 * 10 ** 6,
+    'FORMATS': ('JPEG', 'PNG', 'WEBP', 'GIF'),
+    'PROBE_BYTES': 64 * 2 ** 10,
+}
+
+# Resized copies generated for recipe images by a pool of worker processes.
+# WORKERS = 0 renders them inline on the request thread.
+
+RECIPE_IMAGE_DERIVATIVES = {
+    'SIZES': (200, 800),
+    'FORMATS': ('JPEG', 'WEBP'),
+    'QUALITY': 85,
+    'WORKERS': 2,
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'core.User'
+
+# Django REST framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# ?q= autocomplete on tags and ingredients. Per-user name tries holding up
+# to TRIE_MAX_NAMES names in all (about 2 KiB each) can be kept in each
+# process; 0 always queries the database.
+
+AUTOCOMPLETE = {
+    'LIMIT': 10,
+    'MAX_LIMIT': 50,
+    'TRIGRAM_MIN_LENGTH': 3,
+    'TRIE_MAX_NAMES': 0,
+}
+
+# Async viewsets, used when served through app.asgi (which sets ASYNC_API=1).
+# Their database work runs on a pool of THREADS threads, each keeping one
+# connection open, so the pool doubles as a bounded connection pool.
+
+ASYNC_API = {
+    'ENABLED': os.environ.get('ASYNC_API') == '1',
+    'THREADS': 16,
+}
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# Point 'default' at a shared backend (Redis, Memcached) when running more
+# than one worker process.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Rendered recipe API responses. Set CACHE_ALIAS to None to disable.
+# manage.py response_cache_stats reports the hit ratio.
+
+RESPONSE_CACHE = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+# Token authentication cache
+# Resolved tokens are kept for TTL seconds in the CACHES entry CACHE_ALIAS,
+# which must be shared between worker processes, e.g. Redis, for a revoked
+# token to be rejected everywhere at once. Setting CACHE_ALIAS to None opts
+# into an LRU of MAX_SIZE entries in each process instead, only safe with a
+# single process: other processes accept a deleted token until its TTL.
+
+TOKEN_AUTH_CACHE = {
+    'MAX_SIZE': 10000,
+    'TTL': 300,
+    'CACHE_ALIAS': 'default',
+}
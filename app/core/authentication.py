@@ -0,0 +1,132 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from rest_framework.authentication import TokenAuthentication
+
+
+DEFAULT_TOKEN_AUTH_CACHE = {
+    'MAX_SIZE': 10000,
+    'TTL': 300,
+    'CACHE_ALIAS': 'default',
+}
+
+
+class TokenCache:
+    '''Cache of token key to (user, token) with a TTL
+
+    Entries are kept in a Django cache, so every worker process shares a
+    single lookup and sees invalidations as soon as they are made. Without
+    a cache alias a thread safe LRU in this process is used instead; it is
+    never told about a token deleted by another worker, which keeps being
+    accepted there until its entry expires, so it only suits a single
+    process.
+    '''
+
+    key_prefix = 'auth-token:'
+
+    def __init__(self, max_size, ttl, cache_alias=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.cache_alias = cache_alias
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        '''Return the shared Django cache, if one is configured'''
+        return caches[self.cache_alias] if self.cache_alias else None
+
+    def get(self, key):
+        '''Return the cached (user, token) pair or None'''
+        if self.shared is not None:
+            return self.shared.get(self.key_prefix + key)
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    return value
+                del self._entries[key]
+
+        return None
+
+    def set(self, key, value):
+        '''Cache a (user, token) pair for a token key'''
+        if self.shared is not None:
+            self.shared.set(self.key_prefix + key, value, self.ttl)
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (value, now + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        '''Forget a single token key'''
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.shared is not None:
+            self.shared.delete(self.key_prefix + key)
+
+    def delete_user(self, user_id, keys=()):
+        '''Forget every cached token belonging to a user
+
+        The local LRU is scanned directly; keys for the shared cache have to
+        be supplied by the caller since they cannot be enumerated.
+        '''
+        with self._lock:
+            stale = [
+                key for key, ((user, _), _) in self._entries.items()
+                if user.pk == user_id
+            ]
+            for key in stale:
+                del self._entries[key]
+        if self.shared is not None and keys:
+            self.shared.delete_many([self.key_prefix + key for key in keys])
+
+    def clear(self):
+        '''Forget all locally cached tokens'''
+        with self._lock:
+            self._entries.clear()
+
+
+_token_cache = None
+
+
+def get_token_cache():
+    '''Return the process wide token cache, building it from settings'''
+    global _token_cache
+    if _token_cache is None:
+        options = {
+            **DEFAULT_TOKEN_AUTH_CACHE,
+            **getattr(settings, 'TOKEN_AUTH_CACHE', {}),
+        }
+        _token_cache = TokenCache(
+            options['MAX_SIZE'], options['TTL'], options['CACHE_ALIAS']
+        )
+    return _token_cache
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    '''Token authentication that avoids the token/user query on cache hits'''
+
+    def authenticate_credentials(self, key):
+        token_cache = get_token_cache()
+        cached = token_cache.get(key)
+        if cached is None:
+            cached = super().authenticate_credentials(key)
+            token_cache.set(key, cached)
+
+        # Hand out a copy so one request cannot mutate another's user
+        user, token = cached
+        return (copy.copy(user), token)
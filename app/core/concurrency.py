@@ -0,0 +1,145 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.utils.decorators import classonlymethod
+
+from core.db import connect
+
+
+DEFAULT_ASYNC_API = {
+    'ENABLED': False,
+    # Threads running database work for the async views, each holding one
+    # persistent connection. 0 runs it on the thread Django uses for sync
+    # code, which is only meant for tests.
+    'THREADS': 16,
+}
+
+
+def get_async_options():
+    return {
+        **DEFAULT_ASYNC_API,
+        **getattr(settings, 'ASYNC_API', {}),
+    }
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_db_executor(threads):
+    '''Return the bounded thread pool that runs database work'''
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=threads, thread_name_prefix='db'
+            )
+
+    return _executor
+
+
+def warm_db_pool(timeout=10):
+    '''Open a connection on every thread of the database pool
+
+    Returns the futures without waiting, so startup is not held up; a
+    thread whose connection failed simply connects on its first call.
+    '''
+    options = get_async_options()
+    threads = options['THREADS']
+    if not (options['ENABLED'] and threads):
+        return []
+
+    # Holding each task at the barrier makes the pool start all its threads
+    barrier = threading.Barrier(threads, timeout=timeout)
+
+    def open_connection():
+        barrier.wait()
+        return connect()
+
+    executor = get_db_executor(threads)
+    return [executor.submit(open_connection) for _ in range(threads)]
+
+
+def _call_with_connection(func, args, kwargs):
+    try:
+        return func(*args, **kwargs)
+    finally:
+        # Pool threads keep their connection between calls, which caps the
+        # connections at THREADS, so only broken ones are closed here
+        for conn in connections.all():
+            if conn.connection is None:
+                continue
+            if conn.get_autocommit() != conn.settings_dict['AUTOCOMMIT']:
+                conn.close()
+            elif conn.errors_occurred:
+                if conn.is_usable():
+                    conn.errors_occurred = False
+                else:
+                    conn.close()
+
+
+async def run_db(func, *args, **kwargs):
+    '''Run a blocking callable that touches the database off the event loop'''
+    threads = get_async_options()['THREADS']
+    if not threads:
+        return await sync_to_async(func, thread_sensitive=True)(*args, **kwargs)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_db_executor(threads),
+        functools.partial(_call_with_connection, func, args, kwargs),
+    )
+
+
+class AsyncAPIViewMixin:
+    '''Dispatch a DRF view from the event loop
+
+    Authentication, permissions and sync handlers run through run_db, while
+    handlers written as coroutines are awaited directly and can issue
+    independent queries concurrently. Must come before the DRF view class.
+    '''
+
+    @classonlymethod
+    def as_view(cls, *args, **initkwargs):
+        view = super().as_view(*args, **initkwargs)
+
+        async def async_view(request, *args, **kwargs):
+            return await view(request, *args, **kwargs)
+
+        # Keeps cls, initkwargs, actions and csrf_exempt for DRF and routers
+        return functools.update_wrapper(async_view, view)
+
+    def dispatch(self, request, *args, **kwargs):
+        return self.async_dispatch(request, *args, **kwargs)
+
+    async def async_dispatch(self, request, *args, **kwargs):
+        '''Mirror of APIView.dispatch that awaits the handler'''
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await run_db(self.initial, request, *args, **kwargs)
+
+            method = request.method.lower()
+            if method in self.http_method_names:
+                handler = getattr(self, method, self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            if asyncio.iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await run_db(handler, request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
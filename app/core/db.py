@@ -0,0 +1,38 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+
+
+def connect(alias='default'):
+    '''Open and validate this thread's connection, returning the seconds taken
+
+    connections[alias] alone only builds the wrapper; ensure_connection()
+    opens the socket and the query proves the server is serving requests.
+    '''
+    start = time.perf_counter()
+    conn = connections[alias]
+    conn.ensure_connection()
+    with conn.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+
+    return time.perf_counter() - start
+
+
+def warm_connections(count, alias='default', keep=False):
+    '''Open count connections at once, returning how long each took to connect
+
+    Each connection belongs to its own short lived thread, so they are
+    closed again unless keep is set.
+    '''
+
+    def open_one(_):
+        try:
+            return connect(alias)
+        finally:
+            if not keep:
+                connections[alias].close()
+
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        return list(pool.map(open_one, range(count)))
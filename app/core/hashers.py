@@ -0,0 +1,134 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+DEFAULT_PASSWORD_HASHING = {
+    # None keeps Django's default work factor
+    'ITERATIONS': None,
+    # Threads hashing passwords; 0 hashes inline on the calling thread
+    'WORKERS': os.cpu_count() or 1,
+    # Hashes allowed to wait for a worker before callers are held back
+    'MAX_PENDING': 32,
+    # Seconds a caller waits for room in the queue before giving up
+    'QUEUE_TIMEOUT': 5,
+}
+
+
+def get_hashing_options():
+    return {
+        **DEFAULT_PASSWORD_HASHING,
+        **getattr(settings, 'PASSWORD_HASHING', {}),
+    }
+
+
+class PasswordHashingBusy(APIException):
+    '''Raised when the hashing queue stays full for QUEUE_TIMEOUT seconds'''
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many password checks in progress, try again shortly.'
+    default_code = 'password_hashing_busy'
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    '''PBKDF2 with the work factor taken from PASSWORD_HASHING
+
+    Hashes made with another iteration count still verify and are upgraded
+    by User.check_password on the next successful login.
+    '''
+
+    @property
+    def iterations(self):
+        return (
+            get_hashing_options()['ITERATIONS']
+            or hashers.PBKDF2PasswordHasher.iterations
+        )
+
+
+class HashingPool:
+    '''Bounded thread pool for password hashing
+
+    PBKDF2 releases the GIL, so WORKERS hashes run in parallel while the
+    semaphore caps the work queued behind them. A login burst then waits
+    for a bounded time and is turned away, instead of tying up every
+    request worker on hashing.
+    '''
+
+    def __init__(self, workers, max_pending, queue_timeout):
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='hasher'
+        )
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+
+    def run(self, func, *args):
+        '''Run func on the pool and return its result'''
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise PasswordHashingBusy()
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+        return future.result()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_hashing_pool():
+    '''Return the process wide hashing pool, or None to hash inline'''
+    global _pool
+    options = get_hashing_options()
+    if not options['WORKERS']:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = HashingPool(
+                options['WORKERS'], options['MAX_PENDING'], options['QUEUE_TIMEOUT']
+            )
+
+    return _pool
+
+
+def _run(func, *args):
+    pool = get_hashing_pool()
+    return func(*args) if pool is None else pool.run(func, *args)
+
+
+def _verify(raw_password, encoded):
+    rehashed = []
+    is_correct = hashers.check_password(
+        raw_password,
+        encoded,
+        setter=lambda raw: rehashed.append(hashers.make_password(raw)),
+    )
+
+    return is_correct, rehashed[0] if rehashed else None
+
+
+def make_password(raw_password):
+    '''Hash a password on the hashing pool'''
+    if raw_password is None:
+        # Unusable passwords involve no hashing
+        return hashers.make_password(None)
+
+    return _run(hashers.make_password, raw_password)
+
+
+def verify_password(raw_password, encoded):
+    '''Check a password on the hashing pool
+
+    Returns whether it matched and, when the stored hash uses outdated
+    settings, a fresh hash to save in its place.
+    '''
+    return _run(_verify, raw_password, encoded)
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.stats import check_stats, rebuild_stats, user_batches
+
+
+class Command(BaseCommand):
+    '''Django command to compare recipe summaries with the recipe tables'''
+
+    help = 'Report recipe summaries that drifted from the data, optionally fixing them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            help='Only check this user ID, may be repeated (default every user)',
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--fix', action='store_true', help='Rebuild the summaries that differ'
+        )
+
+    def handle(self, *args, **options):
+        checked = 0
+        stale = set()
+        for batch in user_batches(options['batch_size'], options['user']):
+            checked += len(batch)
+            for user_id, field, stored, expected in check_stats(batch):
+                stale.add(user_id)
+                self.stdout.write(
+                    f'User {user_id}: {field} is {stored!r}, expected {expected!r}'
+                )
+
+        if stale and options['fix']:
+            stale = sorted(stale)
+            size = options['batch_size']
+            for index in range(0, len(stale), size):
+                rebuild_stats(stale[index:index + size])
+            self.stdout.write(
+                self.style.SUCCESS(f'Rebuilt recipe stats for {len(stale)} users')
+            )
+        elif stale:
+            raise CommandError(
+                f'{len(stale)} of {checked} users have stale recipe stats'
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f'Recipe stats consistent for {checked} users')
+            )
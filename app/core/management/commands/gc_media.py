@@ -0,0 +1,73 @@
+import os
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+
+
+class Command(BaseCommand):
+    '''Django command to delete media files no recipe refers to'''
+
+    help = 'Delete recipe images and derivatives that are no longer referenced'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--prefix',
+            action='append',
+            help='Media directory to scan, may be repeated (default uploads/recipe)',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=3600,
+            help='Seconds since last use before an unreferenced file is deleted',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true', help='Report without deleting'
+        )
+
+    def handle(self, *args, **options):
+        referenced = self._referenced_names()
+        cutoff = time.time() - options['min_age']
+        removed = 0
+        reclaimed = 0
+
+        for prefix in options['prefix'] or ['uploads/recipe']:
+            root = default_storage.path(prefix)
+            for directory, _, filenames in os.walk(root):
+                for filename in filenames:
+                    path = os.path.join(directory, filename)
+                    name = os.path.relpath(path, default_storage.location)
+                    stat = os.stat(path)
+                    if name in referenced or stat.st_mtime > cutoff:
+                        continue
+
+                    removed += 1
+                    reclaimed += stat.st_size
+                    if not options['dry_run']:
+                        os.remove(path)
+
+        action = 'Would remove' if options['dry_run'] else 'Removed'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{action} {removed} unreferenced files, '
+                f'{reclaimed} bytes ({reclaimed / 2 ** 20:.1f} MiB)'
+            )
+        )
+
+    def _referenced_names(self):
+        '''Return every media name referenced by a recipe'''
+        referenced = set()
+        rows = (
+            Recipe.objects.exclude(image__isnull=True)
+            .exclude(image='')
+            .values_list('image', 'image_derivatives')
+            .iterator()
+        )
+        for image, derivatives in rows:
+            referenced.add(os.path.normpath(image))
+            referenced.update(os.path.normpath(name) for name in derivatives.values())
+
+        return referenced
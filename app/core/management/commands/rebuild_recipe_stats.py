@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.stats import rebuild_stats, user_batches
+
+
+class Command(BaseCommand):
+    '''Django command to recompute recipe summaries from the recipe tables'''
+
+    help = 'Recompute the per-user recipe summaries served by /recipes/stats/'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            help='Only rebuild this user ID, may be repeated (default every user)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Users aggregated and written per query',
+        )
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        users = 0
+        for batch in user_batches(options['batch_size'], options['user']):
+            rebuild_stats(batch)
+            users += len(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Rebuilt recipe stats for {users} users in '
+                f'{time.monotonic() - start:.2f}s'
+            )
+        )
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Ingredient, Tag
+
+
+class Command(BaseCommand):
+    '''Django command to recount the recipes of every tag and ingredient'''
+
+    help = 'Recompute Tag and Ingredient recipe_count from the recipe links'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            help='Only repair this user ID, may be repeated (default every user)',
+        )
+
+    def handle(self, *args, **options):
+        for model in (Tag, Ingredient):
+            queryset = model.objects.all()
+            if options['user']:
+                queryset = queryset.filter(user_id__in=options['user'])
+            repaired = queryset.repair_recipe_counts()
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Repaired {repaired} {model._meta.verbose_name_plural} '
+                    'with a wrong recipe_count'
+                )
+            )
@@ -1,20 +1,79 @@
 import time
 from django.db import connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+
+from core.db import connect, warm_connections
 
 
 class Command(BaseCommand):
     '''Django command to pause execution until database is available'''
 
+    help = 'Wait until the database accepts connections, then optionally warm them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument(
+            '--timeout', type=float, default=60, help='Seconds to wait before failing'
+        )
+        parser.add_argument('--initial-delay', type=float, default=0.1)
+        parser.add_argument('--max-delay', type=float, default=5)
+        parser.add_argument(
+            '--warm',
+            type=int,
+            default=0,
+            help='Open and validate this many connections at once once ready',
+        )
+
     def handle(self, *args, **options):
         self.stdout.write('Waiting for database...')
-        db_conn = None
-        while not db_conn:
+        alias = options['database']
+        start = time.monotonic()
+        delay = options['initial_delay']
+        attempts = 0
+        while True:
+            attempts += 1
             try:
-                db_conn = connections['default']
+                connect(alias)
+                break
             except OperationalError:
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
+                connections[alias].close()
+                elapsed = time.monotonic() - start
+                if elapsed + delay > options['timeout']:
+                    raise CommandError(
+                        f'Database unavailable after {elapsed:.1f}s ({attempts} attempts)'
+                    )
+                self.stdout.write(f'Database unavailable, waiting {delay:g} seconds...')
+                time.sleep(delay)
+                delay = min(delay * 2, options['max_delay'])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Database available! Ready after {time.monotonic() - start:.2f}s '
+                f'({attempts} attempts)'
+            )
+        )
+
+        if options['warm']:
+            self._warm(alias, options['warm'])
+
+    def _warm(self, alias, count):
+        conn_max_age = connections[alias].settings_dict['CONN_MAX_AGE']
+        if not conn_max_age:
+            self.stdout.write(
+                self.style.WARNING(
+                    'CONN_MAX_AGE is 0, so workers open a new connection per request'
+                )
+            )
+        try:
+            timings = warm_connections(count, alias)
+        except OperationalError as exc:
+            raise CommandError(f'Could only open some of {count} connections: {exc}')
 
-        self.stdout.write(self.style.SUCCESS('Database available!'))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Opened and validated {count} connections, '
+                f'{sum(timings) / count * 1000:.1f}ms average, '
+                f'{max(timings) * 1000:.1f}ms slowest'
+            )
+        )
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.25 on 2026-10-17 04:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def create_versions(apps, schema_editor):
+    User = apps.get_model('core', 'User')
+    CollectionVersion = apps.get_model('core', 'CollectionVersion')
+    CollectionVersion.objects.bulk_create(
+        [CollectionVersion(user_id=user_id) for user_id in User.objects.values_list('id', flat=True)],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CollectionVersion',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='core.user')),
+                ('version', models.PositiveBigIntegerField(default=1)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
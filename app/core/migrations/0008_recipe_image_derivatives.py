@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-17 04:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_collectionversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_derivatives',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+
+FORWARD = (
+    'ALTER TABLE core_recipe ADD COLUMN search_vector tsvector;',
+    "UPDATE core_recipe SET search_vector = to_tsvector('pg_catalog.english', title);",
+    'CREATE INDEX core_recipe_search_idx ON core_recipe USING gin (search_vector);',
+    # Kept up to date by the database so bulk_create() and update() are
+    # covered as well as save()
+    'CREATE TRIGGER core_recipe_search_vector_update '
+    'BEFORE INSERT OR UPDATE OF title ON core_recipe FOR EACH ROW '
+    "EXECUTE PROCEDURE tsvector_update_trigger(search_vector, 'pg_catalog.english', title);",
+)
+
+BACKWARD = (
+    'DROP TRIGGER core_recipe_search_vector_update ON core_recipe;',
+    'DROP INDEX core_recipe_search_idx;',
+    'ALTER TABLE core_recipe DROP COLUMN search_vector;',
+)
+
+
+def run_on_postgres(statements):
+    def run(apps, schema_editor):
+        # Other databases use the substring fallback in recipe.search
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_recipe_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_postgres(FORWARD), run_on_postgres(BACKWARD)),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 3.2.25 on 2026-10-17 05:09
+
+from django.db import migrations, models
+import django.db.models.expressions
+import django.db.models.functions.text
+
+
+TRIGRAM_FORWARD = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm;',
+    'CREATE INDEX core_tag_name_trgm_idx ON core_tag USING gin (name gin_trgm_ops);',
+    'CREATE INDEX core_ingr_name_trgm_idx ON core_ingredient USING gin (name gin_trgm_ops);',
+)
+
+TRIGRAM_BACKWARD = (
+    'DROP INDEX core_tag_name_trgm_idx;',
+    'DROP INDEX core_ingr_name_trgm_idx;',
+)
+
+
+def run_on_postgres(statements):
+    def run(apps, schema_editor):
+        # Trigram similarity is only used on Postgres, see recipe.autocomplete
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(django.db.models.expressions.F('user'), django.db.models.functions.text.Lower('name'), name='core_ingr_user_lower_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(django.db.models.expressions.F('user'), django.db.models.functions.text.Lower('name'), name='core_tag_user_lower_name_idx'),
+        ),
+        migrations.RunPython(
+            run_on_postgres(TRIGRAM_FORWARD), run_on_postgres(TRIGRAM_BACKWARD)
+        ),
+    ]
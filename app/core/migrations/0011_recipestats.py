@@ -0,0 +1,64 @@
+# Generated by Django 3.2.25 on 2026-10-17 05:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# TIME_BUCKETS as of this migration
+TIME_BUCKETS = (15, 30, 60)
+
+
+def bucket(time_minutes):
+    for index, upper in enumerate(TIME_BUCKETS):
+        if time_minutes <= upper:
+            return index
+
+    return len(TIME_BUCKETS)
+
+
+def create_stats(apps, schema_editor):
+    User = apps.get_model('core', 'User')
+    Recipe = apps.get_model('core', 'Recipe')
+    RecipeStats = apps.get_model('core', 'RecipeStats')
+    stats = {
+        user_id: RecipeStats(user_id=user_id, time_buckets=[0] * (len(TIME_BUCKETS) + 1))
+        for user_id in User.objects.values_list('id', flat=True)
+    }
+    for user_id, price, time_minutes in Recipe.objects.values_list('user_id', 'price', 'time_minutes').iterator():
+        row = stats[user_id]
+        row.recipe_count += 1
+        row.price_total += price
+        row.time_total += time_minutes
+        row.time_buckets[bucket(time_minutes)] += 1
+    for field_name, attname in (('tags', 'tag_counts'), ('ingredients', 'ingredient_counts')):
+        through = Recipe._meta.get_field(field_name).remote_field.through
+        target = Recipe._meta.get_field(field_name).m2m_reverse_field_name()
+        links = through.objects.values_list('recipe__user_id', f'{target}_id').iterator()
+        for user_id, object_id in links:
+            counts = getattr(stats[user_id], attname)
+            counts[str(object_id)] = counts.get(str(object_id), 0) + 1
+    RecipeStats.objects.bulk_create(stats.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_name_autocomplete_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='core.user')),
+                ('recipe_count', models.PositiveIntegerField(default=0)),
+                ('price_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('time_total', models.PositiveBigIntegerField(default=0)),
+                ('time_buckets', models.JSONField(default=list)),
+                ('tag_counts', models.JSONField(default=dict)),
+                ('ingredient_counts', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_stats, migrations.RunPython.noop),
+    ]
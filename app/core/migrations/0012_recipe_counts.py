@@ -0,0 +1,48 @@
+# Generated by Django 3.2.25 on 2026-10-17 05:17
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_recipes(apps, schema_editor):
+    Recipe = apps.get_model('core', 'Recipe')
+    for field_name, model_name in (('tags', 'Tag'), ('ingredients', 'Ingredient')):
+        field = Recipe._meta.get_field(field_name)
+        target = field.m2m_reverse_field_name()
+        links = (
+            field.remote_field.through.objects.filter(**{target: OuterRef('pk')})
+            .values(target)
+            .annotate(recipes=Count('*'))
+            .values('recipes')
+        )
+        apps.get_model('core', model_name).objects.update(recipe_count=Coalesce(Subquery(links), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_recipestats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_recipes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', '-recipe_count', 'id'], name='core_ingr_user_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', '-recipe_count', 'id'], name='core_tag_user_count_idx'),
+        ),
+    ]
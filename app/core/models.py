@@ -1,20 +1,29 @@
-import uuid
 import os
-from django.db import models
+import threading
+
+from django.db import models, router, transaction
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin,
 )
 from django.conf import settings
+from django.db.models import Case, Count, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest, Lower
+from django.utils import timezone
+
+from core import hashers
 
 
 def recipe_image_file_path(instance, filename):
-    '''Generate file path for new recipe image'''
+    '''Generate file path for new recipe image
+
+    The storage names the file after a digest of its content, keeping only
+    the directory and extension of this path.
+    '''
     ext = filename.split('.')[-1]
-    filename = f'{uuid.uuid4()}.{ext}'
 
-    return os.path.join('uploads/recipe/', filename)
+    return os.path.join('uploads/recipe/', f'image.{ext}')
 
 
 class UserManager(BaseUserManager):
@@ -50,8 +59,113 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     USERNAME_FIELD = 'email'
 
+    def set_password(self, raw_password):
+        '''Hash the password on the hashing pool'''
+        self.password = hashers.make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        '''Check the password on the hashing pool, upgrading stale hashes'''
+        is_correct, rehashed = hashers.verify_password(raw_password, self.password)
+        if rehashed:
+            self.password = rehashed
+            self._password = None
+            self.save(update_fields=['password'])
+
+        return is_correct
+
+
+class SummarisedQuerySet(models.QuerySet):
+    '''QuerySet whose delete() updates the recipe summaries it affects
+
+    The summaries are updated in the delete's transaction before its SQL
+    runs, so a failed delete rolls them back with it. Rows deleted by a
+    cascade from their user skip this, as the user's summary goes too.
+    '''
+
+    def record_delete(self):
+        '''Update the summaries for the rows about to be deleted'''
+        raise NotImplementedError
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            self.record_delete()
+            return super().delete()
+
+
+class SummarisedModel(models.Model):
+    '''Model whose delete() goes through SummarisedQuerySet.record_delete'''
+
+    class Meta:
+        abstract = True
+
+    def delete(self, using=None, keep_parents=False):
+        using = using or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            type(self).objects.using(using).filter(pk=self.pk).record_delete()
+            return super().delete(using, keep_parents)
+
+
+class RecipeAttrQuerySet(SummarisedQuerySet):
+    '''Queries for tags and ingredients, which keep a count of their recipes'''
+
+    def add_recipe_counts(self, changes, batch_size=500):
+        '''Add to recipe_count in the database, given {pk: change}
 
-class Tag(models.Model):
+        Each batch of objects is updated by one UPDATE relative to the stored
+        counts, so concurrent changes to a count cannot be lost. Counts stop
+        at zero: a race the link locks in core.signals do not cover, such as
+        a link removed while its recipe is deleted, leaves a count off until
+        repair_recipe_counts runs rather than failing the write.
+        '''
+        changes = [(pk, change) for pk, change in changes.items() if change]
+        for start in range(0, len(changes), batch_size):
+            batch = changes[start:start + batch_size]
+            change = Case(
+                *(When(pk=pk, then=Value(change)) for pk, change in batch),
+                output_field=models.IntegerField(),
+            )
+            self.filter(pk__in=[pk for pk, _ in batch]).update(
+                recipe_count=Greatest(F('recipe_count') + change, 0)
+            )
+
+    def repair_recipe_counts(self):
+        '''Recount recipes in one UPDATE, returning how many counts were wrong'''
+        field = self.model._meta.get_field('recipe')
+        links = (
+            field.through.objects.filter(
+                **{field.field.m2m_reverse_field_name(): OuterRef('pk')}
+            )
+            .values(field.field.m2m_reverse_field_name())
+            .annotate(recipes=Count('*'))
+            .values('recipes')
+        )
+        actual = Coalesce(Subquery(links), 0)
+
+        return (
+            self.alias(actual=actual)
+            .exclude(recipe_count=F('actual'))
+            .update(recipe_count=actual)
+        )
+
+    def record_delete(self):
+        # core.stats imports the models
+        from core import stats
+
+        field_name = self.model._meta.get_field('recipe').field.name
+        stats.record_dropped(field_name, self)
+
+
+class RecipeQuerySet(SummarisedQuerySet):
+    '''Queries for recipes, which are counted in their user's summary'''
+
+    def record_delete(self):
+        from core import stats
+
+        stats.record_deleted(self)
+
+
+class Tag(SummarisedModel):
     '''Tag to be used for a recipe'''
 
     name = models.CharField(max_length=255)
@@ -59,22 +173,53 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    # Recipes linked to the tag, kept up to date by core.signals
+    recipe_count = models.PositiveIntegerField(default=0)
+
+    objects = RecipeAttrQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'name'], name='core_tag_user_name_idx'),
+            # Case insensitive prefix lookups for autocomplete
+            models.Index(
+                F('user'), Lower('name'), name='core_tag_user_lower_name_idx'
+            ),
+            # Most used first, in the cursor pagination order
+            models.Index(
+                fields=['user', '-recipe_count', 'id'], name='core_tag_user_count_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
 
-class Ingredient(models.Model):
+class Ingredient(SummarisedModel):
     """Ingredient to be used in a recipe"""
 
     name = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    recipe_count = models.PositiveIntegerField(default=0)
+
+    objects = RecipeAttrQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'name'], name='core_ingr_user_name_idx'),
+            models.Index(
+                F('user'), Lower('name'), name='core_ingr_user_lower_name_idx'
+            ),
+            models.Index(
+                fields=['user', '-recipe_count', 'id'], name='core_ingr_user_count_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
 
-class Recipe(models.Model):
+class Recipe(SummarisedModel):
     '''Recipe object'''
 
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -85,6 +230,131 @@ class Recipe(models.Model):
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    # Resized copies of image, keyed by e.g. '200_webp', filled in once the
+    # background workers have generated them
+    image_derivatives = models.JSONField(default=dict, blank=True)
+
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='core_recipe_user_id_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.title
+
+
+class CollectionVersionManager(models.Manager):
+    def current(self, user):
+        '''Return the collection version for a user, creating it if needed'''
+        version, _ = self.get_or_create(user=user)
+
+        return version
+
+    def bump(self, user_id):
+        '''Mark a user's recipe data as changed'''
+        # Every user gets a row when created (core.signals, and migration
+        # 0007 for existing users). A user inserted without signals has none
+        # until current() creates it, and until then there is nothing to bump
+        self.filter(user_id=user_id).update(
+            version=F('version') + 1, updated_at=timezone.now()
+        )
+
+    def bump_many(self, user_ids):
+        '''Mark several users' recipe data as changed in one query'''
+        self.filter(user_id__in=user_ids).update(
+            version=F('version') + 1, updated_at=timezone.now()
+        )
+
+    def bump_on_commit(self, user_id, using=None):
+        '''Mark a user's recipe data as changed once the transaction commits
+
+        Users are collected per connection and bumped by one query when the
+        transaction commits, so a bulk or cascading delete does not update
+        the same row once per deleted object. Outside a transaction the bump
+        is immediate.
+        '''
+        connection = transaction.get_connection(using)
+        if not connection.in_atomic_block:
+            self.bump(user_id)
+            return
+
+        vars(_pending_bumps).setdefault(connection.alias, set()).add(user_id)
+        # A callback is registered for every change, so rolling back a
+        # savepoint cannot take the only one with it; the first to run bumps
+        # every collected user and the rest find nothing left. Users left
+        # over from a rolled back transaction get one extra, harmless bump.
+        transaction.on_commit(lambda: self._bump_pending(connection.alias), using)
+
+    def _bump_pending(self, alias):
+        user_ids = vars(_pending_bumps).pop(alias, None)
+        if user_ids:
+            self.bump_many(user_ids)
+
+
+# User IDs waiting for bump_on_commit's callbacks, by connection alias; per
+# thread, as Django's connections are
+_pending_bumps = threading.local()
+
+
+class CollectionVersion(models.Model):
+    '''Counter bumped whenever a user's tags, ingredients or recipes change'''
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True
+    )
+    version = models.PositiveBigIntegerField(default=1)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    objects = CollectionVersionManager()
+
+    def __str__(self):
+        return f'{self.user_id}:{self.version}'
+
+
+# Upper bounds, in minutes, of the preparation time ranges counted by
+# RecipeStats; the last range is open ended
+TIME_BUCKETS = (15, 30, 60)
+
+
+class RecipeStats(models.Model):
+    '''Summary of a user's recipes, kept up to date by core.stats'''
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True
+    )
+    recipe_count = models.PositiveIntegerField(default=0)
+    price_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    time_total = models.PositiveBigIntegerField(default=0)
+    # Recipes per TIME_BUCKETS range
+    time_buckets = models.JSONField(default=list)
+    # Recipes per tag and ingredient ID
+    tag_counts = models.JSONField(default=dict)
+    ingredient_counts = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.user_id}:{self.recipe_count}'
+
+
+class ImportCheckpoint(models.Model):
+    '''Progress of an import_recipes run, committed along with each batch'''
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # Absolute path of the imported file
+    source = models.CharField(max_length=1024)
+    # Bytes and records of the file covered by the committed batches
+    offset = models.PositiveBigIntegerField(default=0)
+    rows = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'source'], name='core_importcheckpoint_user_source'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.source}@{self.offset}'
@@ -0,0 +1,114 @@
+import csv
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+# Line and paragraph separators are valid JSON but not valid JavaScript
+UNSAFE_CHARACTERS = (
+    ('\u2028'.encode(), b'\\u2028'),
+    ('\u2029'.encode(), b'\\u2029'),
+)
+
+_encoder = JSONEncoder()
+
+
+def _default(obj):
+    '''Encode the types orjson does not handle the way DRF does'''
+    return _encoder.default(obj)
+
+
+def encode_json(data):
+    '''Encode data as compact UTF-8 JSON bytes
+
+    Uses orjson when it is installed and the standard library encoder
+    otherwise. Types outside plain JSON, such as the Decimal prices on
+    recipes and datetimes, are encoded exactly as DRF's encoder would.
+    '''
+    if orjson is not None:
+        content = orjson.dumps(
+            data,
+            default=_default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        )
+    else:
+        content = _encoder.__class__(
+            ensure_ascii=False, separators=(',', ':')
+        ).encode(data).encode()
+
+    for character, escaped in UNSAFE_CHARACTERS:
+        if character in content:
+            content = content.replace(character, escaped)
+
+    return content
+
+
+class FastJSONRenderer(JSONRenderer):
+    '''JSON renderer that encodes compact responses with orjson'''
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if data is None or indent is not None or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return encode_json(data)
+
+
+def encode_csv_value(value):
+    '''Return a value as CSV cell text, with lists as JSON arrays'''
+    if value is None:
+        return ''
+    if isinstance(value, (list, tuple, dict)):
+        return encode_json(value).decode()
+
+    return str(value)
+
+
+class _Line:
+    '''File-like object returning what csv.writer writes to it'''
+
+    def write(self, value):
+        return value
+
+
+def csv_writer():
+    '''Return a csv writer whose writerow() returns the encoded line'''
+    return csv.writer(_Line())
+
+
+class NDJSONRenderer(BaseRenderer):
+    '''Newline delimited JSON, one object per line'''
+
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+
+        return b''.join(encode_json(row) + b'\n' for row in rows)
+
+
+class CSVRenderer(BaseRenderer):
+    '''CSV with a header row taken from the first object's keys'''
+
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not data:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        writer = csv_writer()
+        lines = [writer.writerow(list(rows[0]))]
+        lines += [writer.writerow([encode_csv_value(v) for v in row.values()]) for row in rows]
+
+        return ''.join(lines).encode()
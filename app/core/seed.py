@@ -0,0 +1,81 @@
+import random
+import uuid
+
+from django.contrib.auth import get_user_model
+
+from core.models import Tag, Ingredient, Recipe
+from core.stats import rebuild_stats
+
+
+def seed_user_data(
+    user, recipes=100, attrs=20, attrs_per_recipe=3, batch_size=1000, rng=None
+):
+    '''Bulk create tags, ingredients and recipes owned by a single user'''
+    rng = rng or random.Random(user.pk)
+
+    Tag.objects.bulk_create(
+        [Tag(user=user, name=f'Tag {i}') for i in range(attrs)],
+        batch_size=batch_size,
+    )
+    Ingredient.objects.bulk_create(
+        [Ingredient(user=user, name=f'Ingredient {i}') for i in range(attrs)],
+        batch_size=batch_size,
+    )
+    Recipe.objects.bulk_create(
+        [
+            Recipe(
+                user=user,
+                title=f'Recipe {i}',
+                time_minutes=rng.randint(5, 120),
+                price=rng.randint(100, 99999) / 100,
+            )
+            for i in range(recipes)
+        ],
+        batch_size=batch_size,
+    )
+
+    # bulk_create does not return primary keys on every backend
+    tag_ids = list(Tag.objects.filter(user=user).values_list('id', flat=True))
+    ingredient_ids = list(
+        Ingredient.objects.filter(user=user).values_list('id', flat=True)
+    )
+    recipe_ids = list(Recipe.objects.filter(user=user).values_list('id', flat=True))
+
+    per_recipe = min(attrs_per_recipe, attrs)
+    TagThrough = Recipe.tags.through
+    IngredientThrough = Recipe.ingredients.through
+    TagThrough.objects.bulk_create(
+        [
+            TagThrough(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in rng.sample(tag_ids, per_recipe)
+        ],
+        batch_size=batch_size,
+    )
+    IngredientThrough.objects.bulk_create(
+        [
+            IngredientThrough(recipe_id=recipe_id, ingredient_id=ingredient_id)
+            for recipe_id in recipe_ids
+            for ingredient_id in rng.sample(ingredient_ids, per_recipe)
+        ],
+        batch_size=batch_size,
+    )
+    # None of the bulk inserts above sent signals
+    Tag.objects.filter(user=user).repair_recipe_counts()
+    Ingredient.objects.filter(user=user).repair_recipe_counts()
+    rebuild_stats([user.pk])
+
+
+def seed_users(count, **kwargs):
+    '''Create users with seeded recipe data and return them'''
+    prefix = uuid.uuid4().hex[:8]
+    users = []
+    for i in range(count):
+        user = get_user_model()(email=f'seed-{prefix}-{i}@example.com')
+        # Skip password hashing, seeded users never log in
+        user.set_unusable_password()
+        user.save()
+        seed_user_data(user, **kwargs)
+        users.append(user)
+
+    return users
@@ -0,0 +1,181 @@
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from core import stats
+from core.authentication import get_token_cache
+from core.models import CollectionVersion, Ingredient, Recipe, RecipeStats, Tag
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, using, **kwargs):
+    '''Drop a deleted token from the authentication cache'''
+    # The key is the primary key, which the delete clears afterwards
+    key = instance.key
+    # After the commit, or a request could cache the token again in between
+    transaction.on_commit(lambda: get_token_cache().delete(key), using)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def create_collection_version(sender, instance, created, **kwargs):
+    '''Start every new user with a collection version'''
+    if created:
+        CollectionVersion.objects.create(user=instance)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def create_recipe_stats(sender, instance, created, **kwargs):
+    '''Start every new user with an empty recipe summary'''
+    if created:
+        RecipeStats.objects.create(user=instance, **stats.empty_stats())
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_tokens(sender, instance, created, using, **kwargs):
+    '''Drop cached tokens when a user changes or is deactivated'''
+    if created:
+        return
+
+    def invalidate():
+        token_cache = get_token_cache()
+        keys = ()
+        if token_cache.shared is not None:
+            keys = Token.objects.using(using).filter(user=instance).values_list(
+                'key', flat=True
+            )
+        token_cache.delete_user(instance.pk, keys)
+
+    # After the commit, or a request could cache the old user in between
+    transaction.on_commit(invalidate, using)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+def bump_collection_version(sender, instance, using, **kwargs):
+    '''Invalidate conditional GETs when a user's recipe data changes'''
+    CollectionVersion.objects.bump_on_commit(instance.user_id, using)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def bump_collection_version_m2m(sender, instance, action, using, **kwargs):
+    '''Invalidate conditional GETs when recipe relations change'''
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        CollectionVersion.objects.bump_on_commit(instance.user_id, using)
+
+
+# Recipe fields summarised by RecipeStats, in StatsDelta argument order
+SUMMARISED = ('price', 'time_minutes')
+
+
+def _stored_values(recipe):
+    '''Return a recipe's summarised values as stored, or None if it is not'''
+    return Recipe.objects.filter(pk=recipe.pk).values_list(*SUMMARISED).first()
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_recipe_values(sender, instance, update_fields, **kwargs):
+    '''Read the values an update overwrites, to diff against after the save
+
+    The database rather than the instance is asked, since the instance may
+    be stale or have been loaded with these fields deferred.
+    '''
+    instance._stats_old = None
+    if instance._state.adding:
+        return
+    if update_fields is None or not set(SUMMARISED).isdisjoint(update_fields):
+        instance._stats_old = _stored_values(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def update_stats_on_save(sender, instance, created, update_fields, **kwargs):
+    '''Count a new recipe, or the change to a saved one, in the summary'''
+    delta = stats.StatsDelta()
+    if created:
+        delta.add_recipe(*(getattr(instance, name) for name in SUMMARISED))
+    else:
+        old = instance.__dict__.pop('_stats_old', None)
+        if old is None:
+            return
+        # Deferred fields and those left out of update_fields were not written
+        new = tuple(
+            getattr(instance, name)
+            if name in instance.__dict__
+            and (update_fields is None or name in update_fields)
+            else value
+            for name, value in zip(SUMMARISED, old)
+        )
+        if new == old:
+            return
+        delta.add_values(*old, sign=-1)
+        delta.add_values(*new)
+    stats.apply_delta(instance.user_id, delta)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_counts_on_m2m(sender, instance, action, reverse, pk_set, using, **kwargs):
+    '''Count recipes linked to and unlinked from tags and ingredients
+
+    Both the user's summary and the recipe_count of the tags or ingredients
+    are updated. Before a change the tags or ingredients concerned are
+    locked and the links that really change are looked up, so a concurrent
+    add or remove of the same link waits and then finds it already done.
+    '''
+    field_name = 'tags' if sender is Recipe.tags.through else 'ingredients'
+    field = Recipe._meta.get_field(field_name)
+    # Links are always counted from the instance's side
+    source, other = field.m2m_field_name(), field.m2m_reverse_field_name()
+    if reverse:
+        source, other = other, source
+
+    if action in ('pre_add', 'pre_remove', 'pre_clear'):
+        links = sender.objects.filter(**{source: instance.pk})
+        if action != 'pre_clear':
+            links = links.filter(**{f'{other}__in': pk_set})
+        if connections[using].features.has_select_for_update:
+            if reverse:
+                locked = [instance.pk]
+            elif action == 'pre_clear':
+                locked = links.values(f'{other}_id')
+            else:
+                locked = pk_set
+            list(
+                field.related_model.objects.select_for_update()
+                .filter(pk__in=locked)
+                .order_by('pk')
+                .values_list('pk')
+            )
+        linked = set(links.values_list(f'{other}_id', flat=True))
+        instance._stats_changed = pk_set - linked if action == 'pre_add' else linked
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    changed = instance.__dict__.pop('_stats_changed', ())
+    if not changed:
+        return
+
+    sign = 1 if action == 'post_add' else -1
+    delta = stats.StatsDelta()
+    if reverse:
+        delta.link(field_name, instance.pk, sign * len(changed))
+        field.related_model.objects.add_recipe_counts({instance.pk: sign * len(changed)})
+    else:
+        for object_id in changed:
+            delta.link(field_name, object_id, sign)
+        field.related_model.objects.add_recipe_counts(
+            {object_id: sign for object_id in changed}
+        )
+    stats.apply_delta(instance.user_id, delta)
@@ -0,0 +1,308 @@
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.db import connections, transaction
+from django.db.backends.utils import format_number
+from django.db.models import Count, DecimalField, Q, Sum
+
+from core.models import TIME_BUCKETS, CollectionVersion, Recipe, RecipeStats, User
+
+
+# Summary fields compared by the consistency check and written by rebuilds
+STATS_FIELDS = (
+    'recipe_count',
+    'price_total',
+    'time_total',
+    'time_buckets',
+    'tag_counts',
+    'ingredient_counts',
+)
+
+# Recipe relations whose per-object recipe counts are summarised
+RELATION_COUNTS = {'tags': 'tag_counts', 'ingredients': 'ingredient_counts'}
+
+CENT = Decimal('0.01')
+
+
+def normalize_price(value):
+    '''Return a price rounded the way the database stores it'''
+    field = Recipe._meta.get_field('price')
+    return Decimal(
+        format_number(field.to_python(value), field.max_digits, field.decimal_places)
+    )
+
+
+def time_bucket(time_minutes):
+    '''Return the index of the TIME_BUCKETS range a preparation time is in'''
+    for index, upper in enumerate(TIME_BUCKETS):
+        if time_minutes <= upper:
+            return index
+
+    return len(TIME_BUCKETS)
+
+
+class StatsDelta:
+    '''Changes to apply to one user's RecipeStats row'''
+
+    def __init__(self):
+        self.recipe_count = 0
+        self.price_total = Decimal(0)
+        self.time_total = 0
+        self.time_buckets = Counter()
+        self.counts = {name: Counter() for name in RELATION_COUNTS}
+        self.dropped = {name: set() for name in RELATION_COUNTS}
+
+    def add_recipe(self, price, time_minutes, sign=1):
+        '''Count a recipe in (sign=1) or out (sign=-1) of the summary'''
+        self.recipe_count += sign
+        self.add_values(price, time_minutes, sign)
+
+    def add_values(self, price, time_minutes, sign=1):
+        '''Count a recipe's price and time without changing the recipe count'''
+        self.price_total += sign * normalize_price(price)
+        self.time_total += sign * time_minutes
+        self.time_buckets[time_bucket(time_minutes)] += sign
+
+    def link(self, field_name, object_id, count=1):
+        '''Count recipes newly linked to (or unlinked from) a tag or ingredient'''
+        self.counts[field_name][str(object_id)] += count
+
+    def drop(self, field_name, object_id):
+        '''Forget a deleted tag or ingredient'''
+        self.dropped[field_name].add(str(object_id))
+
+    def add_summary(self, summary, sign=1):
+        '''Count the recipes of a summary, as from aggregate_stats, in or out'''
+        self.recipe_count += sign * summary['recipe_count']
+        self.price_total += sign * summary['price_total']
+        self.time_total += sign * summary['time_total']
+        for index, count in enumerate(summary['time_buckets']):
+            self.time_buckets[index] += sign * count
+        for field_name, attname in RELATION_COUNTS.items():
+            for object_id, count in summary[attname].items():
+                self.counts[field_name][object_id] += sign * count
+
+
+def apply_delta(user_id, delta):
+    '''Apply a delta to a user's summary row
+
+    The row is locked for the update, so concurrent writes for the same
+    user are serialised. Nothing is created: users get their row when they
+    are created, so a missing row means the user is being deleted.
+    '''
+    with transaction.atomic():
+        stats = RecipeStats.objects.select_for_update().filter(user_id=user_id).first()
+        if stats is None:
+            return
+
+        stats.recipe_count += delta.recipe_count
+        stats.price_total += delta.price_total
+        stats.time_total += delta.time_total
+        buckets = list(stats.time_buckets) or [0] * (len(TIME_BUCKETS) + 1)
+        for index, count in delta.time_buckets.items():
+            buckets[index] += count
+        stats.time_buckets = buckets
+        for field_name, attname in RELATION_COUNTS.items():
+            counts = Counter(getattr(stats, attname))
+            counts.update(delta.counts[field_name])
+            setattr(
+                stats,
+                attname,
+                {
+                    key: count
+                    for key, count in counts.items()
+                    if count > 0 and key not in delta.dropped[field_name]
+                },
+            )
+        stats.save()
+
+
+def record_created(recipes):
+    '''Count recipes inserted without post_save signals'''
+    deltas = defaultdict(StatsDelta)
+    for recipe in recipes:
+        deltas[recipe.user_id].add_recipe(recipe.price, recipe.time_minutes)
+    for user_id, delta in deltas.items():
+        apply_delta(user_id, delta)
+
+
+def record_links(field_name, links):
+    '''Count (user_id, object_id) links inserted without m2m_changed signals'''
+    deltas = defaultdict(StatsDelta)
+    for user_id, object_id in links:
+        deltas[user_id].link(field_name, object_id)
+    for user_id, delta in deltas.items():
+        apply_delta(user_id, delta)
+
+
+# Recipe IDs aggregated per query by record_deleted
+DELETE_CHUNK_SIZE = 1000
+
+
+def record_deleted(recipes):
+    '''Take recipes that are about to be deleted out of the summaries
+
+    Runs in the delete's transaction, while the recipes and their links can
+    still be read: a few grouped queries and one apply_delta per user,
+    however many recipes are deleted. The recipe_count of tags and
+    ingredients linked to them is lowered at the same time. The recipes are
+    locked first, so a concurrent delete of the same rows is counted once.
+    '''
+    recipes = recipes.order_by()
+    if connections[recipes.db].features.has_select_for_update:
+        recipes = recipes.select_for_update()
+    recipe_ids = sorted(recipes.values_list('pk', flat=True))
+    deltas = defaultdict(StatsDelta)
+    unlinked = {field_name: Counter() for field_name in RELATION_COUNTS}
+    for start in range(0, len(recipe_ids), DELETE_CHUNK_SIZE):
+        chunk = recipe_ids[start:start + DELETE_CHUNK_SIZE]
+        summaries = aggregate_stats(defaultdict(empty_stats), 'pk__in', chunk)
+        for user_id, summary in summaries.items():
+            deltas[user_id].add_summary(summary, sign=-1)
+            for field_name, attname in RELATION_COUNTS.items():
+                unlinked[field_name].update(summary[attname])
+
+    for field_name, counts in unlinked.items():
+        related = Recipe._meta.get_field(field_name).related_model
+        related.objects.add_recipe_counts({int(pk): -count for pk, count in counts.items()})
+    for user_id, delta in deltas.items():
+        apply_delta(user_id, delta)
+
+
+def record_dropped(field_name, objects):
+    '''Forget tags or ingredients that are about to be deleted'''
+    deltas = defaultdict(StatsDelta)
+    for user_id, object_id in objects.order_by().values_list('user_id', 'pk'):
+        deltas[user_id].drop(field_name, object_id)
+    for user_id, delta in deltas.items():
+        apply_delta(user_id, delta)
+
+
+def empty_stats():
+    return {
+        'recipe_count': 0,
+        'price_total': Decimal('0.00'),
+        'time_total': 0,
+        'time_buckets': [0] * (len(TIME_BUCKETS) + 1),
+        'tag_counts': {},
+        'ingredient_counts': {},
+    }
+
+
+def _bucket_filter(index):
+    if index == 0:
+        return Q(time_minutes__lte=TIME_BUCKETS[0])
+    if index == len(TIME_BUCKETS):
+        return Q(time_minutes__gt=TIME_BUCKETS[-1])
+
+    return Q(time_minutes__gt=TIME_BUCKETS[index - 1], time_minutes__lte=TIME_BUCKETS[index])
+
+
+def aggregate_stats(summaries, lookup, value):
+    '''Fill summaries by user with the recipes matching a lookup, e.g. pk__in
+
+    Runs one grouped query for the recipes and one per relation for their
+    links, however many recipes match.
+    '''
+    buckets = {
+        f'bucket_{index}': Count('id', filter=_bucket_filter(index))
+        for index in range(len(TIME_BUCKETS) + 1)
+    }
+    rows = (
+        Recipe.objects.filter(**{lookup: value})
+        .values('user_id')
+        .annotate(
+            recipes=Count('id'),
+            prices=Sum('price', output_field=DecimalField(max_digits=14, decimal_places=2)),
+            times=Sum('time_minutes'),
+            **buckets,
+        )
+        .order_by()
+    )
+    for row in rows:
+        summary = summaries[row['user_id']]
+        summary['recipe_count'] = row['recipes']
+        summary['price_total'] = Decimal(row['prices']).quantize(CENT)
+        summary['time_total'] = row['times']
+        summary['time_buckets'] = [
+            row[f'bucket_{index}'] for index in range(len(TIME_BUCKETS) + 1)
+        ]
+
+    for field_name, attname in RELATION_COUNTS.items():
+        field = Recipe._meta.get_field(field_name)
+        recipe_name = field.m2m_field_name()
+        target_name = f'{field.m2m_reverse_field_name()}_id'
+        rows = (
+            field.remote_field.through.objects.filter(**{f'{recipe_name}__{lookup}': value})
+            .values_list(f'{recipe_name}__user_id', target_name)
+            .annotate(recipes=Count('*'))
+            .order_by()
+        )
+        for user_id, object_id, count in rows:
+            summaries[user_id][attname][str(object_id)] = count
+
+    return summaries
+
+
+def compute_stats(user_ids):
+    '''Aggregate summaries from scratch, returning {user_id: fields}'''
+    summaries = {user_id: empty_stats() for user_id in user_ids}
+
+    return aggregate_stats(summaries, 'user_id__in', user_ids)
+
+
+def rebuild_stats(user_ids):
+    '''Recompute and store the summaries of a batch of users'''
+    with transaction.atomic():
+        # Locking first makes concurrent deltas wait for the rebuild
+        existing = {
+            stats.user_id: stats
+            for stats in RecipeStats.objects.select_for_update().filter(
+                user_id__in=user_ids
+            )
+        }
+        to_update, to_create = [], []
+        for user_id, fields in compute_stats(user_ids).items():
+            stats = existing.get(user_id)
+            if stats is None:
+                to_create.append(RecipeStats(user_id=user_id, **fields))
+                continue
+            for name, value in fields.items():
+                setattr(stats, name, value)
+            to_update.append(stats)
+
+        RecipeStats.objects.bulk_update(to_update, STATS_FIELDS)
+        RecipeStats.objects.bulk_create(to_create)
+        # Cached /recipes/stats/ responses are keyed on the collection version
+        CollectionVersion.objects.bump_many(user_ids)
+
+
+def check_stats(user_ids):
+    '''Return (user_id, field, stored, expected) for every stale summary field'''
+    stored = {
+        stats.user_id: stats for stats in RecipeStats.objects.filter(user_id__in=user_ids)
+    }
+    mismatches = []
+    for user_id, expected in compute_stats(user_ids).items():
+        stats = stored.get(user_id)
+        for name, value in expected.items():
+            current = None if stats is None else getattr(stats, name)
+            if current != value:
+                mismatches.append((user_id, name, current, value))
+
+    return mismatches
+
+
+def user_batches(batch_size, user_ids=None):
+    '''Yield lists of up to batch_size existing user IDs, in ID order'''
+    users = User.objects.order_by('id')
+    if user_ids:
+        users = users.filter(id__in=user_ids)
+    batch = []
+    for user_id in users.values_list('id', flat=True).iterator():
+        batch.append(user_id)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,50 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+
+
+def content_digest(content):
+    '''Return the SHA-256 hex digest of a file, reading it in chunks'''
+    digest = getattr(content, 'sha256', None)
+    if digest:
+        return digest
+
+    sha256 = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        sha256.update(chunk)
+    content.seek(0)
+
+    return sha256.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    '''File storage that keeps one copy of each distinct file content
+
+    Files are stored under the SHA-256 digest of their bytes inside the
+    directory chosen by the field's upload_to, so saving identical content
+    again returns the existing name instead of writing a new file. Uploads
+    hashed by StreamingImageUploadHandler are not read a second time.
+
+    Several rows may point at the same file, so delete() keeps the file;
+    the gc_media command deletes files no row refers to. The name given by
+    upload_to only contributes its directory and extension.
+    '''
+
+    def _save(self, name, content):
+        directory = os.path.dirname(name)
+        ext = os.path.splitext(name)[1].lower()
+        digest = content_digest(content)
+        name = os.path.join(directory, digest[:2], f'{digest}{ext}')
+
+        if self.exists(name):
+            # Refresh the modification time so a concurrent gc_media
+            # run treats the file as recently used
+            os.utime(self.path(name))
+            return name
+
+        return super()._save(name, content)
+
+    def delete(self, name):
+        '''Keep the file, which other rows may still refer to'''
@@ -0,0 +1,33 @@
+from django.db.models import prefetch_related_objects
+
+from core.renderers import encode_json
+
+
+def chunked_iterator(queryset, chunk_size=500):
+    '''Iterate a queryset with a server side cursor, prefetching per chunk
+
+    QuerySet.iterator() ignores prefetch_related, so the lookups are run
+    separately for every chunk of rows instead of once per row.
+    '''
+    lookups = queryset._prefetch_related_lookups
+    chunk = []
+    for obj in queryset.prefetch_related(None).iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) == chunk_size:
+            prefetch_related_objects(chunk, *lookups)
+            yield from chunk
+            chunk = []
+
+    if chunk:
+        prefetch_related_objects(chunk, *lookups)
+        yield from chunk
+
+
+def stream_json_array(serializer, objects):
+    '''Yield a JSON array of serialized objects one row at a time'''
+    yield b'['
+    for index, obj in enumerate(objects):
+        if index:
+            yield b','
+        yield encode_json(serializer.to_representation(obj))
+    yield b']'
@@ -0,0 +1,106 @@
+'''Benchmark worker occupancy while serving concurrent image downloads
+
+Each download runs on one of a fixed number of worker threads, standing in
+for WSGI workers, and the body is consumed at a simulated client bandwidth.
+Worker time is how long a worker is tied up per request, CPU time how much
+of that is spent in Python. Compares django.views.static.serve (the old
+static() route), serve_media streaming through FileResponse, and
+serve_media handing the transfer to nginx with X-Accel-Redirect.
+
+In process there is no wsgi.file_wrapper, so FileResponse is iterated in
+Python here; under gunicorn it is sent with sendfile() and its CPU time
+drops further while the worker time stays bound by the client.
+
+Run with: python manage.py test -p "bench_*.py" core
+'''
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from django.views.static import serve
+
+from core.models import Recipe
+from core.views import serve_media
+
+
+WORKERS = 4
+DOWNLOADS = 32
+IMAGE_BYTES = 4 * 2 ** 20
+# Simulated client bandwidth, bytes per second
+CLIENT_BANDWIDTH = 64 * 2 ** 20
+NAME = 'uploads/recipe/ab/photo.jpg'
+
+
+class MediaServingBenchmark(TransactionTestCase):
+    # serve_media checks ownership from the worker threads' own connections
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.media.name, NAME)
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write(os.urandom(IMAGE_BYTES))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(  # type:ignore
+            'bench@email.com', 'pass1234'
+        )
+        Recipe.objects.create(
+            user=self.user, title='Pancakes', time_minutes=5, price=3, image=NAME
+        )
+
+    def _download(self, view, kwargs):
+        request = RequestFactory().get('/media/' + NAME)
+        request.user = self.user
+        start, cpu_start = time.perf_counter(), time.thread_time()
+        response = view(request, **kwargs)
+        sent = 0
+        body = response.streaming_content if response.streaming else [response.content]
+        for chunk in body:
+            sent += len(chunk)
+            time.sleep(len(chunk) / CLIENT_BANDWIDTH)
+        response.close()
+        connection.close()
+
+        return time.perf_counter() - start, time.thread_time() - cpu_start, sent
+
+    def _measure(self, label, view, **kwargs):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+            results = list(
+                pool.map(lambda _: self._download(view, kwargs), range(DOWNLOADS))
+            )
+        elapsed = time.perf_counter() - start
+        busy = sum(result[0] for result in results)
+        cpu = sum(result[1] for result in results)
+        sent = sum(result[2] for result in results)
+        print(
+            f'{label:<22} {elapsed:7.2f}s wall  '
+            f'{busy / DOWNLOADS * 1000:8.1f}ms worker/req  '
+            f'{cpu / DOWNLOADS * 1000:7.1f}ms cpu/req  '
+            f'{sent / 2 ** 20:6.0f} MiB from Python'
+        )
+
+    def test_media_serving(self):
+        print(
+            f'\n{DOWNLOADS} downloads of {IMAGE_BYTES // 2 ** 20} MiB on '
+            f'{WORKERS} workers, {CLIENT_BANDWIDTH // 2 ** 20} MiB/s per client'
+        )
+        with override_settings(MEDIA_ROOT=self.media.name):
+            self._measure(
+                'static.serve', serve, path=NAME, document_root=self.media.name
+            )
+            self._measure('FileResponse', serve_media, path=NAME)
+            with override_settings(MEDIA_SERVE={'BACKEND': 'x-accel-redirect'}):
+                self._measure('X-Accel-Redirect', serve_media, path=NAME)
@@ -0,0 +1,121 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import TokenCache, get_token_cache
+
+
+ME_URL = reverse('user:me')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    '''Test resolving tokens through the authentication cache'''
+
+    def setUp(self):
+        get_token_cache().clear()
+        self.user = get_user_model().objects.create_user(  # type:ignore
+            'test@email.com', 'pass1234', name='Test Name'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_cached_token_skips_auth_query(self):
+        '''Test that only the first request looks the token up'''
+        with self.assertNumQueries(1):
+            self.client.get(ME_URL)
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_deleted_token_rejected(self):
+        '''Test that deleting a token invalidates the cached entry'''
+        self.client.get(ME_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        '''Test that deactivating a user invalidates their cached tokens'''
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalidated_on_commit(self):
+        '''Test an entry cached again before the commit is dropped by it'''
+        self.client.get(ME_URL)
+        token_cache = get_token_cache()
+        stale = token_cache.get(self.token.key)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+            # A concurrent request, still reading the active user
+            token_cache.set(self.token.key, stale)
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile_update_refreshes_cached_user(self):
+        '''Test that updating the profile is visible on the next request'''
+        self.client.get(ME_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(ME_URL, {'name': 'New Name'})
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'New Name')  # type:ignore
+
+
+class TokenCacheTests(TestCase):
+    '''Test the LRU and TTL behaviour of the token cache'''
+
+    def test_least_recently_used_evicted(self):
+        '''Test that the oldest entry is evicted once full'''
+        cache = TokenCache(max_size=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_expired_entry_ignored(self):
+        '''Test that entries past their TTL are not returned'''
+        cache = TokenCache(max_size=2, ttl=0)
+        cache.set('a', 1)
+
+        self.assertIsNone(cache.get('a'))
+
+    def test_shared_invalidation_reaches_other_processes(self):
+        '''Test a token deleted in one process is rejected by another'''
+        caches['default'].clear()
+        worker_one = TokenCache(max_size=2, ttl=60, cache_alias='default')
+        worker_two = TokenCache(max_size=2, ttl=60, cache_alias='default')
+        worker_one.set('a', 1)
+        worker_one.set('b', 2)
+        self.assertEqual(worker_two.get('a'), 1)
+        self.assertEqual(worker_two.get('b'), 2)
+
+        worker_one.delete('a')
+        worker_one.delete_user(None, keys=['b'])
+
+        self.assertIsNone(worker_two.get('a'))
+        self.assertIsNone(worker_two.get('b'))
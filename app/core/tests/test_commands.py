@@ -1,22 +1,166 @@
+import os
+import tempfile
+from io import StringIO
 from unittest.mock import patch
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
-from django.test import TestCase
+from django.test import TestCase, override_settings
+
+from core.models import Ingredient, Recipe, RecipeStats, Tag
 
 
 class CommandTests(TestCase):
 
     def test_wait_for_db_ready(self):
         '''Test waiting for db when db is available'''
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.return_value = True
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 1)
+        out = StringIO()
+        with patch('core.management.commands.wait_for_db.connect') as ec:
+            call_command('wait_for_db', stdout=out)
+            self.assertEqual(ec.call_count, 1)
+        self.assertIn('Ready after', out.getvalue())
 
     @patch('time.sleep', return_value=True)
     def test_wait_for_db(self, ts):
         '''Test waiting for db'''
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]  # type: ignore
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 6)
+        with patch('core.management.commands.wait_for_db.connect') as ec:
+            ec.side_effect = [OperationalError] * 5 + [None]  # type: ignore
+            call_command('wait_for_db', stdout=StringIO())
+            self.assertEqual(ec.call_count, 6)
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_backs_off(self, ts):
+        '''Test the delay between attempts doubles up to the maximum'''
+        with patch('core.management.commands.wait_for_db.connect') as ec:
+            ec.side_effect = [OperationalError] * 5 + [None]  # type: ignore
+            call_command('wait_for_db', max_delay=0.5, stdout=StringIO())
+
+        self.assertEqual(
+            [c.args[0] for c in ts.call_args_list], [0.1, 0.2, 0.4, 0.5, 0.5]
+        )
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_timeout(self, ts):
+        '''Test the command fails once the timeout is used up'''
+        with patch('core.management.commands.wait_for_db.connect') as ec:
+            ec.side_effect = OperationalError
+            with self.assertRaises(CommandError):
+                call_command('wait_for_db', timeout=0.5, stdout=StringIO())
+
+        # No time passes while sleep is mocked, so waits stop at the first
+        # delay longer than the timeout
+        self.assertEqual(ts.call_count, 3)
+
+    def test_wait_for_db_warm(self):
+        '''Test warming opens and validates the requested connections'''
+        out = StringIO()
+        with patch('core.management.commands.wait_for_db.warm_connections') as wc:
+            wc.return_value = [0.01, 0.02, 0.03]
+            call_command('wait_for_db', warm=3, stdout=out)
+
+        wc.assert_called_once_with(3, 'default')
+        self.assertIn('Opened and validated 3 connections', out.getvalue())
+
+
+class GcMediaCommandTests(TestCase):
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        directory = os.path.join(self.media.name, 'uploads', 'recipe', 'ab')
+        os.makedirs(directory)
+        for name in ('kept.jpg', 'kept_200.jpg', 'orphan.jpg'):
+            with open(os.path.join(directory, name), 'wb') as f:
+                f.write(b'x' * 10)
+        user = get_user_model().objects.create_user(  # type: ignore
+            'test@email.com', 'pass1234'
+        )
+        Recipe.objects.create(
+            user=user,
+            title='Pancakes',
+            time_minutes=5,
+            price=3.00,
+            image='uploads/recipe/ab/kept.jpg',
+            image_derivatives={'200_jpg': 'uploads/recipe/ab/kept_200.jpg'},
+        )
+        self.directory = directory
+
+    def test_gc_media_removes_unreferenced_files(self):
+        '''Test only files no recipe refers to are deleted'''
+        out = StringIO()
+        with override_settings(MEDIA_ROOT=self.media.name):
+            call_command('gc_media', min_age=0, stdout=out)
+
+        self.assertEqual(sorted(os.listdir(self.directory)), ['kept.jpg', 'kept_200.jpg'])
+        self.assertIn('Removed 1 unreferenced files, 10 bytes', out.getvalue())
+
+    def test_gc_media_keeps_recent_files(self):
+        '''Test files newer than the minimum age are left alone'''
+        with override_settings(MEDIA_ROOT=self.media.name):
+            call_command('gc_media', stdout=StringIO())
+
+        self.assertIn('orphan.jpg', os.listdir(self.directory))
+
+
+class RecipeStatsCommandTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(  # type: ignore
+            'test@email.com', 'pass1234'
+        )
+        Recipe.objects.create(user=self.user, title='Soup', time_minutes=20, price=4)
+        # Drift the summary behind the signals' back
+        RecipeStats.objects.filter(user=self.user).update(recipe_count=5)
+
+    def test_check_recipe_stats_reports_drift(self):
+        '''Test stale summaries are listed and fail the command'''
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('check_recipe_stats', stdout=out)
+
+        self.assertIn(f'User {self.user.pk}: recipe_count is 5, expected 1', out.getvalue())
+
+    def test_check_recipe_stats_fix(self):
+        '''Test --fix rebuilds the stale summaries'''
+        call_command('check_recipe_stats', fix=True, stdout=StringIO())
+
+        out = StringIO()
+        call_command('check_recipe_stats', stdout=out)
+        self.assertIn('Recipe stats consistent for 1 users', out.getvalue())
+
+    def test_rebuild_recipe_stats(self):
+        '''Test summaries are recomputed from the recipe tables'''
+        RecipeStats.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_recipe_stats', batch_size=1, stdout=out)
+
+        stats = RecipeStats.objects.get(user=self.user)
+        self.assertEqual(stats.recipe_count, 1)
+        self.assertEqual(stats.time_buckets, [0, 1, 0, 0])
+        self.assertIn('Rebuilt recipe stats for 1 users', out.getvalue())
+
+
+class RepairRecipeCountsCommandTests(TestCase):
+
+    def test_repair_recipe_counts(self):
+        '''Test only the user's wrong counts are repaired'''
+        user = get_user_model().objects.create_user(  # type: ignore
+            'test@email.com', 'pass1234'
+        )
+        other = get_user_model().objects.create_user(  # type: ignore
+            'other@email.com', 'pass1234'
+        )
+        Tag.objects.create(user=user, name='Vegan', recipe_count=3)
+        Tag.objects.create(user=other, name='Vegan', recipe_count=3)
+        Ingredient.objects.create(user=user, name='Salt')
+
+        out = StringIO()
+        call_command('repair_recipe_counts', user=[user.pk], stdout=out)
+
+        self.assertEqual(
+            list(Tag.objects.order_by('user_id').values_list('recipe_count', flat=True)),
+            [0, 3],
+        )
+        self.assertIn('Repaired 1 tags', out.getvalue())
+        self.assertIn('Repaired 0 ingredients', out.getvalue())
@@ -0,0 +1,101 @@
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import hashers
+
+
+class PasswordHashingTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(  # type:ignore
+            'test@email.com', 'pass1234'
+        )
+
+    def test_hashing_runs_on_pool(self):
+        '''Test passwords are hashed on a hashing pool thread'''
+        threads = []
+
+        def record(raw_password):
+            threads.append(threading.current_thread().name)
+            return 'hash'
+
+        with patch('django.contrib.auth.hashers.make_password', side_effect=record):
+            self.user.set_password('newpass5678')
+
+        self.assertTrue(threads[0].startswith('hasher'))
+        self.assertEqual(self.user.password, 'hash')
+
+    def test_work_factor_configurable(self):
+        '''Test the PBKDF2 iterations follow PASSWORD_HASHING'''
+        with override_settings(PASSWORD_HASHING={'ITERATIONS': 1000}):
+            self.user.set_password('newpass5678')
+
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+
+    def test_stale_hash_upgraded_on_login(self):
+        '''Test a successful check rehashes with the current work factor'''
+        with override_settings(PASSWORD_HASHING={'ITERATIONS': 1000}):
+            self.user.set_password('newpass5678')
+            self.user.save()
+
+        with override_settings(PASSWORD_HASHING={'ITERATIONS': 2000}):
+            self.assertTrue(self.user.check_password('newpass5678'))
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
+
+    def test_failed_check_not_upgraded(self):
+        '''Test a wrong password leaves the stored hash alone'''
+        with override_settings(PASSWORD_HASHING={'ITERATIONS': 1000}):
+            self.user.set_password('newpass5678')
+            self.user.save()
+
+        with override_settings(PASSWORD_HASHING={'ITERATIONS': 2000}):
+            self.assertFalse(self.user.check_password('wrongpass'))
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+
+    def test_token_busy(self):
+        '''Test a full hashing queue is answered with 503'''
+        client = APIClient()
+        with patch(
+            'core.hashers.verify_password', side_effect=hashers.PasswordHashingBusy
+        ):
+            res = client.post(
+                reverse('user:token'),
+                {'email': 'test@email.com', 'password': 'pass1234'},
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+class HashingPoolTests(SimpleTestCase):
+
+    def test_backpressure(self):
+        '''Test callers are turned away once the queue is full'''
+        pool = hashers.HashingPool(workers=1, max_pending=0, queue_timeout=0.01)
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        thread = threading.Thread(target=pool.run, args=(block,))
+        thread.start()
+        started.wait(5)
+        try:
+            with self.assertRaises(hashers.PasswordHashingBusy):
+                pool.run(lambda: None)
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(pool.run(lambda: 'done'), 'done')
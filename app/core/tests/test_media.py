@@ -0,0 +1,164 @@
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from rest_framework.authtoken.models import Token
+
+from core.models import Recipe
+
+
+MEDIA_URL = '/media/uploads/recipe/ab/photo.jpg'
+
+
+class ServeMediaTests(TestCase):
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        directory = os.path.join(self.media.name, 'uploads', 'recipe', 'ab')
+        os.makedirs(os.path.join(directory, 'derivatives'))
+        self.content = bytes(range(256)) * 4
+        with open(os.path.join(directory, 'photo.jpg'), 'wb') as f:
+            f.write(self.content)
+        os.makedirs(os.path.join(self.media.name, 'tmp'))
+        with open(os.path.join(self.media.name, 'tmp', 'upload.jpg'), 'wb') as f:
+            f.write(b'partial')
+
+        settings_override = override_settings(MEDIA_ROOT=self.media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = get_user_model().objects.create_user(  # type:ignore
+            'test@email.com', 'pass1234'
+        )
+        Recipe.objects.create(
+            user=self.user,
+            title='Pancakes',
+            time_minutes=5,
+            price=3,
+            image='uploads/recipe/ab/photo.jpg',
+        )
+        self.client.force_login(self.user)
+
+    def test_serves_file_with_cache_headers(self):
+        '''Test a media file is streamed with validators and caching'''
+        res = self.client.get(MEDIA_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), self.content)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res['Content-Length'], str(len(self.content)))
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', res)
+        self.assertNotIn('Last-Modified', res)
+        self.assertIn('private', res['Cache-Control'])
+        self.assertIn('immutable', res['Cache-Control'])
+        self.assertIn('max-age=31536000', res['Cache-Control'])
+        res.close()
+
+    def test_other_users_refused(self):
+        '''Test files are only served to the owner of a recipe using them'''
+        other = get_user_model().objects.create_user(  # type:ignore
+            'other@email.com', 'pass1234'
+        )
+        self.client.force_login(other)
+
+        self.assertEqual(self.client.get(MEDIA_URL).status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get(MEDIA_URL).status_code, 404)
+
+    def test_token_authentication(self):
+        '''Test the API token is accepted and derivatives follow their image'''
+        self.client.logout()
+        token = Token.objects.create(user=self.user)
+        name = 'uploads/recipe/ab/derivatives/photo_200.webp'
+        with open(os.path.join(self.media.name, name.replace('/', os.sep)), 'wb') as f:
+            f.write(b'webp')
+
+        res = self.client.get(f'/media/{name}', HTTP_AUTHORIZATION=f'Token {token.key}')
+        bad = self.client.get(MEDIA_URL, HTTP_AUTHORIZATION='Token invalid')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), b'webp')
+        res.close()
+        self.assertEqual(bad.status_code, 404)
+
+    def test_not_modified(self):
+        '''Test a matching If-None-Match returns 304 without a body'''
+        res = self.client.get(MEDIA_URL)
+        res.close()
+        res = self.client.get(MEDIA_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.content, b'')
+
+    def test_range_request(self):
+        '''Test a byte range returns 206 with only those bytes'''
+        res = self.client.get(MEDIA_URL, HTTP_RANGE='bytes=10-19')
+
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(b''.join(res.streaming_content), self.content[10:20])
+        self.assertEqual(res['Content-Length'], '10')
+        self.assertEqual(res['Content-Range'], f'bytes 10-19/{len(self.content)}')
+        res.close()
+
+    def test_suffix_range_request(self):
+        '''Test a suffix range returns the end of the file'''
+        res = self.client.get(MEDIA_URL, HTTP_RANGE='bytes=-5')
+
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(b''.join(res.streaming_content), self.content[-5:])
+        res.close()
+
+    def test_unsatisfiable_range(self):
+        '''Test a range past the end of the file returns 416'''
+        res = self.client.get(MEDIA_URL, HTTP_RANGE='bytes=5000-')
+
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_stale_if_range_returns_whole_file(self):
+        '''Test a range with a stale If-Range validator returns 200'''
+        res = self.client.get(
+            MEDIA_URL, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"'
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), self.content)
+        res.close()
+
+    def test_files_outside_prefixes_not_served(self):
+        '''Test temporary uploads and traversal attempts return 404'''
+        self.assertEqual(self.client.get('/media/tmp/upload.jpg').status_code, 404)
+        self.assertEqual(
+            self.client.get('/media/uploads/../tmp/upload.jpg').status_code, 404
+        )
+        self.assertEqual(self.client.get('/media/uploads/missing.jpg').status_code, 404)
+
+    def test_post_not_allowed(self):
+        '''Test only GET and HEAD are accepted'''
+        self.assertEqual(self.client.post(MEDIA_URL).status_code, 405)
+
+    @override_settings(MEDIA_SERVE={'BACKEND': 'x-accel-redirect'})
+    def test_x_accel_redirect(self):
+        '''Test the transfer is handed to nginx when configured'''
+        res = self.client.get(MEDIA_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['X-Accel-Redirect'], '/protected-media/uploads/recipe/ab/photo.jpg')
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res.content, b'')
+        self.assertIn('ETag', res)
+
+    @override_settings(MEDIA_SERVE={'BACKEND': 'x-sendfile'})
+    def test_x_sendfile(self):
+        '''Test the transfer is handed to the server by path when configured'''
+        res = self.client.get(MEDIA_URL)
+
+        self.assertEqual(
+            res['X-Sendfile'],
+            os.path.join(self.media.name, 'uploads', 'recipe', 'ab', 'photo.jpg'),
+        )
+        self.assertEqual(res.content, b'')
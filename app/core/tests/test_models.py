@@ -1,6 +1,6 @@
-from unittest.mock import patch
-
+from django.db import connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 
 from core import models  # type: ignore
@@ -69,12 +69,119 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(recipe), recipe.title)
 
-    @patch('uuid.uuid4')
-    def test_recipe_file_name_uuid(self, mock_uuid):
+    def test_recipe_file_path(self):
         '''Test that image is saved to the correct location'''
-        uuid = 'test-uuid'
-        mock_uuid.return_value = uuid
         file_path = models.recipe_image_file_path(None, 'myimage.jpg')
 
-        exp_path = f'uploads/recipe/{uuid}.jpg'
-        self.assertEqual(file_path, exp_path)
+        self.assertEqual(file_path, 'uploads/recipe/image.jpg')
+
+    def test_recipe_counts_follow_links(self):
+        '''Test tag and ingredient recipe counts follow every link change'''
+        user = sample_user()
+        tag = models.Tag.objects.create(user=user, name='Vegan')
+        ingredient = models.Ingredient.objects.create(user=user, name='Salt')
+        recipes = [
+            models.Recipe.objects.create(
+                user=user, title=f'Recipe {i}', time_minutes=5, price=1
+            )
+            for i in range(3)
+        ]
+
+        def counts():
+            tag.refresh_from_db()
+            ingredient.refresh_from_db()
+            return tag.recipe_count, ingredient.recipe_count
+
+        for recipe in recipes:
+            recipe.tags.add(tag)
+        tag.recipe_set.add(recipes[0])
+        ingredient.recipe_set.add(*recipes)
+        self.assertEqual(counts(), (3, 3))
+
+        recipes[0].tags.remove(tag)
+        recipes[0].tags.remove(tag)
+        ingredient.recipe_set.remove(recipes[1])
+        self.assertEqual(counts(), (2, 2))
+
+        recipes[2].delete()
+        self.assertEqual(counts(), (1, 1))
+
+        tag.recipe_set.clear()
+        recipes[0].ingredients.clear()
+        self.assertEqual(counts(), (0, 0))
+
+    def test_recipe_counts_stop_at_zero(self):
+        '''Test counts left too low by a race stay at zero instead of failing'''
+        user = sample_user()
+        tags = [models.Tag.objects.create(user=user, name=f'Tag {i}') for i in range(3)]
+        recipe = models.Recipe.objects.create(
+            user=user, title='Soup', time_minutes=5, price=1
+        )
+        recipe.tags.add(*tags)
+        models.Tag.objects.filter(pk=tags[0].pk).update(recipe_count=0)
+
+        with self.assertNumQueries(1):
+            models.Tag.objects.add_recipe_counts(
+                {tags[0].pk: -1, tags[1].pk: -1, tags[2].pk: 2}
+            )
+
+        self.assertEqual(
+            list(models.Tag.objects.order_by('id').values_list('recipe_count', flat=True)),
+            [0, 0, 3],
+        )
+
+    def test_repair_recipe_counts(self):
+        '''Test wrong recipe counts are recomputed from the links'''
+        user = sample_user()
+        tag = models.Tag.objects.create(user=user, name='Vegan')
+        unused = models.Tag.objects.create(user=user, name='Unused')
+        recipe = models.Recipe.objects.create(
+            user=user, title='Soup', time_minutes=5, price=1
+        )
+        recipe.tags.add(tag)
+        models.Tag.objects.update(recipe_count=7)
+
+        repaired = models.Tag.objects.repair_recipe_counts()
+
+        self.assertEqual(repaired, 2)
+        self.assertEqual(
+            dict(models.Tag.objects.values_list('id', 'recipe_count')),
+            {tag.id: 1, unused.id: 0},
+        )
+
+    def test_collection_version_bumped_once_per_transaction(self):
+        '''Test a bulk delete bumps the version once, when it commits'''
+        user = sample_user()
+        version = models.CollectionVersion.objects.current(user).version
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(5):
+                models.Tag.objects.create(user=user, name=f'Tag {i}')
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            models.Tag.objects.filter(user=user).delete()
+        with CaptureQueriesContext(connection) as queries:
+            for callback in callbacks:
+                callback()
+
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(
+            models.CollectionVersion.objects.current(user).version, version + 2
+        )
+
+    def test_collection_version_bump_survives_rollback(self):
+        '''Test changes after a rolled back savepoint still bump the version'''
+        user = sample_user()
+        version = models.CollectionVersion.objects.current(user).version
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    models.Tag.objects.create(user=user, name='Vegan')
+                    raise ValueError
+            except ValueError:
+                pass
+            models.Tag.objects.create(user=user, name='Vegetarian')
+
+        self.assertEqual(
+            models.CollectionVersion.objects.current(user).version, version + 1
+        )
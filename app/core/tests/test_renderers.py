@@ -0,0 +1,52 @@
+import datetime
+import json
+from collections import OrderedDict
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from rest_framework.renderers import JSONRenderer
+
+from core import renderers
+from core.renderers import FastJSONRenderer
+
+
+SAMPLE = [
+    OrderedDict(
+        [
+            ('id', 1),
+            ('title', 'Café   line'),
+            ('price', Decimal('12.50')),
+            ('created', datetime.datetime(2021, 8, 14, 12, 30)),
+            ('tags', [1, 2]),
+        ]
+    )
+]
+
+
+class FastJSONRendererTests(TestCase):
+
+    def test_output_matches_drf(self):
+        '''Test the fast renderer produces the same bytes as DRF'''
+        expected = JSONRenderer().render(SAMPLE)
+
+        self.assertEqual(FastJSONRenderer().render(SAMPLE), expected)
+
+    def test_fallback_without_orjson(self):
+        '''Test the standard library fallback produces the same bytes'''
+        expected = JSONRenderer().render(SAMPLE)
+
+        with patch.object(renderers, 'orjson', None):
+            content = FastJSONRenderer().render(SAMPLE)
+
+        self.assertEqual(content, expected)
+
+    def test_indent_requested(self):
+        '''Test pretty printing is still honoured'''
+        content = FastJSONRenderer().render(
+            SAMPLE, accepted_media_type='application/json; indent=2'
+        )
+
+        self.assertIn(b'\n  ', content)
+        self.assertEqual(json.loads(content)[0]['id'], 1)
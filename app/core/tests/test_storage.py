@@ -0,0 +1,43 @@
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import TestCase
+
+from core.storage import ContentAddressedStorage
+
+
+class ContentAddressedStorageTests(TestCase):
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.storage = ContentAddressedStorage(location=self.media.name)
+
+    def tearDown(self):
+        self.media.cleanup()
+
+    def test_identical_content_stored_once(self):
+        '''Test saving the same bytes twice reuses the stored file'''
+        first = self.storage.save('uploads/recipe/a.JPG', ContentFile(b'image'))
+        second = self.storage.save('uploads/recipe/b.jpg', ContentFile(b'image'))
+
+        self.assertEqual(first, second)
+        self.assertTrue(first.startswith('uploads/recipe/'))
+        self.assertTrue(first.endswith('.jpg'))
+        self.assertEqual(len(self.storage.listdir(first.rsplit('/', 1)[0])[1]), 1)
+
+    def test_delete_keeps_shared_file(self):
+        '''Test deleting a name leaves the file to gc_media'''
+        name = self.storage.save('uploads/recipe/a.jpg', ContentFile(b'image'))
+
+        self.storage.delete(name)
+
+        self.assertTrue(self.storage.exists(name))
+
+    def test_different_content_stored_separately(self):
+        '''Test different bytes get different names'''
+        first = self.storage.save('uploads/recipe/a.jpg', ContentFile(b'one'))
+        second = self.storage.save('uploads/recipe/a.jpg', ContentFile(b'two'))
+
+        self.assertNotEqual(first, second)
+        with self.storage.open(second) as f:
+            self.assertEqual(f.read(), b'two')
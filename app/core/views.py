@@ -0,0 +1,226 @@
+import hashlib
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.views.decorators.http import require_safe
+
+from rest_framework.exceptions import AuthenticationFailed
+
+from core.authentication import CachedTokenAuthentication
+from core.models import Recipe
+
+
+DEFAULT_MEDIA_SERVE = {
+    # None streams from Python, 'x-accel-redirect' (nginx) or 'x-sendfile'
+    # (Apache, lighttpd) hand the transfer to the front end server
+    'BACKEND': None,
+    # nginx `internal` location aliased to MEDIA_ROOT
+    'INTERNAL_PREFIX': '/protected-media/',
+    # Only files below these prefixes of MEDIA_ROOT are served, to their owners
+    'PREFIXES': ('uploads/',),
+    # Stored names are content addressed, so files never change
+    'MAX_AGE': 365 * 24 * 60 * 60,
+}
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# Derivative names, as made by recipe.images.derivative_name
+DERIVATIVE_RE = re.compile(r'^(?P<directory>.+)/derivatives/(?P<stem>[^/]+)_\d+\.\w+$')
+
+
+def get_media_options():
+    return {
+        **DEFAULT_MEDIA_SERVE,
+        **getattr(settings, 'MEDIA_SERVE', {}),
+    }
+
+
+def media_etag(name, size):
+    '''Return the ETag of a stored file
+
+    Stored names include the content digest, so the name and size identify
+    the bytes without reading them.
+    '''
+    return '"%s"' % hashlib.md5(f'{name}:{size}'.encode()).hexdigest()
+
+
+def parse_range(header, size):
+    '''Return the (start, end) of a single byte range, or None for all
+
+    Raises ValueError when the range cannot be satisfied. Multiple ranges
+    are answered with the whole file, which RFC 7233 allows.
+    '''
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        return None
+
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the final N bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+
+    return start, end
+
+
+class RangeFile:
+    '''File wrapper that stops reading at the end of a byte range
+
+    fileno() is kept so WSGI servers can still sendfile() from the current
+    offset, bounded by the response Content-Length.
+    '''
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def resolve_media_path(path, options):
+    '''Return the absolute path of a servable media file or raise Http404'''
+    name = os.path.normpath(path).replace(os.sep, '/')
+    if not name.startswith(tuple(options['PREFIXES'])):
+        raise Http404('Media file not found.')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, name)
+    except ValueError:
+        raise Http404('Media file not found.')
+    if not os.path.isfile(full_path):
+        raise Http404('Media file not found.')
+
+    return name, full_path
+
+
+def media_user(request):
+    '''Return the user a media request is authenticated as, or None
+
+    The API's token is accepted as well as a session.
+    '''
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user
+    try:
+        authenticated = CachedTokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+
+    return authenticated[0] if authenticated else None
+
+
+def owns_media(user, name):
+    '''Return whether one of the user's recipes refers to a media file
+
+    Files are shared by content, so any recipe of the user with the same
+    image grants access. Derivatives are matched through their image.
+    '''
+    match = DERIVATIVE_RE.match(name)
+    if match:
+        image = Q(image__startswith=f'{match["directory"]}/{match["stem"]}.')
+    else:
+        image = Q(image=name)
+
+    return Recipe.objects.filter(image, user=user).exists()
+
+
+@require_safe
+def serve_media(request, path):
+    '''Serve an uploaded media file to the owner of a recipe using it
+
+    Only files under one of MEDIA_SERVE['PREFIXES'] are served, and only to
+    a user with a recipe referring to them; anyone else gets a 404, so the
+    names of other users' files are not confirmed. The transfer is offloaded
+    to the front end server when MEDIA_SERVE['BACKEND'] is set, otherwise
+    the file is streamed with FileResponse, which uses the WSGI server's
+    sendfile where available.
+    '''
+    options = get_media_options()
+    name, full_path = resolve_media_path(path, options)
+    user = media_user(request)
+    if user is None or not owns_media(user, name):
+        raise Http404('Media file not found.')
+    size = os.path.getsize(full_path)
+    etag = media_etag(name, size)
+
+    # No Last-Modified: the storage refreshes the modification time when the
+    # same content is uploaded again, while the bytes never change
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = _transfer(request, options, name, full_path, size, etag)
+
+    if response.status_code in (200, 206, 304):
+        response['ETag'] = etag
+        # Private, so shared caches do not hand the file to other users
+        patch_cache_control(
+            response, private=True, max_age=options['MAX_AGE'], immutable=True
+        )
+        patch_vary_headers(response, ('Authorization', 'Cookie'))
+
+    return response
+
+
+def _transfer(request, options, name, full_path, size, etag):
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    backend = options['BACKEND']
+    if backend == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = options['INTERNAL_PREFIX'] + quote(name)
+        return response
+    if backend == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = full_path
+        return response
+
+    byte_range = None
+    header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if header and (not if_range or if_range == etag):
+        try:
+            byte_range = parse_range(header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = FileResponse(
+            RangeFile(file, start, length), status=206, content_type=content_type
+        )
+        response['Content-Length'] = length
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    # Only used when the server has no wsgi.file_wrapper to sendfile() with
+    response.block_size = 64 * 2 ** 10
+
+    return response
@@ -0,0 +1,194 @@
+import sys
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Lower
+
+
+DEFAULT_AUTOCOMPLETE = {
+    'LIMIT': 10,
+    'MAX_LIMIT': 50,
+    # Trigram similarity fills up short prefix results on Postgres once the
+    # query has at least this many characters
+    'TRIGRAM_MIN_LENGTH': 3,
+    # Names held by the per-user tries kept in process memory, which take
+    # about 2 KiB each; 0 disables them
+    'TRIE_MAX_NAMES': 0,
+}
+
+
+def get_autocomplete_options():
+    return {
+        **DEFAULT_AUTOCOMPLETE,
+        **getattr(settings, 'AUTOCOMPLETE', {}),
+    }
+
+
+def prefix_upper_bound(prefix):
+    '''Return the smallest string greater than every string with the prefix'''
+    if ord(prefix[-1]) == sys.maxunicode:
+        return None
+
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def autocomplete(queryset, text, limit):
+    '''Return up to limit objects whose name starts with text, ignoring case
+
+    The range on LOWER(name) is answered by the (user, LOWER(name)) index;
+    the LIKE keeps the result exact whatever the database collation. On
+    Postgres, names that merely resemble text are appended, most similar
+    first, using the trigram index.
+    '''
+    prefix = text.lower()
+    prefixed = queryset.alias(name_lower=Lower('name')).filter(
+        name_lower__gte=prefix, name_lower__startswith=prefix
+    )
+    upper_bound = prefix_upper_bound(prefix)
+    if upper_bound is not None:
+        prefixed = prefixed.filter(name_lower__lt=upper_bound)
+
+    return add_similar(
+        queryset, text, list(prefixed.order_by('name_lower', 'id')[:limit]), limit
+    )
+
+
+def add_similar(queryset, text, matches, limit):
+    '''Append names resembling text to prefix matches, on Postgres only'''
+    options = get_autocomplete_options()
+    if (
+        len(matches) < limit
+        and len(text) >= options['TRIGRAM_MIN_LENGTH']
+        and connections[queryset.db].vendor == 'postgresql'
+    ):
+        matches += _similar(
+            queryset.exclude(pk__in=[obj.pk for obj in matches]),
+            text,
+            limit - len(matches),
+        )
+
+    return matches
+
+
+def _similar(queryset, text, limit):
+    column = '{}.name'.format(
+        connections[queryset.db].ops.quote_name(queryset.model._meta.db_table)
+    )
+    return list(
+        queryset.alias(
+            trigram_matched=RawSQL(
+                f'{column} %% %s', (text,), output_field=BooleanField()
+            ),
+            similarity=RawSQL(
+                f'similarity({column}, %s)', (text,), output_field=FloatField()
+            ),
+        )
+        .filter(trigram_matched=True)
+        .order_by('-similarity', 'id')[:limit]
+    )
+
+
+class NameTrie:
+    '''Character trie over lowercased names
+
+    Completions come back in code point order of the lowercased name, then
+    by ID, which may differ from the database collation for non-ASCII names.
+    '''
+
+    def __init__(self, rows=()):
+        self.root = {}
+        for pk, name in rows:
+            self.insert(pk, name)
+
+    def insert(self, pk, name):
+        node = self.root
+        for char in name.lower():
+            node = node.setdefault(char, {})
+        # '' cannot be a character, so it holds the names ending here
+        node.setdefault('', []).append((pk, name))
+
+    def complete(self, prefix, limit):
+        '''Return up to limit (pk, name) pairs starting with prefix'''
+        node = self.root
+        for char in prefix.lower():
+            node = node.get(char)
+            if node is None:
+                return []
+
+        results = []
+        stack = [node]
+        while stack and len(results) < limit:
+            node = stack.pop()
+            results.extend(sorted(node.get('', ())))
+            # Reversed so the smallest character is popped first
+            stack.extend(node[char] for char in sorted(node, reverse=True) if char)
+
+        return results[:limit]
+
+
+class TrieCache:
+    '''LRU of per-user name tries, rebuilt when the collection version moves
+
+    Memory is bounded by the number of names across all tries rather than
+    by users, as one user may own many names. Users with more names than
+    the whole budget get no trie. Any write by the user moves the version,
+    so the tries pay off for users who read far more than they write.
+    '''
+
+    def __init__(self, max_names):
+        self.max_names = max_names
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version, load):
+        '''Return the trie for key, building it from load() when stale
+
+        load() must return a sliceable queryset of (pk, name) pairs. None
+        is returned, and remembered until the version moves, for users
+        with too many names.
+        '''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        rows = list(load()[:self.max_names + 1])
+        trie = NameTrie(rows) if len(rows) <= self.max_names else None
+        size = len(rows) if trie is not None else 1
+        with self._lock:
+            stale = self._entries.pop(key, None)
+            if stale is not None:
+                self.size -= stale[2]
+            self._entries[key] = (version, trie, size)
+            self.size += size
+            while self.size > self.max_names:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+
+        return trie
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+_trie_cache = None
+
+
+def get_trie_cache():
+    '''Return the process wide trie cache, or None when disabled'''
+    global _trie_cache
+    max_names = get_autocomplete_options()['TRIE_MAX_NAMES']
+    if not max_names:
+        return None
+    if _trie_cache is None or _trie_cache.max_names != max_names:
+        _trie_cache = TrieCache(max_names)
+
+    return _trie_cache
@@ -0,0 +1,123 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import urlencode
+
+
+DEFAULT_RESPONSE_CACHE = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+
+class ResponseCache:
+    '''Rendered response bytes keyed by user, collection version and request
+
+    Keys include the user's collection version, which the core signals bump
+    on every write to their tags, ingredients or recipes, so a write makes
+    all of that user's entries unreachable at once. The backend is any
+    Django cache alias, local memory by default or a shared one such as
+    Redis or Memcached. Hit and miss counters are kept in the same backend,
+    so with a shared one they add up over every process.
+    '''
+
+    key_prefix = 'response:'
+    # Comma separated ID lists whose order does not change the response
+    id_list_params = ('tags', 'ingredients')
+
+    def __init__(self, cache_alias, timeout):
+        self.cache_alias = cache_alias
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def normalize_params(self, query_params):
+        '''Return a canonical query string for a request's parameters'''
+        normalized = []
+        for key in sorted(query_params):
+            values = query_params.getlist(key)
+            if key in self.id_list_params:
+                ids = {
+                    str_id.strip()
+                    for value in values
+                    for str_id in value.split(',')
+                    if str_id.strip()
+                }
+                values = [','.join(sorted(ids))]
+            elif key == 'assigned_only':
+                values = ['1' if value not in ('', '0') else '0' for value in values]
+            normalized.append((key, values))
+
+        return urlencode(normalized, doseq=True)
+
+    def key(self, view, request, version):
+        '''Return the cache key for a view's response to a request'''
+        parts = (
+            str(request.user.pk),
+            str(version.version),
+            str(version.updated_at.timestamp()),
+            view.basename,
+            view.action,
+            str(view.kwargs.get(view.lookup_url_kwarg or view.lookup_field, '')),
+            request.accepted_renderer.format,
+            self.normalize_params(request.query_params),
+        )
+        digest = hashlib.md5(':'.join(parts).encode()).hexdigest()
+
+        return f'{self.key_prefix}{digest}'
+
+    def get(self, key):
+        '''Return a cached (content, content type) pair, counting the lookup'''
+        value = self.cache.get(key)
+        self._count('misses' if value is None else 'hits')
+
+        return value
+
+    def set(self, key, content, content_type):
+        '''Store rendered response content'''
+        self.cache.set(key, (content, content_type), self.timeout)
+
+    def _stats_key(self, name):
+        return f'{self.key_prefix}stats:{name}'
+
+    def _count(self, name):
+        key = self._stats_key(name)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            # The first lookup, or the counter was evicted; add() loses to a
+            # concurrent first lookup, which has created the key by then
+            if not self.cache.add(key, 1, None):
+                self.cache.incr(key)
+
+    def stats(self):
+        '''Return the hit and miss counters stored in the cache backend'''
+        names = ('hits', 'misses')
+        values = self.cache.get_many([self._stats_key(name) for name in names])
+
+        return {name: values.get(self._stats_key(name), 0) for name in names}
+
+    def reset_stats(self):
+        '''Set the hit and miss counters back to zero'''
+        self.cache.delete_many([self._stats_key(name) for name in ('hits', 'misses')])
+
+
+_response_cache = None
+
+
+def get_response_cache():
+    '''Return the process wide response cache, or None when disabled'''
+    global _response_cache
+    if _response_cache is None:
+        options = {
+            **DEFAULT_RESPONSE_CACHE,
+            **getattr(settings, 'RESPONSE_CACHE', {}),
+        }
+        if not options['CACHE_ALIAS']:
+            return None
+        _response_cache = ResponseCache(options['CACHE_ALIAS'], options['TIMEOUT'])
+
+    return _response_cache
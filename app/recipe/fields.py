@@ -0,0 +1,85 @@
+from collections.abc import Mapping
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+
+class UserPrimaryKeysField(serializers.ManyRelatedField):
+    """List of primary keys resolved with a single query"""
+
+    # Objects looked up ahead for every item of a list payload by prefetch()
+    prefetched = None
+
+    def parse_pks(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        pk_field = child.get_queryset().model._meta.pk
+        pks = []
+        for item in data:
+            try:
+                if isinstance(item, bool):
+                    raise TypeError
+                pks.append(pk_field.to_python(item))
+            except (TypeError, ValueError, DjangoValidationError):
+                child.fail('incorrect_type', data_type=type(item).__name__)
+
+        return pks
+
+    def prefetch(self, items):
+        """Resolve the keys of every item of a list payload in one query
+
+        Invalid values are skipped here; validating the item reports them.
+        """
+        pks = set()
+        for item in items:
+            if isinstance(item, Mapping) and self.field_name in item:
+                try:
+                    pks.update(self.parse_pks(item[self.field_name]))
+                except serializers.ValidationError:
+                    pass
+        self.prefetched = self.child_relation.get_queryset().in_bulk(pks)
+
+    def to_internal_value(self, data):
+        pks = self.parse_pks(data)
+        child = self.child_relation
+        if self.prefetched is not None:
+            objects = self.prefetched
+        else:
+            objects = child.get_queryset().in_bulk(pks)
+        missing = [pk for pk in dict.fromkeys(pks) if pk not in objects]
+        if missing:
+            raise serializers.ValidationError(
+                [
+                    child.error_messages['does_not_exist'].format(pk_value=pk)
+                    for pk in missing
+                ],
+                code='does_not_exist',
+            )
+
+        return [objects[pk] for pk in pks]
+
+
+class UserPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key field limited to objects owned by the requesting user"""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = self.context.get('request')
+        if request is None:
+            return queryset.none()
+
+        return queryset.filter(user=request.user)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return UserPrimaryKeysField(**list_kwargs)
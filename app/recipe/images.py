@@ -0,0 +1,225 @@
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection
+
+from PIL import Image
+
+from core.models import CollectionVersion, Recipe
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RECIPE_IMAGE_DERIVATIVES = {
+    'SIZES': (200, 800),
+    'FORMATS': ('JPEG', 'WEBP'),
+    'QUALITY': 85,
+    # 0 renders derivatives inline, which is only meant for tests
+    'WORKERS': 2,
+}
+
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp', 'PNG': 'png'}
+
+
+def get_derivative_options():
+    return {
+        **DEFAULT_RECIPE_IMAGE_DERIVATIVES,
+        **getattr(settings, 'RECIPE_IMAGE_DERIVATIVES', {}),
+    }
+
+
+def derivative_name(image_name, size, image_format):
+    '''Return the storage name of one derivative of an image'''
+    directory, filename = os.path.split(image_name)
+    stem = os.path.splitext(filename)[0]
+    ext = EXTENSIONS[image_format]
+
+    return os.path.join(directory, 'derivatives', f'{stem}_{size}.{ext}')
+
+
+def derivative_names(image_name, sizes, formats):
+    '''Return {key: storage name} for every derivative of an image'''
+    return {
+        f'{size}_{EXTENSIONS[image_format]}': derivative_name(image_name, size, image_format)
+        for size in sizes
+        for image_format in formats
+    }
+
+
+def existing_derivatives(media_root, image_name, sizes, formats):
+    '''Return the derivative names if every one has been rendered, or None
+
+    Images are named by content digest, so derivatives rendered for another
+    recipe with the same image are reused as they are.
+    '''
+    names = derivative_names(image_name, sizes, formats)
+    if all(os.path.exists(os.path.join(media_root, name)) for name in names.values()):
+        return names
+
+    return None
+
+
+def save_atomic(image, path, **params):
+    '''Write an image to a temporary file beside path and move it into place
+
+    Derivatives are shared and served as immutable, so a reader must never
+    see a partly written file.
+    '''
+    directory, filename = os.path.split(path)
+    fd, temp_path = tempfile.mkstemp(prefix=f'.{filename}.', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            image.save(file, **params)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def render_derivatives(source_path, media_root, image_name, sizes, formats, quality):
+    '''Write resized copies of an image and return their storage names
+
+    Runs in a worker process, so it only touches the filesystem and never
+    the database. Copies already on disk are kept.
+    '''
+    derivatives = {}
+    with Image.open(source_path) as original:
+        original.load()
+        for size in sizes:
+            resized = original.copy()
+            resized.thumbnail((size, size))
+            for image_format in formats:
+                name = derivative_name(image_name, size, image_format)
+                derivatives[f'{size}_{EXTENSIONS[image_format]}'] = name
+                path = os.path.join(media_root, name)
+                if os.path.exists(path):
+                    continue
+                image = resized
+                if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+                    image = image.convert('RGB')
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                save_atomic(image, path, format=image_format, quality=quality)
+
+    return derivatives
+
+
+def store_derivatives(recipe_id, user_id, image_name, derivatives):
+    '''Record generated derivatives if the recipe still has the same image'''
+    updated = Recipe.objects.filter(pk=recipe_id, image=image_name).update(
+        image_derivatives=derivatives
+    )
+    if updated:
+        # update() sends no signals, so cached responses are dropped here
+        CollectionVersion.objects.bump(user_id)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor(workers):
+    '''Return the process pool that renders derivatives'''
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=workers)
+
+    return _executor
+
+
+def discard_executor(executor):
+    '''Drop a broken pool, so the next call to get_executor starts a new one'''
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+
+def submit_render(workers, args):
+    '''Submit a render, returning (pool, future), replacing a broken pool once
+
+    A worker killed mid render, e.g. by the OOM killer, breaks the whole pool
+    and every later submit to it fails.
+    '''
+    executor = get_executor(workers)
+    try:
+        return executor, executor.submit(render_derivatives, *args)
+    except BrokenProcessPool:
+        discard_executor(executor)
+
+    executor = get_executor(workers)
+
+    return executor, executor.submit(render_derivatives, *args)
+
+
+def schedule_derivatives(recipe):
+    '''Generate derivatives for a recipe image off the request path
+
+    Derivatives are optional, so failures are logged rather than raised;
+    the upload has already been committed when this runs.
+    '''
+    options = get_derivative_options()
+    image_name = recipe.image.name
+    args = (
+        recipe.image.path,
+        str(settings.MEDIA_ROOT),
+        image_name,
+        options['SIZES'],
+        options['FORMATS'],
+        options['QUALITY'],
+    )
+    try:
+        derivatives = existing_derivatives(
+            str(settings.MEDIA_ROOT), image_name, options['SIZES'], options['FORMATS']
+        )
+        if derivatives is not None:
+            store_derivatives(recipe.pk, recipe.user_id, image_name, derivatives)
+            return
+    except Exception:
+        logger.exception('Could not store derivatives of %s', image_name)
+        return
+
+    if not options['WORKERS']:
+        try:
+            store_derivatives(
+                recipe.pk, recipe.user_id, image_name, render_derivatives(*args)
+            )
+        except Exception:
+            logger.exception('Could not generate derivatives of %s', image_name)
+        return
+
+    def done(future):
+        # Called on a thread of this process once the worker finishes
+        try:
+            store_derivatives(recipe.pk, recipe.user_id, image_name, future.result())
+        except Exception as exc:
+            if isinstance(exc, BrokenProcessPool):
+                discard_executor(executor)
+            logger.exception('Could not generate derivatives of %s', image_name)
+        finally:
+            connection.close()
+
+    try:
+        executor, future = submit_render(options['WORKERS'], args)
+    except Exception:
+        logger.exception('Could not schedule derivatives of %s', image_name)
+        return
+    future.add_done_callback(done)
+
+
+def derivative_urls(recipe, request=None):
+    '''Return the URLs of a recipe's ready derivatives'''
+    urls = {}
+    for key, name in (recipe.image_derivatives or {}).items():
+        url = default_storage.url(name)
+        urls[key] = request.build_absolute_uri(url) if request else url
+
+    return urls
@@ -0,0 +1,222 @@
+import csv
+import io
+import json
+from collections import Counter
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+
+from core import stats
+from core.models import CollectionVersion, Ingredient, Recipe, Tag
+from recipe.serializers import bulk_insert
+
+
+# Recipe fields read from each record; id and image in exports are ignored
+IMPORT_FIELDS = ('title', 'time_minutes', 'price', 'link')
+# Relations given as lists of names, resolved to the user's objects
+IMPORT_RELATIONS = {'tags': Tag, 'ingredients': Ingredient}
+
+
+class InvalidRecord(ValueError):
+    '''Raised for a record that cannot be imported'''
+
+    def __init__(self, row, message):
+        super().__init__(f'Record {row}: {message}')
+        self.row = row
+
+
+class RecordReader:
+    '''Read NDJSON or CSV records, tracking the byte offset after each one
+
+    The file must be opened in binary mode. Offsets count the bytes of the
+    lines consumed so far, so a reader created with a saved offset picks up
+    at the record after it. CSV headers are always read from the start.
+    '''
+
+    def __init__(self, file, fmt, offset=0):
+        self.file = file
+        self.fmt = fmt
+        self.offset = 0
+        self.header = None
+        if fmt == 'csv':
+            self.header = next(csv.reader(self._lines()), None)
+            if self.header:
+                self.header[0] = self.header[0].lstrip('\ufeff')
+        if offset:
+            self.file.seek(offset)
+            self.offset = offset
+
+    def _lines(self):
+        for raw in self.file:
+            self.offset += len(raw)
+            yield raw.decode('utf-8')
+
+    def __iter__(self):
+        '''Yield (record, offset after the record) pairs
+
+        Records are dicts for CSV and undecoded lines for NDJSON.
+        '''
+        if self.fmt == 'csv':
+            if self.header is None:
+                return
+            for values in csv.reader(self._lines()):
+                if values:
+                    yield dict(zip(self.header, values)), self.offset
+        else:
+            # Lines are decoded by parse_record, so a bad one can be skipped
+            for line in self._lines():
+                if line.strip():
+                    yield line, self.offset
+
+
+def _names(value):
+    '''Return a relation's names, given as a list or as a CSV cell'''
+    if value in (None, ''):
+        return []
+    if isinstance(value, str):
+        # CSV exports hold the names as a JSON array
+        value = json.loads(value)
+    if not isinstance(value, list):
+        raise ValueError('expected a list of names')
+
+    return list(dict.fromkeys(str(name).strip() for name in value if str(name).strip()))
+
+
+def parse_record(row, record):
+    '''Validate a raw record, returning (recipe fields, {relation: names})'''
+    if isinstance(record, str):
+        try:
+            record = json.loads(record)
+        except ValueError as exc:
+            raise InvalidRecord(row, f'invalid JSON: {exc}')
+    if not isinstance(record, dict):
+        raise InvalidRecord(row, 'expected an object')
+
+    fields = {}
+    for name in IMPORT_FIELDS:
+        field = Recipe._meta.get_field(name)
+        value = record.get(name)
+        if value is None and field.blank:
+            value = ''
+        try:
+            fields[name] = field.clean(value, None)
+        except ValidationError as exc:
+            raise InvalidRecord(row, f'{name}: {" ".join(exc.messages)}')
+
+    relations = {}
+    for name, model in IMPORT_RELATIONS.items():
+        try:
+            relations[name] = _names(record.get(name))
+        except ValueError as exc:
+            raise InvalidRecord(row, f'{name}: {exc}')
+        max_length = model._meta.get_field('name').max_length
+        if any(len(value) > max_length for value in relations[name]):
+            raise InvalidRecord(row, f'{name}: names are limited to {max_length} characters')
+
+    return fields, relations
+
+
+def resolve_names(model, user, names):
+    '''Return {name: pk} for names and how many missing objects were created
+
+    Existing duplicates resolve to the oldest object of that name.
+    '''
+    if not names:
+        return {}, 0
+
+    def lookup(wanted):
+        rows = model.objects.filter(user=user, name__in=wanted).order_by('-id')
+        return dict(rows.values_list('name', 'id'))
+
+    ids = lookup(names)
+    missing = sorted(name for name in names if name not in ids)
+    if missing:
+        model.objects.bulk_create([model(user=user, name=name) for name in missing])
+        # Not every backend returns primary keys from bulk_create
+        ids.update(lookup(missing))
+
+    return ids, len(missing)
+
+
+def insert_links(through, columns, links, use_copy):
+    '''Insert through table rows, with COPY on Postgres when use_copy is set
+
+    Rows are sent as plain tuples either way; building a model instance per
+    link would cost more than the insert itself.
+    '''
+    if not links:
+        return
+
+    quote = connection.ops.quote_name
+    table = quote(through._meta.db_table)
+    column_list = ', '.join(quote(column) for column in columns)
+    with connection.cursor() as cursor:
+        if not (use_copy and connection.vendor == 'postgresql'):
+            cursor.executemany(
+                f'INSERT INTO {table} ({column_list}) '
+                f'VALUES ({", ".join(["%s"] * len(columns))})',
+                links,
+            )
+            return
+
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(links)
+        buffer.seek(0)
+        cursor.copy_expert(
+            f'COPY {table} ({column_list}) FROM STDIN WITH (FORMAT csv)', buffer
+        )
+
+
+def insert_recipes(user, recipes):
+    '''Bulk insert a user's recipes, returning them with primary keys set'''
+    if connection.vendor != 'sqlite' or connection.features.can_return_rows_from_bulk_insert:
+        return bulk_insert(Recipe, recipes)
+
+    # bulk_insert would save row by row here. In the batch transaction
+    # SQLite holds the write lock from the first insert on, so the newest
+    # rows of the user are this batch, with ascending keys.
+    Recipe.objects.bulk_create(recipes)
+    pks = Recipe.objects.filter(user=user).order_by('-id').values_list('id', flat=True)
+    for recipe, pk in zip(recipes, reversed(pks[:len(recipes)])):
+        recipe.pk = pk
+    CollectionVersion.objects.bump(user.pk)
+    stats.record_created(recipes)
+
+    return recipes
+
+
+def load_batch(user, records, use_copy=True):
+    '''Insert parsed records with their relations, returning created counts
+
+    Meant to run in a transaction. The summary and recipe counts that
+    signals would maintain are updated here, as bulk inserts send none.
+    '''
+    names = {name: set() for name in IMPORT_RELATIONS}
+    for _, relations in records:
+        for name, values in relations.items():
+            names[name].update(values)
+    created = {}
+    ids = {}
+    for name, model in IMPORT_RELATIONS.items():
+        # The lookup cache for this batch, one query for all its names
+        ids[name], created[name] = resolve_names(model, user, names[name])
+
+    recipes = insert_recipes(user, [Recipe(user=user, **fields) for fields, _ in records])
+    created['recipes'] = len(recipes)
+
+    for name, model in IMPORT_RELATIONS.items():
+        field = Recipe._meta.get_field(name)
+        columns = (
+            f'{field.m2m_field_name()}_id',
+            f'{field.m2m_reverse_field_name()}_id',
+        )
+        links = [
+            (recipe.pk, ids[name][value])
+            for recipe, (_, relations) in zip(recipes, records)
+            for value in relations[name]
+        ]
+        insert_links(field.remote_field.through, columns, links, use_copy)
+        model.objects.add_recipe_counts(Counter(pk for _, pk in links))
+        stats.record_links(name, [(user.pk, pk) for _, pk in links])
+
+    return created
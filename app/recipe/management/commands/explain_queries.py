@@ -0,0 +1,124 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from rest_framework.test import APIRequestFactory
+
+from core.seed import seed_users
+from recipe import views
+
+
+# Indexes added for the per-user access patterns
+INDEXES = (
+    'core_tag_user_name_idx',
+    'core_ingr_user_name_idx',
+    'core_recipe_user_id_idx',
+    'core_recipe_tags_tag_recipe_idx',
+    'core_recipe_ingr_ingr_recipe_idx',
+    'core_recipe_search_idx',
+    'core_tag_user_count_idx',
+    'core_ingr_user_count_idx',
+)
+
+
+class Rollback(Exception):
+    '''Raised to discard the seeded dataset'''
+
+
+def viewset_queryset(viewset_class, user, params=None, paginate=True):
+    '''Return the list queryset a viewset runs for a user'''
+    view = viewset_class(action_map={'get': 'list'})
+    request = view.initialize_request(APIRequestFactory().get('/', params or {}))
+    request.user = user
+    view.request = request
+    view.action = 'list'
+    view.format_kwarg = None
+    view.kwargs = {}
+
+    queryset = view.get_queryset()
+    paginator = view.paginator
+    if paginate and paginator is not None:
+        ordering = paginator.get_ordering(request, queryset, view)
+        queryset = queryset.order_by(*ordering)[: paginator.page_size + 1]
+
+    return queryset
+
+
+def hot_queries(user):
+    '''Return the named querysets the list endpoints issue for a user'''
+    tag_id = user.tag_set.values_list('id', flat=True).first()
+    ingredient_id = user.ingredient_set.values_list('id', flat=True).first()
+
+    return {
+        'tag list': viewset_queryset(views.TagViewSet, user),
+        'tag list (assigned_only)': viewset_queryset(
+            views.TagViewSet, user, {'assigned_only': 1}
+        ),
+        'tag list (popular)': viewset_queryset(
+            views.TagViewSet, user, {'ordering': '-recipe_count'}
+        ),
+        'ingredient list': viewset_queryset(views.IngredientViewSet, user),
+        'ingredient list (popular)': viewset_queryset(
+            views.IngredientViewSet, user, {'ordering': '-recipe_count'}
+        ),
+        'recipe list': viewset_queryset(views.RecipeViewSet, user),
+        'recipe list (tags)': viewset_queryset(
+            views.RecipeViewSet, user, {'tags': tag_id}
+        ),
+        'recipe list (ingredients)': viewset_queryset(
+            views.RecipeViewSet, user, {'ingredients': ingredient_id}
+        ),
+        'recipe list (search)': viewset_queryset(
+            views.RecipeViewSet, user, {'search': 'recipe'}
+        ),
+    }
+
+
+class Command(BaseCommand):
+    '''Django command to EXPLAIN the hot viewset queries on seeded data'''
+
+    help = 'Seed a throwaway dataset and EXPLAIN the list endpoint queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--recipes', type=int, default=500)
+        parser.add_argument('--attrs', type=int, default=50)
+        parser.add_argument(
+            '--keep', action='store_true', help='Keep the seeded data'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._explain(options)
+                if not options['keep']:
+                    raise Rollback
+        except Rollback:
+            self.stdout.write('Seeded data discarded.')
+
+    def _explain(self, options):
+        self.stdout.write('Seeding dataset...')
+        users = seed_users(
+            options['users'], recipes=options['recipes'], attrs=options['attrs']
+        )
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        missing = []
+        for name, queryset in hot_queries(users[-1]).items():
+            plan = queryset.explain()
+            used = [index for index in INDEXES if index in plan]
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(plan)
+            if used:
+                self.stdout.write(self.style.SUCCESS(f'Uses {", ".join(used)}'))
+            else:
+                missing.append(name)
+                self.stdout.write(self.style.WARNING('Uses none of the new indexes'))
+
+        if missing:
+            self.stdout.write(
+                self.style.WARNING(f'No composite index used by: {", ".join(missing)}')
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS('All hot queries use the indexes'))
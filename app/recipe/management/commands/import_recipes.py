@@ -0,0 +1,129 @@
+import os
+import time
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import ImportCheckpoint
+from recipe.importer import InvalidRecord, RecordReader, load_batch, parse_record
+
+
+class Command(BaseCommand):
+    '''Django command to bulk load a user's recipes from NDJSON or CSV'''
+
+    help = (
+        'Import recipes, with tags and ingredients by name, in the format of '
+        '/recipes/export/. Reruns resume after the last committed batch.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='NDJSON or CSV file to import')
+        parser.add_argument(
+            '--user', required=True, help='Email or ID of the user to import for'
+        )
+        parser.add_argument(
+            '--format',
+            choices=('ndjson', 'csv'),
+            help='File format (default from the extension, .csv or NDJSON)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Records inserted and committed per transaction',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Import from the start, ignoring the saved progress',
+        )
+        parser.add_argument(
+            '--skip-invalid',
+            action='store_true',
+            help='Report invalid records and carry on instead of stopping',
+        )
+        parser.add_argument(
+            '--no-copy',
+            dest='use_copy',
+            action='store_false',
+            help='Insert relation rows with INSERT rather than COPY on Postgres',
+        )
+
+    def handle(self, *args, **options):
+        user = self._user(options['user'])
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+            user=user, source=os.path.abspath(path)
+        )
+        if options['restart']:
+            checkpoint.offset = checkpoint.rows = 0
+            checkpoint.save()
+        elif checkpoint.rows:
+            self.stdout.write(f'Resuming after record {checkpoint.rows}')
+
+        start = time.monotonic()
+        first_row = row = checkpoint.rows
+        totals = Counter()
+        batch = []
+        try:
+            with open(path, 'rb') as f:
+                reader = RecordReader(f, fmt, checkpoint.offset)
+                for record, offset in reader:
+                    row += 1
+                    try:
+                        batch.append(parse_record(row, record))
+                    except InvalidRecord as exc:
+                        if not options['skip_invalid']:
+                            raise
+                        totals['skipped'] += 1
+                        self.stderr.write(str(exc))
+                    if len(batch) == options['batch_size']:
+                        self._commit(user, checkpoint, batch, offset, row, totals, options)
+                        batch = []
+                        self._progress(row - first_row, start, options)
+
+                self._commit(user, checkpoint, batch, reader.offset, row, totals, options)
+        except Exception as exc:
+            raise CommandError(
+                f'Import stopped: {exc}. Records up to {checkpoint.rows} are '
+                'committed; rerun the command to resume after them.'
+            ) from exc
+
+        elapsed = time.monotonic() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Imported {totals["recipes"]} recipes ({totals["tags"]} new tags, '
+                f'{totals["ingredients"]} new ingredients, {totals["skipped"]} '
+                f'skipped) in {elapsed:.2f}s: '
+                f'{(row - first_row) / max(elapsed, 1e-9):.0f} rows/s'
+            )
+        )
+
+    def _user(self, value):
+        User = get_user_model()
+        lookup = {'pk': int(value)} if value.isdigit() else {'email': value}
+        try:
+            return User.objects.get(**lookup)
+        except User.DoesNotExist:
+            raise CommandError(f'No user {value}')
+
+    def _commit(self, user, checkpoint, batch, offset, row, totals, options):
+        '''Load a batch and move the checkpoint past it in one transaction'''
+        with transaction.atomic():
+            if batch:
+                totals.update(load_batch(user, batch, options['use_copy']))
+            ImportCheckpoint.objects.filter(pk=checkpoint.pk).update(
+                offset=offset, rows=row, updated_at=timezone.now()
+            )
+        checkpoint.offset, checkpoint.rows = offset, row
+
+    def _progress(self, rows, start, options):
+        if options['verbosity'] > 1:
+            elapsed = time.monotonic() - start
+            self.stdout.write(
+                f'{rows} records in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):.0f} rows/s)'
+            )
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe.cache import get_response_cache
+
+
+class Command(BaseCommand):
+    '''Django command to report how often the response cache is hit'''
+
+    help = 'Print the response cache hit and miss counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true', help='Set the counters to zero after printing'
+        )
+
+    def handle(self, *args, **options):
+        response_cache = get_response_cache()
+        if response_cache is None:
+            raise CommandError('The response cache is disabled')
+
+        stats = response_cache.stats()
+        lookups = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / lookups if lookups else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{stats["hits"]} hits, {stats["misses"]} misses '
+                f'({ratio:.1%} hit ratio)'
+            )
+        )
+        if options['reset']:
+            response_cache.reset_stats()
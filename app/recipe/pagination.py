@@ -0,0 +1,149 @@
+import json
+
+from django.db.models import Q
+
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetCursorPagination(CursorPagination):
+    '''Cursor pagination whose position holds every ordering field
+
+    DRF's cursor only holds the first ordering field and steps over rows
+    sharing its value with an OFFSET, which grows with the number of ties,
+    e.g. every unused tag at recipe_count 0. Here the orderings end in a
+    unique field and the position holds all of them, so each page starts
+    right after the previous one's last row and costs the same however
+    deep it is.
+    '''
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [
+                name[1:] if name.startswith('-') else f'-{name}' for name in ordering
+            ]
+        queryset = queryset.order_by(*ordering)
+        if current_position is not None:
+            queryset = queryset.filter(self.after_position(ordering, current_position))
+
+        # Positions are unique, so the links built from them have no offset
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def after_position(self, ordering, position):
+        '''Return a filter for the rows after a position in an ordering
+
+        (a, b) > (x, y) is spelled a > x OR (a = x AND b > y), with a
+        redundant a >= x the database can use as an index range.
+        '''
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        conditions = [
+            (name.lstrip('-'), 'lt' if name.startswith('-') else 'gt', value)
+            for name, value in zip(ordering, values)
+        ]
+        name, lookup, value = conditions[-1]
+        after = Q(**{f'{name}__{lookup}': value})
+        for name, lookup, value in reversed(conditions[:-1]):
+            after = Q(**{f'{name}__{lookup}': value}) | (Q(**{name: value}) & after)
+        name, lookup, value = conditions[0]
+
+        return Q(**{f'{name}__{lookup}e': value}) & after
+
+    def _get_position_from_instance(self, instance, ordering):
+        names = [name.lstrip('-') for name in ordering]
+        if isinstance(instance, dict):
+            values = [instance[name] for name in names]
+        else:
+            values = [getattr(instance, name) for name in names]
+
+        return json.dumps(values)
+
+
+class RecipeAttrCursorPagination(KeysetCursorPagination):
+    '''Keyset pagination for tags and ingredients, newest name first'''
+
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    # Every ordering ends in id, which makes cursor positions unique
+    ordering = ('-name', 'id')
+    # Orderings selectable with ?ordering=, each backed by an index
+    orderings = {
+        '-name': ('-name', 'id'),
+        '-recipe_count': ('-recipe_count', 'id'),
+    }
+
+    def get_ordering(self, request, queryset, view):
+        value = request.query_params.get('ordering')
+        if not value:
+            return self.ordering
+        if value not in self.orderings:
+            raise ValidationError(
+                {'ordering': f'Must be one of: {", ".join(self.orderings)}.'}
+            )
+
+        return self.orderings[value]
+
+
+class RecipeCursorPagination(KeysetCursorPagination):
+    '''Keyset pagination for recipes in insertion order'''
+
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('id',)
+
+    def get_ordering(self, request, queryset, view):
+        '''Order search results by relevance, best match first'''
+        if 'rank' in queryset.query.annotations:
+            return ('-rank', 'id')
+
+        return super().get_ordering(request, queryset, view)
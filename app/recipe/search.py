@@ -0,0 +1,51 @@
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+
+# Text search configuration used by the trigger maintaining search_vector
+SEARCH_CONFIG = 'pg_catalog.english'
+
+
+def search_recipes(queryset, text):
+    '''Filter recipes whose title matches a search, annotating their rank
+
+    Postgres matches against the trigger maintained search_vector column
+    with its GIN index. Other databases fall back to requiring every word
+    as a case insensitive substring of the title, without ranking.
+    '''
+    if connections[queryset.db].vendor == 'postgresql':
+        return _postgres_search(queryset, text)
+
+    words = text.split()
+    if not words:
+        return queryset
+
+    condition = Q()
+    for word in words:
+        condition &= Q(title__icontains=word)
+    return queryset.filter(condition)
+
+
+def _postgres_search(queryset, text):
+    # search_vector is only created on Postgres, so it is not a model field
+    column = '{}.search_vector'.format(
+        connections[queryset.db].ops.quote_name(queryset.model._meta.db_table)
+    )
+    tsquery = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+
+    return (
+        queryset.alias(
+            search_matched=RawSQL(
+                f'{column} @@ {tsquery}', (text,), output_field=BooleanField()
+            )
+        )
+        .filter(search_matched=True)
+        .annotate(
+            # ts_rank returns real, but cursor positions are compared as
+            # float8; ranking in float8 keeps boundary rows on one page
+            rank=RawSQL(
+                f'ts_rank({column}, {tsquery})::float8', (text,), output_field=FloatField()
+            )
+        )
+    )
@@ -1,38 +1,178 @@
+import heapq
+from collections import Counter
+
+from django.db import connection
+
 from rest_framework import serializers
 
-from core.models import Tag, Ingredient, Recipe
+from core import stats
+from core.models import TIME_BUCKETS, CollectionVersion, Tag, Ingredient, Recipe, RecipeStats
+
+from recipe.fields import UserPrimaryKeyRelatedField, UserPrimaryKeysField
+from recipe.images import derivative_urls
+
+
+def bulk_insert(model, objs):
+    '''Insert user owned objects, returning them with primary keys set'''
+    if not connection.features.can_return_rows_from_bulk_insert:
+        # Backends that cannot return the new keys fall back to row inserts
+        for obj in objs:
+            obj.save(force_insert=True)
+        return objs
+
+    objs = model.objects.bulk_create(objs)
+    # bulk_create sends no post_save signals
+    for user_id in {obj.user_id for obj in objs}:
+        CollectionVersion.objects.bump(user_id)
+    if model is Recipe:
+        stats.record_created(objs)
+    return objs
+
+
+def requested_fields(request):
+    '''Return the field names asked for with ?fields= on a read, or None'''
+    if request is None or request.method != 'GET':
+        return None
+    fields = request.query_params.get('fields')
+    if not fields:
+        return None
+
+    return {name.strip() for name in fields.split(',') if name.strip()}
+
+
+class SparseFieldsMixin:
+    """Drop the fields a read request did not ask for with ?fields=
+
+    Unknown names are rejected, rather than answered with empty objects.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = requested_fields(self.context.get('request'))
+        if fields:
+            if not fields <= set(self.fields):
+                raise serializers.ValidationError(
+                    {'fields': f'Must be a comma separated list of: {", ".join(self.fields)}.'}
+                )
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+
+
+class BulkCreateListSerializer(serializers.ListSerializer):
+    """Serializer creating a list of simple objects with one INSERT"""
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        return bulk_insert(model, [model(**attrs) for attrs in validated_data])
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    """Serializer creating a list of recipes and their relations in bulk"""
+
+    def to_internal_value(self, data):
+        """Validate every recipe, looking each relation's keys up once"""
+        fields = [
+            field for field in self.child.fields.values()
+            if isinstance(field, UserPrimaryKeysField)
+        ]
+        if isinstance(data, list):
+            for field in fields:
+                field.prefetch(data)
+        try:
+            return super().to_internal_value(data)
+        finally:
+            for field in fields:
+                field.prefetched = None
+
+    def create(self, validated_data):
+        relations = [
+            (attrs.pop('tags', []), attrs.pop('ingredients', []))
+            for attrs in validated_data
+        ]
+        recipes = bulk_insert(Recipe, [Recipe(**attrs) for attrs in validated_data])
 
+        tag_links = []
+        ingredient_links = []
+        TagThrough = Recipe.tags.through
+        IngredientThrough = Recipe.ingredients.through
+        for recipe, (tags, ingredients) in zip(recipes, relations):
+            tag_links += [
+                TagThrough(recipe_id=recipe.pk, tag_id=tag.pk) for tag in set(tags)
+            ]
+            ingredient_links += [
+                IngredientThrough(recipe_id=recipe.pk, ingredient_id=ingredient.pk)
+                for ingredient in set(ingredients)
+            ]
+        TagThrough.objects.bulk_create(tag_links)
+        IngredientThrough.objects.bulk_create(ingredient_links)
+        # Bulk created links send no m2m_changed signals
+        Tag.objects.add_recipe_counts(Counter(link.tag_id for link in tag_links))
+        Ingredient.objects.add_recipe_counts(
+            Counter(link.ingredient_id for link in ingredient_links)
+        )
+        owners = {recipe.pk: recipe.user_id for recipe in recipes}
+        stats.record_links(
+            'tags', [(owners[link.recipe_id], link.tag_id) for link in tag_links]
+        )
+        stats.record_links(
+            'ingredients',
+            [(owners[link.recipe_id], link.ingredient_id) for link in ingredient_links],
+        )
 
-class TagSerializer(serializers.ModelSerializer):
+        return list(
+            Recipe.objects.filter(pk__in=[recipe.pk for recipe in recipes])
+            .order_by('id')
+            .prefetch_related('tags', 'ingredients')
+        )
+
+
+class TagSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for tag object"""
 
     class Meta:
         model = Tag
         fields = ('id', 'name')
         read_only_fields = ('id',)
+        list_serializer_class = BulkCreateListSerializer
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for an ingredient object"""
 
     class Meta:
         model = Ingredient
         fields = ('id', 'name')
         read_only_fields = ('id',)
+        list_serializer_class = BulkCreateListSerializer
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for a recipe object"""
 
-    ingredients = serializers.PrimaryKeyRelatedField(
+    ingredients = UserPrimaryKeyRelatedField(
         many=True, queryset=Ingredient.objects.all()
     )
-    tags = serializers.PrimaryKeyRelatedField(many=True, queryset=Tag.objects.all())
+    tags = UserPrimaryKeyRelatedField(many=True, queryset=Tag.objects.all())
+    image_derivatives = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'title', 'ingredients', 'tags', 'time_minutes', 'price', 'link')
+        fields = (
+            'id',
+            'title',
+            'ingredients',
+            'tags',
+            'time_minutes',
+            'price',
+            'link',
+            'image_derivatives',
+        )
         read_only_fields = ('id',)
+        list_serializer_class = RecipeListSerializer
+
+    def get_image_derivatives(self, obj):
+        '''Return URLs of the resized images that are ready'''
+        return derivative_urls(obj, self.context.get('request'))
 
 
 class RecipeDetailSerializer(RecipeSerializer):
@@ -45,7 +185,79 @@ class RecipeDetailSerializer(RecipeSerializer):
 class RecipeImageSerializer(serializers.ModelSerializer):
     '''Serializer for uploading images to recipes'''
 
+    image_derivatives = serializers.SerializerMethodField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'image')
+        fields = ('id', 'image', 'image_derivatives')
         read_only_fields = ('id',)
+
+    def get_image_derivatives(self, obj):
+        '''Return URLs of the resized images that are ready'''
+        return derivative_urls(obj, self.context.get('request'))
+
+
+class RecipeStatsSerializer(serializers.ModelSerializer):
+    """Serializer for a user's recipe summary
+
+    Everything is read from the precomputed RecipeStats row, plus one query
+    per top list for the names.
+    """
+
+    average_price = serializers.SerializerMethodField()
+    average_time_minutes = serializers.SerializerMethodField()
+    time_distribution = serializers.SerializerMethodField()
+    top_tags = serializers.SerializerMethodField()
+    top_ingredients = serializers.SerializerMethodField()
+
+    class Meta:
+        model = RecipeStats
+        fields = (
+            'recipe_count',
+            'average_price',
+            'average_time_minutes',
+            'time_distribution',
+            'top_tags',
+            'top_ingredients',
+        )
+
+    def get_average_price(self, obj):
+        if not obj.recipe_count:
+            return None
+
+        return str((obj.price_total / obj.recipe_count).quantize(stats.CENT))
+
+    def get_average_time_minutes(self, obj):
+        if not obj.recipe_count:
+            return None
+
+        return round(obj.time_total / obj.recipe_count, 1)
+
+    def get_time_distribution(self, obj):
+        return [
+            {'max_minutes': upper, 'recipe_count': count}
+            for upper, count in zip(TIME_BUCKETS + (None,), obj.time_buckets)
+        ]
+
+    def get_top_tags(self, obj):
+        return self._top(Tag, obj.tag_counts)
+
+    def get_top_ingredients(self, obj):
+        return self._top(Ingredient, obj.ingredient_counts)
+
+    def _top(self, model, counts):
+        ranked = heapq.nsmallest(
+            self.context.get('top', 5),
+            ((-count, int(pk)) for pk, count in counts.items()),
+        )
+        names = dict(
+            model.objects.filter(pk__in=[pk for _, pk in ranked]).values_list(
+                'id', 'name'
+            )
+        )
+
+        return [
+            {'id': pk, 'name': names[pk], 'recipe_count': -count}
+            for count, pk in ranked
+            if pk in names
+        ]
@@ -0,0 +1,151 @@
+'''Load test the WSGI and ASGI request paths at high concurrency
+
+Drives Django's WSGIHandler from a pool of threads, standing in for a
+threaded WSGI server, and ASGIHandler from a single event loop with many
+requests in flight. Both get the same number of threads for database work.
+Every query is delayed to simulate the round trip to a remote Postgres,
+which is where the async recipe detail view gains by loading tags and
+ingredients concurrently.
+
+Run with: python manage.py test -p "bench_*.py" recipe
+'''
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db.backends.utils import CursorWrapper
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from django.urls import path
+
+from rest_framework.authtoken.models import Token
+
+from core.authentication import get_token_cache
+from core.models import Ingredient, Recipe, Tag
+from recipe import views
+
+
+REQUESTS = 400
+CONCURRENCY = 64
+THREADS = 16
+# Seconds added to every query
+QUERY_LATENCY = 0.01
+
+urlpatterns = [
+    path(
+        'wsgi/recipes/<int:pk>/',
+        views.RecipeViewSet.as_view({'get': 'retrieve'}, basename='recipe'),
+    ),
+    path('wsgi/tags/', views.TagViewSet.as_view({'get': 'list'}, basename='tag')),
+    path(
+        'asgi/recipes/<int:pk>/',
+        views.AsyncRecipeViewSet.as_view({'get': 'retrieve'}, basename='recipe'),
+    ),
+    path('asgi/tags/', views.AsyncTagViewSet.as_view({'get': 'list'}, basename='tag')),
+]
+
+original_execute = CursorWrapper._execute
+
+
+def slow_execute(self, *args, **kwargs):
+    time.sleep(QUERY_LATENCY)
+    return original_execute(self, *args, **kwargs)
+
+
+@override_settings(
+    ROOT_URLCONF=__name__,
+    ASYNC_API={'THREADS': THREADS},
+    RESPONSE_CACHE={'CACHE_ALIAS': None},
+)
+class AsgiLoadBenchmark(TransactionTestCase):
+
+    def setUp(self):
+        get_token_cache().clear()
+        user = get_user_model().objects.create_user(  # type:ignore
+            'test@email.com', 'pass1234'
+        )
+        self.token = Token.objects.create(user=user).key
+        self.recipe = Recipe.objects.create(
+            user=user, title='Pancakes', time_minutes=5, price=3.00
+        )
+        self.recipe.tags.add(Tag.objects.create(user=user, name='Breakfast'))
+        self.recipe.ingredients.add(Ingredient.objects.create(user=user, name='Flour'))
+
+    def _wsgi(self, url):
+        handler = WSGIHandler()
+        environ = RequestFactory()._base_environ(
+            PATH_INFO=url, HTTP_AUTHORIZATION=f'Token {self.token}'
+        )
+
+        def request(_):
+            statuses = []
+            start = time.perf_counter()
+            body = handler(dict(environ), lambda status, headers: statuses.append(status))
+            b''.join(body)
+            body.close()
+            return statuses[0].startswith('200'), time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=THREADS) as pool:
+            results = list(pool.map(request, range(REQUESTS)))
+
+        return results, time.perf_counter() - start
+
+    def _asgi(self, url):
+        handler = ASGIHandler()
+        scope = {
+            'type': 'http',
+            'method': 'GET',
+            'path': url,
+            'query_string': b'',
+            'server': ('testserver', 80),
+            'headers': [(b'authorization', f'Token {self.token}'.encode())],
+        }
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def request(limit):
+            messages = []
+
+            async def send(message):
+                messages.append(message)
+
+            async with limit:
+                start = time.perf_counter()
+                await handler(dict(scope), receive, send)
+            return messages[0]['status'] == 200, time.perf_counter() - start
+
+        async def run():
+            limit = asyncio.Semaphore(CONCURRENCY)
+            return await asyncio.gather(*(request(limit) for _ in range(REQUESTS)))
+
+        start = time.perf_counter()
+        results = asyncio.run(run())
+
+        return results, time.perf_counter() - start
+
+    def test_wsgi_vs_asgi(self):
+        print(
+            f'\n{REQUESTS} requests, {CONCURRENCY} in flight under ASGI, '
+            f'{THREADS} threads, {QUERY_LATENCY * 1000:.0f}ms per query'
+        )
+        endpoints = (
+            ('recipe detail', f'recipes/{self.recipe.pk}/'),
+            ('tag list', 'tags/'),
+        )
+        with patch.object(CursorWrapper, '_execute', slow_execute):
+            for label, url in endpoints:
+                for name, run in (('WSGI', self._wsgi), ('ASGI', self._asgi)):
+                    results, elapsed = run(f'/{name.lower()}/{url}')
+                    latencies = sorted(latency for _, latency in results)
+                    print(
+                        f'{label:<14} {name}  {REQUESTS / elapsed:7.1f} req/s  '
+                        f'p50 {statistics.median(latencies) * 1000:6.1f}ms  '
+                        f'p95 {latencies[int(len(latencies) * 0.95)] * 1000:6.1f}ms  '
+                        f'{sum(ok for ok, _ in results)}/{REQUESTS} ok'
+                    )
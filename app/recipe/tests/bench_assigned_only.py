@@ -0,0 +1,50 @@
+'''Benchmark assigned_only filtering: JOIN + DISTINCT against EXISTS
+
+Run with: python manage.py test -p "bench_*.py" recipe
+'''
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+
+from core.models import Tag
+from core.seed import seed_user_data
+from recipe.management.commands.explain_queries import viewset_queryset
+from recipe.views import TagViewSet
+
+
+RECIPES = 10000
+ROUNDS = 20
+
+
+class AssignedOnlyBenchmark(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(  # type:ignore
+            'test@email.com', 'pass1234'
+        )
+        seed_user_data(cls.user, recipes=RECIPES, attrs=200, attrs_per_recipe=5)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def _time(self, queryset):
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            list(queryset.all())
+        return (time.perf_counter() - start) / ROUNDS * 1000
+
+    def test_benchmark_assigned_only(self):
+        join_distinct = (
+            Tag.objects.filter(user=self.user, recipe__isnull=False)
+            .order_by('-name')
+            .distinct()
+        )
+        exists = viewset_queryset(
+            TagViewSet, self.user, {'assigned_only': 1}, paginate=False
+        )
+        for name, queryset in (('JOIN + DISTINCT', join_distinct), ('EXISTS', exists)):
+            print(f'\n{name}\n{queryset.explain()}')
+            print(f'{self._time(queryset):.2f} ms/query')
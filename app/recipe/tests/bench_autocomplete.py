@@ -0,0 +1,62 @@
+'''Benchmark tag autocomplete for a user with tens of thousands of tags
+
+Compares the indexed prefix query with the in-process trie, both called
+directly so the timings leave out request handling.
+
+Run with: python manage.py test -p "bench_*.py" recipe
+'''
+import random
+import string
+import time
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from core.models import Tag
+from recipe.autocomplete import NameTrie, autocomplete
+
+
+TAGS = 50000
+QUERIES = 500
+LIMIT = 10
+
+
+class AutocompleteBenchmark(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(  # type:ignore
+            'test@email.com', 'pass1234'
+        )
+        rng = random.Random(0)
+        cls.names = [
+            ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 12))).title()
+            for _ in range(TAGS)
+        ]
+        Tag.objects.bulk_create(
+            [Tag(user=cls.user, name=name) for name in cls.names], batch_size=5000
+        )
+
+    def _prefixes(self):
+        rng = random.Random(1)
+        return [
+            name[: rng.randint(1, 4)] for name in rng.sample(self.names, QUERIES)
+        ]
+
+    def _time(self, label, func):
+        prefixes = self._prefixes()
+        start = time.perf_counter()
+        for prefix in prefixes:
+            func(prefix)
+        elapsed = time.perf_counter() - start
+        print(f'{label:<14} {elapsed / QUERIES * 1000:7.3f} ms/query')
+
+    def test_autocomplete(self):
+        queryset = Tag.objects.filter(user=self.user)
+        print(f'\n{TAGS} tags, top {LIMIT} matches')
+        self._time('database', lambda prefix: autocomplete(queryset, prefix, LIMIT))
+
+        start = time.perf_counter()
+        trie = NameTrie(queryset.values_list('id', 'name'))
+        print(f'{"trie build":<14} {(time.perf_counter() - start) * 1000:7.1f} ms')
+        self._time('trie', lambda prefix: trie.complete(prefix, LIMIT))
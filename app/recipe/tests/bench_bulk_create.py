@@ -0,0 +1,68 @@
+'''Benchmark single object POSTs against one bulk POST
+
+Run with: python manage.py test -p "bench_*.py" recipe
+'''
+import time
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Tag
+
+
+TAGS_URL = reverse('recipe:tag-list')
+RECIPES_URL = reverse('recipe:recipe-list')
+BATCH = 1000
+
+
+class BulkCreateBenchmark(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(  # type:ignore
+            'test@email.com', 'pass1234'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag_ids = [
+            Tag.objects.create(user=self.user, name=f'Base {i}').id for i in range(5)
+        ]
+
+    def _recipes(self):
+        return [
+            {
+                'title': f'Recipe {i}',
+                'tags': self.tag_ids,
+                'ingredients': [],
+                'time_minutes': 10,
+                'price': '5.00',
+            }
+            for i in range(BATCH)
+        ]
+
+    def _report(self, name, single, bulk):
+        print(
+            f'\n{name}: {BATCH / single:.0f} objects/s single, '
+            f'{BATCH / bulk:.0f} objects/s bulk ({single / bulk:.1f}x)'
+        )
+
+    def _time(self, url, payloads):
+        start = time.perf_counter()
+        for payload in payloads:
+            self.client.post(url, payload, format='json')
+        return time.perf_counter() - start
+
+    def test_benchmark_bulk_create(self):
+        tags = [{'name': f'Tag {i}'} for i in range(BATCH)]
+        self._report(
+            'tags', self._time(TAGS_URL, tags), self._time(TAGS_URL, [tags])
+        )
+
+        recipes = self._recipes()
+        self._report(
+            'recipes',
+            self._time(RECIPES_URL, recipes),
+            self._time(RECIPES_URL, [recipes]),
+        )
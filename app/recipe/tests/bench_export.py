@@ -0,0 +1,86 @@
+'''Benchmark exporting 100k recipes against paging through the list
+
+The export is consumed in full, as a client downloading it would. Peak
+memory allocated while streaming it is measured in a separate run.
+
+Run with: python manage.py test -p "bench_*.py" recipe
+'''
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.seed import seed_user_data
+
+
+RECIPES = 100000
+EXPORT_URL = reverse('recipe:recipe-export')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class ExportBenchmark(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(  # type:ignore
+            'test@email.com', 'pass1234'
+        )
+        seed_user_data(cls.user, recipes=RECIPES, attrs=50, attrs_per_recipe=3)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _export(self, params):
+        res = self.client.get(EXPORT_URL, params)
+        size = lines = 0
+        for block in res.streaming_content:
+            size += len(block)
+            lines += block.count(b'\n')
+
+        return size, lines
+
+    def _timed_export(self, params):
+        start = time.perf_counter()
+        size, lines = self._export(params)
+
+        return time.perf_counter() - start, size, lines
+
+    def _peak_memory(self, params):
+        # Tracing slows the export down, so it gets a run of its own
+        tracemalloc.start()
+        try:
+            self._export(params)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def _page(self):
+        start = time.perf_counter()
+        res = self.client.get(RECIPES_URL, {'page_size': 200})
+        rows = len(res.data['results'])
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            rows += len(res.data['results'])
+
+        return time.perf_counter() - start, rows
+
+    def test_benchmark_export(self):
+        for fmt in ('ndjson', 'csv'):
+            elapsed, size, lines = self._timed_export({'format': fmt})
+            peak = self._peak_memory({'format': fmt})
+            print(
+                f'\n{fmt} export: {RECIPES / elapsed:.0f} recipes/s, '
+                f'{size / 2 ** 20:.1f} MiB in {elapsed:.2f}s, '
+                f'{lines} lines, peak {peak / 2 ** 20:.1f} MiB allocated'
+            )
+
+        elapsed, rows = self._page()
+        print(
+            f'\nlist pages of 200: {rows / elapsed:.0f} recipes/s '
+            f'in {elapsed:.2f}s (no detail fetches)'
+        )
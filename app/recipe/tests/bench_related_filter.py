@@ -0,0 +1,59 @@
+'''Benchmark filtering recipes by many tag IDs
+
+Compares the previous JOIN based filter with the EXISTS (match=any) and
+grouped count (match=all) subqueries.
+
+Run with: python manage.py test -p "bench_*.py" recipe
+'''
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+
+from core.models import Recipe
+from core.seed import seed_user_data
+from recipe.management.commands.explain_queries import viewset_queryset
+from recipe.views import RecipeViewSet
+
+
+RECIPES = 10000
+FILTER_IDS = 30
+ROUNDS = 10
+
+
+class RelatedFilterBenchmark(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(  # type:ignore
+            'test@email.com', 'pass1234'
+        )
+        seed_user_data(cls.user, recipes=RECIPES, attrs=100, attrs_per_recipe=8)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def _time(self, queryset):
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            rows = list(queryset.all().values_list('id', flat=True))
+        return (time.perf_counter() - start) / ROUNDS * 1000, len(rows)
+
+    def test_benchmark_related_filter(self):
+        tag_ids = list(self.user.tag_set.values_list('id', flat=True)[:FILTER_IDS])
+        params = {'tags': ','.join(str(tag_id) for tag_id in tag_ids)}
+        querysets = {
+            'JOIN (previous)': Recipe.objects.filter(
+                user=self.user, tags__id__in=tag_ids
+            ),
+            'EXISTS (match=any)': viewset_queryset(
+                RecipeViewSet, self.user, params, paginate=False
+            ),
+            'COUNT (match=all)': viewset_queryset(
+                RecipeViewSet, self.user, {**params, 'match': 'all'}, paginate=False
+            ),
+        }
+        for name, queryset in querysets.items():
+            elapsed, rows = self._time(queryset)
+            print(f'\n{name}: {rows} rows, {elapsed:.2f} ms/query')
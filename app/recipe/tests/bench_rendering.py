@@ -0,0 +1,70 @@
+'''Benchmark rendering a 10k recipe list
+
+Compares DRF's JSONRenderer, FastJSONRenderer and the streaming list mode.
+Peak memory is measured with tracemalloc, which tracks Python allocations
+rather than process RSS but isolates each run.
+
+Run with: python manage.py test -p "bench_*.py" recipe
+'''
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Recipe
+from core.renderers import FastJSONRenderer
+from core.seed import seed_user_data
+from core.streaming import chunked_iterator, stream_json_array
+from recipe.serializers import RecipeSerializer
+
+
+RECIPES = 10000
+
+
+class RenderingBenchmark(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(  # type:ignore
+            'test@email.com', 'pass1234'
+        )
+        seed_user_data(cls.user, recipes=RECIPES, attrs=50, attrs_per_recipe=4)
+
+    def _queryset(self):
+        return (
+            Recipe.objects.filter(user=self.user)
+            .order_by('id')
+            .prefetch_related('tags', 'ingredients')
+        )
+
+    def _render_list(self, renderer):
+        data = RecipeSerializer(self._queryset(), many=True).data
+        return len(renderer.render(data))
+
+    def _stream(self):
+        rows = stream_json_array(
+            RecipeSerializer(), chunked_iterator(self._queryset(), 500)
+        )
+        return sum(len(row) for row in rows)
+
+    def _measure(self, name, func):
+        tracemalloc.start()
+        start = time.perf_counter()
+        size = func()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(
+            f'\n{name}: {RECIPES / elapsed:.0f} recipes/s, '
+            f'peak {peak / 2 ** 20:.1f} MiB, {size / 2 ** 20:.1f} MiB output'
+        )
+
+    def test_benchmark_rendering(self):
+        self._measure('JSONRenderer', lambda: self._render_list(JSONRenderer()))
+        self._measure(
+            'FastJSONRenderer', lambda: self._render_list(FastJSONRenderer())
+        )
+        self._measure('streaming', self._stream)
@@ -0,0 +1,163 @@
+import json
+import threading
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.concurrency import run_db, warm_db_pool
+from core.models import Ingredient, Recipe, Tag
+from recipe import views
+from recipe.serializers import RecipeDetailSerializer
+
+
+@override_settings(ASYNC_API={'THREADS': 0})
+class AsyncViewSetTests(TestCase):
+    '''Test the async viewsets behave like their sync counterparts'''
+
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.user = get_user_model().objects.create_user(  # type:ignore
+            'test@email.com', 'pass1234'
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Pancakes', time_minutes=5, price=3.00
+        )
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name='Breakfast'))
+        self.recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Flour')
+        )
+
+    def _call(self, viewset, actions, request, **kwargs):
+        # The router normally supplies the basename used in cache keys
+        basename = viewset.queryset.model._meta.model_name
+        view = viewset.as_view(actions, basename=basename)
+        response = async_to_sync(view)(request, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    def test_retrieve(self):
+        '''Test the detail view loads tags and ingredients'''
+        request = self.factory.get('/')
+        force_authenticate(request, self.user)
+
+        with self.assertNumQueries(4):
+            res = self._call(
+                views.AsyncRecipeViewSet, {'get': 'retrieve'}, request, pk=self.recipe.pk
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, RecipeDetailSerializer(self.recipe).data)
+
+    def test_export(self):
+        '''Test the export is spooled on the thread pool and sent as a file'''
+        request = self.factory.get('/', {'format': 'ndjson'})
+        force_authenticate(request, self.user)
+
+        # The router normally applies the action's renderer classes
+        view = views.AsyncRecipeViewSet.as_view(
+            {'get': 'export'}, **views.AsyncRecipeViewSet.export.kwargs
+        )
+        res = async_to_sync(view)(request)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        self.assertIn('recipes.ndjson', res['Content-Disposition'])
+        lines = b''.join(res.streaming_content).splitlines()
+        self.assertEqual(json.loads(lines[0])['tags'], ['Breakfast'])
+
+    def test_retrieve_sparse_fields(self):
+        '''Test only the requested relations are loaded'''
+        request = self.factory.get('/', {'fields': 'id,tags'})
+        force_authenticate(request, self.user)
+
+        res = self._call(
+            views.AsyncRecipeViewSet, {'get': 'retrieve'}, request, pk=self.recipe.pk
+        )
+
+        self.assertEqual(set(res.data), {'id', 'tags'})
+
+    def test_retrieve_not_modified(self):
+        '''Test a matching If-None-Match is answered with 304'''
+        request = self.factory.get('/')
+        force_authenticate(request, self.user)
+        etag = self._call(
+            views.AsyncRecipeViewSet, {'get': 'retrieve'}, request, pk=self.recipe.pk
+        )['ETag']
+
+        request = self.factory.get('/', HTTP_IF_NONE_MATCH=etag)
+        force_authenticate(request, self.user)
+        res = self._call(
+            views.AsyncRecipeViewSet, {'get': 'retrieve'}, request, pk=self.recipe.pk
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_retrieve_other_users_recipe(self):
+        '''Test another user's recipe is not found'''
+        other = get_user_model().objects.create_user(  # type:ignore
+            'other@email.com', 'pass1234'
+        )
+        request = self.factory.get('/')
+        force_authenticate(request, other)
+
+        res = self._call(
+            views.AsyncRecipeViewSet, {'get': 'retrieve'}, request, pk=self.recipe.pk
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_authentication_required(self):
+        '''Test unauthenticated requests are rejected'''
+        res = self._call(views.AsyncTagViewSet, {'get': 'list'}, self.factory.get('/'))
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_list_ignores_stream(self):
+        '''Test ?stream=1 falls back to a paginated page'''
+        request = self.factory.get('/', {'stream': 1})
+        force_authenticate(request, self.user)
+
+        res = self._call(views.AsyncTagViewSet, {'get': 'list'}, request)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([tag['name'] for tag in res.data['results']], ['Breakfast'])
+
+    def test_create(self):
+        '''Test sync handlers such as create run through run_db'''
+        request = self.factory.post('/', {'name': 'Salt'}, format='json')
+        force_authenticate(request, self.user)
+
+        res = self._call(views.AsyncIngredientViewSet, {'post': 'create'}, request)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(
+            Ingredient.objects.filter(user=self.user, name='Salt').exists()
+        )
+
+
+class RunDbTests(SimpleTestCase):
+
+    databases = {'default'}
+
+    @override_settings(ASYNC_API={'THREADS': 2})
+    def test_runs_on_pool_thread(self):
+        '''Test callables run on the bounded database thread pool'''
+        name = async_to_sync(run_db)(lambda: threading.current_thread().name)
+
+        self.assertTrue(name.startswith('db'))
+
+    @override_settings(ASYNC_API={'ENABLED': True, 'THREADS': 2})
+    def test_warm_db_pool(self):
+        '''Test every pool thread opens and validates a connection'''
+        futures = warm_db_pool()
+
+        self.assertEqual(len(futures), 2)
+        for future in futures:
+            self.assertIsNotNone(future.result(timeout=10))
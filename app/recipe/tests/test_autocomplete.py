@@ -0,0 +1,161 @@
+from django.contrib.auth import get_user_model
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Tag
+from recipe.autocomplete import NameTrie, TrieCache, get_trie_cache, prefix_upper_bound
+
+
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+class AutocompleteApiTests(TestCase):
+    '''Test ?q= autocomplete on tags and ingredients'''
+
+    def setUp(self):
+        trie_cache = get_trie_cache()
+        if trie_cache is not None:
+            trie_cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(  # type:ignore
+            'test@email.com', 'pass1234'
+        )
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            for name in ('Vegan', 'vegetarian', 'Breakfast', 'Veg', 'Dessert'):
+                Tag.objects.create(user=self.user, name=name)
+
+    def _names(self, res):
+        return [tag['name'] for tag in res.json()]
+
+    def test_prefix_matches(self):
+        '''Test names starting with q are returned, ignoring case'''
+        for trie_names in (0, 10):
+            with self.subTest(trie_names=trie_names), override_settings(
+                AUTOCOMPLETE={'TRIE_MAX_NAMES': trie_names}
+            ):
+                # Otherwise the second run is served from the response cache
+                cache.clear()
+                res = self.client.get(TAGS_URL, {'q': 'VEG'})
+
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                self.assertEqual(self._names(res), ['Veg', 'Vegan', 'vegetarian'])
+
+    def test_limit(self):
+        '''Test only the top ?limit= matches are returned'''
+        res = self.client.get(TAGS_URL, {'autocomplete': 'veg', 'limit': 2})
+
+        self.assertEqual(self._names(res), ['Veg', 'Vegan'])
+
+    def test_invalid_limit(self):
+        '''Test a non numeric limit is rejected'''
+        res = self.client.get(TAGS_URL, {'q': 'veg', 'limit': 'all'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_other_users_excluded(self):
+        '''Test another user's names are not suggested'''
+        other = get_user_model().objects.create_user(  # type:ignore
+            'other@email.com', 'pass1234'
+        )
+        Tag.objects.create(user=other, name='Vegetables')
+
+        res = self.client.get(TAGS_URL, {'q': 'vegeta'})
+
+        self.assertEqual(self._names(res), ['vegetarian'])
+
+    @override_settings(AUTOCOMPLETE={'TRIE_MAX_NAMES': 10})
+    def test_trie_refreshed_after_write(self):
+        '''Test the cached trie picks up newly created tags'''
+        self.client.get(TAGS_URL, {'q': 'veg'})
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(user=self.user, name='Vegetable')
+
+        res = self.client.get(TAGS_URL, {'q': 'vegeta'})
+
+        self.assertEqual(self._names(res), ['Vegetable', 'vegetarian'])
+
+    @override_settings(AUTOCOMPLETE={'TRIE_MAX_NAMES': 10})
+    def test_trie_skips_database_when_cached(self):
+        '''Test a warm trie answers with only the version lookup'''
+        self.client.get(TAGS_URL, {'q': 'veg'})
+
+        with self.assertNumQueries(1):
+            res = self.client.get(TAGS_URL, {'q': 'bre'})
+
+        self.assertEqual(self._names(res), ['Breakfast'])
+
+    def test_similar_names_added_with_trie(self):
+        '''Test the trie and database paths both add similar names'''
+        dessert = Tag.objects.get(name='Dessert')
+        for trie_names in (0, 10):
+            with self.subTest(trie_names=trie_names), override_settings(
+                AUTOCOMPLETE={'TRIE_MAX_NAMES': trie_names}
+            ), patch.object(connection, 'vendor', 'postgresql'), patch(
+                'recipe.autocomplete._similar', return_value=[dessert]
+            ) as similar:
+                cache.clear()
+                res = self.client.get(TAGS_URL, {'q': 'vegan'})
+
+                self.assertEqual(self._names(res), ['Vegan', 'Dessert'])
+                self.assertEqual(similar.call_args[0][1:], ('vegan', 9))
+
+    @override_settings(AUTOCOMPLETE={'TRIE_MAX_NAMES': 3})
+    def test_too_many_names_for_trie(self):
+        '''Test a user with more names than the budget is served by the database'''
+        res = self.client.get(TAGS_URL, {'q': 'veg'})
+
+        self.assertEqual(self._names(res), ['Veg', 'Vegan', 'vegetarian'])
+        self.assertEqual(get_trie_cache().size, 1)
+
+    def test_ingredients(self):
+        '''Test autocomplete on ingredients'''
+        Ingredient.objects.create(user=self.user, name='Garlic')
+        Ingredient.objects.create(user=self.user, name='Garam masala')
+        Ingredient.objects.create(user=self.user, name='Salt')
+
+        res = self.client.get(INGREDIENTS_URL, {'q': 'gar'})
+
+        self.assertEqual(self._names(res), ['Garam masala', 'Garlic'])
+
+
+class NameTrieTests(SimpleTestCase):
+
+    def test_cache_bounded_by_names(self):
+        '''Test the least recently used tries go once the names exceed the budget'''
+        trie_cache = TrieCache(max_names=5)
+
+        def load(count):
+            return lambda: [(pk, f'name {pk}') for pk in range(count)]
+
+        trie_cache.get('a', 1, load(2))
+        trie_cache.get('b', 1, load(2))
+        trie_cache.get('a', 1, load(0))
+        trie_cache.get('c', 1, load(3))
+
+        self.assertEqual(list(trie_cache._entries), ['a', 'c'])
+        self.assertEqual(trie_cache.size, 5)
+        self.assertIsNone(trie_cache.get('d', 1, load(6)))
+        self.assertEqual(trie_cache.size, 4)
+
+    def test_complete_in_order(self):
+        '''Test completions are ordered by lowercased name then ID'''
+        trie = NameTrie([(1, 'abc'), (2, 'Ab'), (3, 'abd'), (4, 'b'), (5, 'AB')])
+
+        self.assertEqual(
+            trie.complete('ab', 10), [(2, 'Ab'), (5, 'AB'), (1, 'abc'), (3, 'abd')]
+        )
+        self.assertEqual(trie.complete('ab', 2), [(2, 'Ab'), (5, 'AB')])
+        self.assertEqual(trie.complete('x', 10), [])
+
+    def test_prefix_upper_bound(self):
+        '''Test the range bound sorts after every string with the prefix'''
+        self.assertEqual(prefix_upper_bound('veg'), 'veh')
@@ -0,0 +1,165 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from core.stats import check_stats
+
+from recipe.cache import get_response_cache
+
+
+class ExplainQueriesCommandTests(TestCase):
+
+    def test_explain_queries_reports_indexes(self):
+        '''Test that the hot queries are explained and data is rolled back'''
+        out = StringIO()
+        call_command('explain_queries', users=2, recipes=20, attrs=5, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('recipe list (tags)', output)
+        self.assertIn('core_recipe_user_id_idx', output)
+        self.assertFalse(Recipe.objects.exists())
+
+
+class ImportRecipesCommandTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(  # type:ignore
+            'test@email.com', 'pass1234'
+        )
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def _write(self, name, lines):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as f:
+            f.write(''.join(f'{line}\n' for line in lines))
+        return path
+
+    def _record(self, title, **fields):
+        return json.dumps(
+            {'title': title, 'time_minutes': 10, 'price': '2.50', **fields}
+        )
+
+    def _import(self, path, **options):
+        out = StringIO()
+        call_command(
+            'import_recipes', path, user=self.user.email, stdout=out, stderr=out, **options
+        )
+        return out.getvalue()
+
+    def test_import_ndjson(self):
+        '''Test recipes are loaded with tags and ingredients resolved by name'''
+        path = self._write(
+            'recipes.ndjson',
+            [
+                self._record('Soup', tags=['Vegan', 'Quick'], ingredients=['Salt']),
+                self._record('Stew', tags=['Quick'], link='https://example.com'),
+                self._record('Toast'),
+            ],
+        )
+
+        output = self._import(path, batch_size=2)
+
+        self.assertIn('Imported 3 recipes (1 new tags, 1 new ingredients', output)
+        self.assertIn('rows/s', output)
+        soup = Recipe.objects.get(user=self.user, title='Soup')
+        self.assertEqual(
+            sorted(soup.tags.values_list('name', flat=True)), ['Quick', 'Vegan']
+        )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Tag.objects.get(name='Quick').recipe_count, 2)
+        self.assertEqual(check_stats([self.user.pk]), [])
+
+    def test_import_exported_csv(self):
+        '''Test a CSV export imports into another account unchanged'''
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup, "thick"', time_minutes=5, price='1.25'
+        )
+        recipe.tags.add(self.vegan)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        res = client.get(reverse('recipe:recipe-export'), {'format': 'csv'})
+        path = os.path.join(self.directory, 'export.csv')
+        with open(path, 'wb') as f:
+            f.write(b''.join(res.streaming_content))
+        other = get_user_model().objects.create_user(  # type:ignore
+            'other@email.com', 'pass1234'
+        )
+
+        call_command('import_recipes', path, user=str(other.pk), stdout=StringIO())
+
+        imported = Recipe.objects.get(user=other)
+        self.assertEqual(
+            (imported.title, imported.time_minutes, str(imported.price)),
+            ('Soup, "thick"', 5, '1.25'),
+        )
+        self.assertEqual(list(imported.tags.values_list('name', 'user')), [('Vegan', other.pk)])
+
+    def test_import_resumes_after_failure(self):
+        '''Test a rerun continues after the last committed batch'''
+        records = [self._record(f'Recipe {i}') for i in range(5)]
+        path = self._write('recipes.ndjson', records[:3] + ['{"title": ""}'] + records[4:])
+
+        with self.assertRaisesMessage(CommandError, 'Records up to 2 are committed'):
+            self._import(path, batch_size=2)
+        self.assertEqual(Recipe.objects.count(), 2)
+
+        self._write('recipes.ndjson', records)
+        output = self._import(path, batch_size=2)
+
+        self.assertIn('Resuming after record 2', output)
+        self.assertEqual(
+            sorted(Recipe.objects.values_list('title', flat=True)),
+            [f'Recipe {i}' for i in range(5)],
+        )
+
+        # A finished import is not repeated unless restarted
+        self.assertIn('Imported 0 recipes', self._import(path))
+        self._import(path, restart=True)
+        self.assertEqual(Recipe.objects.count(), 10)
+
+    def test_import_skip_invalid(self):
+        '''Test --skip-invalid reports bad records and imports the rest'''
+        path = self._write(
+            'recipes.ndjson',
+            [self._record('Soup'), 'not json', self._record('Stew', price='abc')],
+        )
+
+        output = self._import(path, skip_invalid=True)
+
+        self.assertIn('Record 2: invalid JSON', output)
+        self.assertIn('Record 3: price', output)
+        self.assertIn('Imported 1 recipes', output)
+
+
+class ResponseCacheStatsCommandTests(TestCase):
+
+    def test_response_cache_stats(self):
+        '''Test the counters of requests served by other clients are reported'''
+        get_response_cache().reset_stats()
+        client = APIClient()
+        client.force_authenticate(
+            get_user_model().objects.create_user(  # type:ignore
+                'test@email.com', 'pass1234'
+            )
+        )
+        for _ in range(3):
+            client.get(reverse('recipe:recipe-list'))
+
+        out = StringIO()
+        call_command('response_cache_stats', reset=True, stdout=out)
+
+        self.assertIn('2 hits, 1 misses (66.7% hit ratio)', out.getvalue())
+        self.assertEqual(get_response_cache().stats(), {'hits': 0, 'misses': 0})
@@ -0,0 +1,106 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.http import http_date
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class ConditionalGetTests(TestCase):
+    '''Test ETag based conditional requests on recipe endpoints'''
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(  # type:ignore
+            'test@email.com', 'pass1234'
+        )
+        self.client.force_authenticate(self.user)
+        # Versions are bumped on commit, which tests only reach this way
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe = Recipe.objects.create(
+                user=self.user, title='Pancakes', time_minutes=5, price=3.00
+            )
+
+    def test_unchanged_list_not_modified(self):
+        '''Test a matching If-None-Match skips the recipe queries'''
+        res = self.client.get(RECIPES_URL)
+        etag = res['ETag']
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+
+    def test_unchanged_detail_not_modified(self):
+        '''Test conditional requests on the recipe detail endpoint'''
+        url = reverse('recipe:recipe-detail', args=[self.recipe.id])
+        etag = self.client.get(url)['ETag']
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etag_depends_on_query(self):
+        '''Test different query parameters get different ETags'''
+        etag = self.client.get(RECIPES_URL)['ETag']
+
+        res = self.client.get(
+            RECIPES_URL, {'page_size': 1}, HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_write_changes_etag(self):
+        '''Test creating a tag invalidates the tag list ETag'''
+        etag = self.client.get(TAGS_URL)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_write_in_same_second_not_hidden(self):
+        '''Test If-Modified-Since cannot answer 304 after a write in the same second'''
+        res = self.client.get(TAGS_URL)
+        self.assertNotIn('Last-Modified', res)
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.get(TAGS_URL, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)  # type:ignore
+
+    def test_relation_change_changes_etag(self):
+        '''Test adding a tag to a recipe invalidates the recipe list ETag'''
+        etag = self.client.get(RECIPES_URL)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_etag_scoped_to_user(self):
+        '''Test another user's ETag does not match'''
+        etag = self.client.get(RECIPES_URL)['ETag']
+        user_two = get_user_model().objects.create_user(  # type:ignore
+            'another@email.com', 'pass1234'
+        )
+        self.client.force_authenticate(user_two)
+
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
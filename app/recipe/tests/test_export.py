@@ -0,0 +1,136 @@
+import csv
+import io
+import json
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+from recipe.views import RecipeViewSet
+
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def ndjson(res):
+    return [json.loads(line) for line in b''.join(res.streaming_content).splitlines()]
+
+
+class PublicExportApiTests(TestCase):
+
+    def test_auth_required(self):
+        '''Test that authentication is required'''
+        res = APIClient().get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateExportApiTests(TestCase):
+    '''Test streaming exports of a user's recipes'''
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(  # type:ignore
+            'test@email.com', 'pass1234'
+        )
+        self.client.force_authenticate(self.user)
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.quick = Tag.objects.create(user=self.user, name='Quick')
+        self.salt = Ingredient.objects.create(user=self.user, name='Salt')
+        self.soup = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=10, price='4.50'
+        )
+        self.soup.tags.add(self.vegan, self.quick)
+        self.soup.ingredients.add(self.salt)
+        self.stew = Recipe.objects.create(
+            user=self.user, title='Stew, slow', time_minutes=90, price='9.00'
+        )
+
+    def test_export_ndjson(self):
+        '''Test NDJSON is the default, one recipe per line with related names'''
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(
+            res['Content-Disposition'], 'attachment; filename="recipes.ndjson"'
+        )
+        self.assertEqual(
+            ndjson(res),
+            [
+                {
+                    'id': self.soup.id,
+                    'title': 'Soup',
+                    'time_minutes': 10,
+                    'price': '4.50',
+                    'link': '',
+                    'image': None,
+                    'tags': ['Quick', 'Vegan'],
+                    'ingredients': ['Salt'],
+                },
+                {
+                    'id': self.stew.id,
+                    'title': 'Stew, slow',
+                    'time_minutes': 90,
+                    'price': '9.00',
+                    'link': '',
+                    'image': None,
+                    'tags': [],
+                    'ingredients': [],
+                },
+            ],
+        )
+
+    def test_export_csv(self):
+        '''Test ?format=csv and Accept: text/csv export CSV'''
+        for params, headers in (
+            ({'format': 'csv'}, {}),
+            ({}, {'HTTP_ACCEPT': 'text/csv'}),
+        ):
+            with self.subTest(params=params):
+                res = self.client.get(EXPORT_URL, params, **headers)
+
+                self.assertEqual(res['Content-Type'], 'text/csv')
+                content = b''.join(res.streaming_content).decode()
+                rows = list(csv.DictReader(io.StringIO(content)))
+                self.assertEqual(len(rows), 2)
+                self.assertEqual(rows[0]['tags'], '["Quick","Vegan"]')
+                self.assertEqual(rows[1]['title'], 'Stew, slow')
+                self.assertEqual(rows[1]['image'], '')
+
+    def test_export_filtered(self):
+        '''Test the list filters apply to the export'''
+        res = self.client.get(EXPORT_URL, {'tags': self.vegan.id})
+
+        self.assertEqual([row['id'] for row in ndjson(res)], [self.soup.id])
+
+    def test_export_limited_to_user(self):
+        '''Test other users' recipes are not exported'''
+        other = get_user_model().objects.create_user(  # type:ignore
+            'other@email.com', 'pass1234'
+        )
+        Recipe.objects.create(user=other, title='Other', time_minutes=5, price=1)
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(len(ndjson(res)), 2)
+
+    def test_export_queries_per_chunk(self):
+        '''Test relations are looked up once per chunk, not once per recipe'''
+        for i in range(4):
+            Recipe.objects.create(
+                user=self.user, title=f'Recipe {i}', time_minutes=5, price=1
+            ).tags.add(self.vegan)
+
+        with patch.object(RecipeViewSet, 'export_chunk_size', 2):
+            res = self.client.get(EXPORT_URL)
+            # Three chunks of recipes, each with two relation lookups
+            with self.assertNumQueries(1 + 3 * 2):
+                rows = ndjson(res)
+
+        self.assertEqual(len(rows), 6)
@@ -0,0 +1,115 @@
+import os
+import tempfile
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import Mock, patch
+
+from django.test import SimpleTestCase, override_settings
+
+from PIL import Image
+
+from recipe import images
+
+
+@override_settings(RECIPE_IMAGE_DERIVATIVES={'WORKERS': 1})
+class ScheduleDerivativesTests(SimpleTestCase):
+    '''Test derivative failures are logged and never reach the upload'''
+
+    def setUp(self):
+        self.recipe = Mock(pk=1, user_id=1)
+        self.recipe.image.name = 'uploads/recipe/image.jpg'
+        self.recipe.image.path = '/media/uploads/recipe/image.jpg'
+        patcher = patch.object(images, '_executor', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _pool(self, future=None):
+        pool = Mock()
+        if future is None:
+            pool.submit.side_effect = BrokenProcessPool()
+        else:
+            pool.submit.return_value = future
+        return pool
+
+    def test_broken_pool_replaced(self):
+        '''Test a submit to a broken pool is retried on a new pool'''
+        broken = self._pool()
+        future = Future()
+        fresh = self._pool(future)
+        images._executor = broken
+
+        with patch.object(images, 'ProcessPoolExecutor', return_value=fresh):
+            images.schedule_derivatives(self.recipe)
+
+        broken.shutdown.assert_called_once_with(wait=False)
+        self.assertIs(images._executor, fresh)
+        fresh.submit.assert_called_once()
+
+    def test_submit_failure_logged(self):
+        '''Test the upload goes on when no pool accepts the render'''
+        with patch.object(
+            images, 'ProcessPoolExecutor', side_effect=lambda **kwargs: self._pool()
+        ), self.assertLogs('recipe.images', 'ERROR') as logs:
+            images.schedule_derivatives(self.recipe)
+
+        self.assertIn('Could not schedule derivatives', logs.output[0])
+
+    def test_worker_failure_logged(self):
+        '''Test a pool broken mid render is logged and dropped'''
+        future = Future()
+        pool = self._pool(future)
+        images._executor = pool
+        images.schedule_derivatives(self.recipe)
+
+        with patch.object(images, 'store_derivatives') as store, patch.object(
+            images, 'connection'
+        ), self.assertLogs('recipe.images', 'ERROR') as logs:
+            future.set_exception(BrokenProcessPool())
+
+        store.assert_not_called()
+        self.assertIn('image.jpg', logs.output[0])
+        self.assertIsNone(images._executor)
+
+
+class RenderDerivativesTests(SimpleTestCase):
+    '''Test derivatives are written once and never in place'''
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        self.image_name = 'uploads/recipe/ab/abcdef.png'
+        self.source = os.path.join(self.media_root, self.image_name)
+        os.makedirs(os.path.dirname(self.source))
+        Image.new('RGB', (10, 10)).save(self.source)
+
+    def _render(self):
+        return images.render_derivatives(
+            self.source, self.media_root, self.image_name, (4,), ('PNG',), 85
+        )
+
+    def test_existing_derivatives_kept(self):
+        '''Test a second render leaves the shared file and no temporary files'''
+        path = os.path.join(self.media_root, self._render()['4_png'])
+        os.utime(path, (0, 0))
+
+        self._render()
+
+        self.assertEqual(os.stat(path).st_mtime, 0)
+        self.assertEqual(os.listdir(os.path.dirname(path)), [os.path.basename(path)])
+
+    @override_settings(RECIPE_IMAGE_DERIVATIVES={'SIZES': (4,), 'FORMATS': ('PNG',)})
+    def test_existing_derivatives_not_rendered(self):
+        '''Test an image whose derivatives exist is not sent to the pool'''
+        derivatives = self._render()
+        recipe = Mock(pk=1, user_id=1)
+        recipe.image.name = self.image_name
+        recipe.image.path = self.source
+
+        with self.settings(MEDIA_ROOT=self.media_root), patch.object(
+            images, 'submit_render'
+        ) as submit, patch.object(images, 'store_derivatives') as store:
+            images.schedule_derivatives(recipe)
+
+        submit.assert_not_called()
+        store.assert_called_once_with(1, 1, self.image_name, derivatives)
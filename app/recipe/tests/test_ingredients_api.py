@@ -46,7 +46,7 @@ class PrivateIngredientsAPITests(TestCase):
         ingredients = Ingredient.objects.all().order_by('-name')
         serializer = IngredientSerializer(ingredients, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)  # type:ignore
+        self.assertEqual(res.data['results'], serializer.data)  # type:ignore
 
     def test_ingredients_limited_to_user(self):
         '''Test that only ingredients for authenticated user are returned'''
@@ -60,8 +60,8 @@ class PrivateIngredientsAPITests(TestCase):
         res = self.client.get(INGREDIENTS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)  # type:ignore
-        self.assertEqual(res.data[0]['name'], ingredient.name)  # type:ignore
+        self.assertEqual(len(res.data['results']), 1)  # type:ignore
+        self.assertEqual(res.data['results'][0]['name'], ingredient.name)  # type:ignore
 
     def test_create_ingredient_successful(self):
         """Test creating a new ingredient"""
@@ -93,8 +93,8 @@ class PrivateIngredientsAPITests(TestCase):
 
         serializer1 = IngredientSerializer(ingredient1)
         serializer2 = IngredientSerializer(ingredient2)
-        self.assertIn(serializer1.data, res.data)  # type:ignore
-        self.assertNotIn(serializer2.data, res.data)  # type:ignore
+        self.assertIn(serializer1.data, res.data['results'])  # type:ignore
+        self.assertNotIn(serializer2.data, res.data['results'])  # type:ignore
 
     def test_retrieve_ingredient_assigned_unique(self):
         """Test filtering ingredients by assigned returns unique items"""
@@ -111,4 +111,4 @@ class PrivateIngredientsAPITests(TestCase):
 
         res = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)  # type:ignore
+        self.assertEqual(len(res.data['results']), 1)  # type:ignore
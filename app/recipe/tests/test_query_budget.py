@@ -0,0 +1,73 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+
+# Maximum number of queries each read endpoint may issue, regardless of how
+# many rows the authenticated user owns. Authentication is forced in these
+# tests so the budgets cover only the work done by the view itself. Recipe
+# endpoints include one lookup of the user's collection version for ETags.
+QUERY_BUDGETS = {
+    'recipe:recipe-list': 4,
+    'recipe:recipe-detail': 4,
+    'recipe:tag-list': 2,
+    'recipe:ingredient-list': 2,
+    'user:me': 0,
+}
+
+
+def seed_recipes(user, count, attrs_per_recipe=3):
+    '''Create recipes, each linked to its own tags and ingredients'''
+    recipes = []
+    for i in range(count):
+        recipe = Recipe.objects.create(
+            user=user, title=f'Recipe {i}', time_minutes=10, price=5.00
+        )
+        for j in range(attrs_per_recipe):
+            recipe.tags.add(Tag.objects.create(user=user, name=f'Tag {i}-{j}'))
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=user, name=f'Ingredient {i}-{j}')
+            )
+        recipes.append(recipe)
+
+    return recipes
+
+
+class QueryBudgetTests(TestCase):
+    '''Test that read endpoints run in a constant number of queries'''
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(  # type:ignore
+            'test@email.com', 'pass1234'
+        )
+        self.client.force_authenticate(self.user)
+
+    def _url(self, name, recipe):
+        '''Return the URL for a named route, adding the pk for detail routes'''
+        if name.endswith('-detail'):
+            return reverse(name, args=[recipe.id])
+        return reverse(name)
+
+    def _assert_within_budget(self, recipe):
+        for name, budget in QUERY_BUDGETS.items():
+            with self.subTest(url_name=name):
+                with self.assertNumQueries(budget):
+                    res = self.client.get(self._url(name, recipe))
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_budgets_hold_as_data_grows(self):
+        '''Test that query counts do not grow with the number of rows'''
+        # Versions are bumped on commit, which tests only reach this way
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = seed_recipes(self.user, 1)[0]
+        self._assert_within_budget(recipe)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            seed_recipes(self.user, 20)
+        self._assert_within_budget(recipe)
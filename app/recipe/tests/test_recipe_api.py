@@ -1,10 +1,20 @@
+import json
+import struct
 import tempfile
 import os
+import zlib
+from unittest import skipUnless
+from unittest.mock import patch
 
 from PIL import Image
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.db.models import FloatField, Value
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
@@ -12,6 +22,7 @@ from rest_framework.test import APIClient
 
 from core.models import Recipe, Tag, Ingredient
 
+from recipe.pagination import RecipeCursorPagination
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
 
 
@@ -82,8 +93,8 @@ class PrivateRecipeApiTests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 2)  # type:ignore
-        self.assertEqual(res.data, serializer.data)  # type: ignore
+        self.assertEqual(len(res.data['results']), 2)  # type:ignore
+        self.assertEqual(res.data['results'], serializer.data)  # type: ignore
 
     def test_recipes_limited_to_user(self):
         '''Test retrieving recipes is limited to authenticated user'''
@@ -96,8 +107,8 @@ class PrivateRecipeApiTests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)  # type:ignore
-        self.assertEqual(res.data, serializer.data)  # type:ignore
+        self.assertEqual(len(res.data['results']), 1)  # type:ignore
+        self.assertEqual(res.data['results'], serializer.data)  # type:ignore
 
     def test_view_recipe_detail(self):
         '''Test viewing a recipe detail'''
@@ -187,6 +198,191 @@ class PrivateRecipeApiTests(TestCase):
         tags = recipe.tags.all()
         self.assertEqual(len(tags), 0)
 
+    def test_recipes_paginated_by_cursor(self):
+        '''Test paging through recipes with a tag filter applied'''
+        tag = sample_tag(user=self.user)
+        recipes = [sample_recipe(user=self.user, title=f'Cake {i}') for i in range(3)]
+        for recipe in recipes:
+            recipe.tags.add(tag)
+        sample_recipe(user=self.user, title='Untagged')
+
+        res = self.client.get(RECIPES_URL, {'tags': tag.id, 'page_size': 2})
+        res_next = self.client.get(res.data['next'])  # type:ignore
+
+        ids = [recipe['id'] for recipe in res.data['results']]  # type:ignore
+        ids += [recipe['id'] for recipe in res_next.data['results']]  # type:ignore
+        self.assertEqual(ids, [recipe.id for recipe in recipes])
+        self.assertIsNone(res_next.data['next'])  # type:ignore
+
+    def test_bulk_create_recipes(self):
+        '''Test creating several recipes and their relations at once'''
+        tag = sample_tag(user=self.user)
+        ingredient = sample_ingredient(user=self.user)
+        payload = [
+            {
+                'title': 'Cheesecake',
+                'tags': [tag.id],
+                'ingredients': [ingredient.id],
+                'time_minutes': 60,
+                'price': '20.00',
+            },
+            {
+                'title': 'Toast',
+                'tags': [],
+                'ingredients': [],
+                'time_minutes': 5,
+                'price': '1.00',
+            },
+        ]
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([item['title'] for item in res.data], ['Cheesecake', 'Toast'])  # type:ignore
+        cheesecake = Recipe.objects.get(user=self.user, title='Cheesecake')
+        self.assertEqual(list(cheesecake.tags.all()), [tag])
+        self.assertEqual(list(cheesecake.ingredients.all()), [ingredient])
+        self.assertEqual(Recipe.objects.get(title='Toast').tags.count(), 0)
+
+    def test_bulk_create_resolves_ids_once(self):
+        '''Test the IDs of a whole list are resolved with one query per relation'''
+        tags = [sample_tag(user=self.user, name=f'Tag {i}') for i in range(3)]
+        ingredient = sample_ingredient(user=self.user)
+        payload = [
+            {
+                'title': f'Recipe {i}',
+                'tags': [tags[i % 3].id, tags[(i + 1) % 3].id],
+                'ingredients': [ingredient.id],
+                'time_minutes': 5,
+                'price': '1.00',
+            }
+            for i in range(20)
+        ]
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        lookups = [
+            query['sql'] for query in ctx.captured_queries
+            if query['sql'].startswith(('SELECT "core_tag"', 'SELECT "core_ingredient"'))
+        ]
+        self.assertEqual(len(lookups), 2)
+        self.assertEqual(
+            [item['tags'] for item in res.data[:2]],  # type:ignore
+            [[tags[0].id, tags[1].id], [tags[1].id, tags[2].id]],
+        )
+
+    def test_bulk_create_reports_ids_per_item(self):
+        '''Test a foreign ID is reported against the item that sent it'''
+        user_two = get_user_model().objects.create_user('another@email.com', 'pass1234')  # type: ignore
+        own_tag = sample_tag(user=self.user)
+        foreign_tag = sample_tag(user=user_two)
+        payload = [
+            {'title': 'Soup', 'tags': [own_tag.id], 'ingredients': [], 'time_minutes': 5, 'price': '1.00'},
+            {'title': 'Stew', 'tags': [foreign_tag.id], 'ingredients': [], 'time_minutes': 5, 'price': '1.00'},
+        ]
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})  # type:ignore
+        self.assertIn('tags', res.data[1])  # type:ignore
+
+    def test_bulk_create_recipes_invalid(self):
+        '''Test an invalid recipe rejects the whole batch'''
+        payload = [
+            {'title': 'Cheesecake', 'time_minutes': 60, 'price': '20.00'},
+            {'title': 'Toast'},
+        ]
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_create_recipe_resolves_ids_in_one_query(self):
+        '''Test recipe tag IDs are validated with a single lookup'''
+        tag_ids = [sample_tag(user=self.user, name=f'Tag {i}').id for i in range(10)]
+        payload = {
+            'title': 'Stew',
+            'tags': tag_ids,
+            'ingredients': [],
+            'time_minutes': 30,
+            'price': '10.00',
+        }
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        tag_lookups = [
+            query['sql'] for query in ctx.captured_queries
+            if 'FROM "core_tag" WHERE' in query['sql']
+        ]
+        self.assertEqual(len(tag_lookups), 1)
+
+    def test_create_recipe_rejects_other_users_ids(self):
+        '''Test every missing or foreign ID is reported at once'''
+        user_two = get_user_model().objects.create_user('another@email.com', 'pass1234')  # type: ignore
+        own_tag = sample_tag(user=self.user)
+        foreign_tag = sample_tag(user=user_two)
+        payload = {
+            'title': 'Stew',
+            'tags': [own_tag.id, foreign_tag.id, 9999],
+            'ingredients': [],
+            'time_minutes': 30,
+            'price': '10.00',
+        }
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(res.data['tags']), 2)  # type:ignore
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_stream_recipes(self):
+        '''Test streaming the full recipe list in chunks'''
+        tag = sample_tag(user=self.user, name='Streamed')
+        for i in range(5):
+            sample_recipe(user=self.user, title=f'Recipe {i}').tags.add(tag)
+
+        with patch('recipe.views.RecipeViewSet.stream_chunk_size', 2):
+            res = self.client.get(RECIPES_URL, {'stream': 1})
+            with self.assertNumQueries(7):
+                recipes = json.loads(b''.join(res.streaming_content))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(recipes), 5)
+        self.assertEqual(recipes[-1]['tags'], [tag.id])
+
+    def test_sparse_fieldset(self):
+        '''Test ?fields= trims the output and skips unrequested relations'''
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(sample_tag(user=self.user))
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPES_URL, {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data['results'], [{'id': recipe.id, 'title': recipe.title}]  # type:ignore
+        )
+        recipe_queries = [
+            query['sql'] for query in ctx.captured_queries if 'core_recipe' in query['sql']
+        ]
+        self.assertEqual(len(recipe_queries), 1)
+        self.assertNotIn('"core_recipe"."price"', recipe_queries[0])
+
+    def test_sparse_fieldset_with_relation(self):
+        '''Test requesting a relation still prefetches it'''
+        recipe = sample_recipe(user=self.user)
+        tag = sample_tag(user=self.user)
+        recipe.tags.add(tag)
+
+        res = self.client.get(detail_url(recipe.id), {'fields': 'title,tags'})
+
+        self.assertEqual(
+            res.data, {'title': recipe.title, 'tags': [{'id': tag.id, 'name': tag.name}]}  # type:ignore
+        )
+
 
 class RecipeImageUploadTests(TestCase):
     def setUp(self):
@@ -196,7 +392,10 @@ class RecipeImageUploadTests(TestCase):
         self.recipe = sample_recipe(user=self.user)
 
     def tearDown(self):
-        self.recipe.image.delete()
+        # The storage keeps files on delete(), leaving them to gc_media
+        self.recipe.refresh_from_db()
+        if self.recipe.image and default_storage.exists(self.recipe.image.name):
+            os.remove(self.recipe.image.path)
 
     def test_upload_image_to_recipe(self):
         '''Test uploading an email to recipe'''
@@ -211,6 +410,31 @@ class RecipeImageUploadTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
+    @override_settings(
+        RECIPE_IMAGE_DERIVATIVES={'SIZES': (4,), 'FORMATS': ('JPEG', 'PNG'), 'WORKERS': 0}
+    )
+    def test_upload_image_generates_derivatives(self):
+        '''Test resized copies are generated once the upload commits'''
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            img = Image.new('RGB', (10, 10))
+            img.save(ntf, format='JPEG')
+            ntf.seek(0)
+            with self.captureOnCommitCallbacks(execute=True):
+                res = self.client.post(url, {'image': ntf}, format='multipart')
+
+        self.assertEqual(res.data['image_derivatives'], {})  # type:ignore
+        self.recipe.refresh_from_db()
+        self.assertEqual(set(self.recipe.image_derivatives), {'4_jpg', '4_png'})
+        for name in self.recipe.image_derivatives.values():
+            path = default_storage.path(name)
+            with Image.open(path) as derivative:
+                self.assertEqual(derivative.size, (4, 4))
+            os.remove(path)
+
+        res = self.client.get(detail_url(self.recipe.id))
+        self.assertTrue(res.data['image_derivatives']['4_png'].endswith('_4.png'))  # type:ignore
+
     def test_upload_image_bad_request(self):
         '''Test uploading an invalid image'''
         url = image_upload_url(self.recipe.id)
@@ -218,6 +442,60 @@ class RecipeImageUploadTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def _upload(self, image, image_format, suffix):
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix=suffix) as ntf:
+            image.save(ntf, format=image_format)
+            ntf.seek(0)
+            return self.client.post(url, {'image': ntf}, format='multipart')
+
+    @override_settings(RECIPE_IMAGE_UPLOAD={'MAX_BYTES': 1024, 'PROBE_BYTES': 256})
+    def test_upload_image_too_many_bytes(self):
+        '''Test uploads over the byte limit are rejected while streaming'''
+        noise = Image.frombytes('L', (100, 100), os.urandom(100 * 100))
+        res = self._upload(noise, 'PNG', '.png')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('bytes', res.data['image'][0])  # type:ignore
+        self.assertEqual(os.listdir(os.path.join(settings.MEDIA_ROOT, 'tmp')), [])
+
+    @override_settings(RECIPE_IMAGE_UPLOAD={'MAX_PIXELS': 1000})
+    def test_upload_image_too_many_pixels(self):
+        '''Test images with oversized dimensions are rejected from the header'''
+        res = self._upload(Image.new('RGB', (100, 100)), 'PNG', '.png')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('100x100', res.data['image'][0])  # type:ignore
+
+    def test_upload_image_decompression_bomb(self):
+        '''Test headers claiming more pixels than Pillow allows are rejected'''
+
+        def chunk(kind, data):
+            crc = zlib.crc32(kind + data)
+            return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', crc)
+
+        for size in (30000, 15000):
+            header = struct.pack('>IIBBBBB', size, size, 8, 2, 0, 0, 0)
+            png = b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IEND', b'')
+            with tempfile.NamedTemporaryFile(suffix='.png') as ntf:
+                ntf.write(png)
+                ntf.seek(0)
+                res = self.client.post(
+                    image_upload_url(self.recipe.id), {'image': ntf}, format='multipart'
+                )
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('too large', res.data['image'][0])  # type:ignore
+
+    def test_upload_image_unsupported_format(self):
+        '''Test images in formats outside the allowed list are rejected'''
+        res = self._upload(Image.new('RGB', (10, 10)), 'BMP', '.bmp')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('BMP', res.data['image'][0])  # type:ignore
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
     def test_filter_recipes_by_tags(self):
         '''Test returning recipes with specific tags'''
         recipe_one = sample_recipe(user=self.user, title='Brigadeiro')
@@ -234,9 +512,9 @@ class RecipeImageUploadTests(TestCase):
         serializer_two = RecipeSerializer(recipe_two)
         serializer_three = RecipeSerializer(recipe_three)
 
-        self.assertIn(serializer_one.data, res.data)  # type:ignore
-        self.assertIn(serializer_two.data, res.data)  # type:ignore
-        self.assertNotIn(serializer_three.data, res.data)  # type:ignore
+        self.assertIn(serializer_one.data, res.data['results'])  # type:ignore
+        self.assertIn(serializer_two.data, res.data['results'])  # type:ignore
+        self.assertNotIn(serializer_three.data, res.data['results'])  # type:ignore
 
     def test_filter_recipes_by_ingredients(self):
         '''Test returning recipes with specific ingredients'''
@@ -256,6 +534,112 @@ class RecipeImageUploadTests(TestCase):
         serializer_two = RecipeSerializer(recipe_two)
         serializer_three = RecipeSerializer(recipe_three)
 
-        self.assertIn(serializer_one.data, res.data)  # type:ignore
-        self.assertIn(serializer_two.data, res.data)  # type:ignore
-        self.assertNotIn(serializer_three.data, res.data)  # type:ignore
+        self.assertIn(serializer_one.data, res.data['results'])  # type:ignore
+        self.assertIn(serializer_two.data, res.data['results'])  # type:ignore
+        self.assertNotIn(serializer_three.data, res.data['results'])  # type:ignore
+
+    def test_filter_recipes_any_no_duplicates(self):
+        '''Test a recipe matching several tags is returned once'''
+        recipe = sample_recipe(user=self.user, title='Pad Thai')
+        tag_one = sample_tag(user=self.user, name='Thai')
+        tag_two = sample_tag(user=self.user, name='Noodles')
+        recipe.tags.add(tag_one, tag_two)
+
+        res = self.client.get(RECIPES_URL, {'tags': f'{tag_one.id},{tag_two.id}'})
+
+        self.assertEqual(len(res.data['results']), 1)  # type:ignore
+        self.assertEqual(res.data['results'][0]['id'], recipe.id)  # type:ignore
+
+    def test_filter_recipes_match_all(self):
+        '''Test match=all only returns recipes linked to every ID'''
+        tag_one = sample_tag(user=self.user, name='Thai')
+        tag_two = sample_tag(user=self.user, name='Noodles')
+        ingredient = sample_ingredient(user=self.user, name='Peanuts')
+        both = sample_recipe(user=self.user, title='Pad Thai')
+        both.tags.add(tag_one, tag_two)
+        both.ingredients.add(ingredient)
+        partial = sample_recipe(user=self.user, title='Green curry')
+        partial.tags.add(tag_one)
+        partial.ingredients.add(ingredient)
+
+        res = self.client.get(
+            RECIPES_URL,
+            {
+                'tags': f'{tag_one.id},{tag_two.id},{tag_two.id}',
+                'ingredients': f'{ingredient.id}',
+                'match': 'all',
+            },
+        )
+
+        ids = [recipe['id'] for recipe in res.data['results']]  # type:ignore
+        self.assertEqual(ids, [both.id])
+
+    def test_filter_recipes_invalid_match(self):
+        '''Test an unknown match mode is rejected'''
+        res = self.client.get(RECIPES_URL, {'tags': '1', 'match': 'some'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_recipes(self):
+        '''Test searching recipes by words in their title'''
+        curry = sample_recipe(user=self.user, title='Thai vegetable curry')
+        sample_recipe(user=self.user, title='Aubergine with tahini')
+        sample_recipe(user=self.user, title='Vegetable soup')
+
+        res = self.client.get(RECIPES_URL, {'search': 'CURRY vegetable'})
+
+        ids = [recipe['id'] for recipe in res.data['results']]  # type:ignore
+        self.assertEqual(ids, [curry.id])
+
+    def test_search_recipes_other_users_excluded(self):
+        '''Test search only returns the authenticated user's recipes'''
+        other = get_user_model().objects.create_user(  # type:ignore
+            'other@email.com', 'pass1234'
+        )
+        sample_recipe(user=other, title='Thai vegetable curry')
+
+        res = self.client.get(RECIPES_URL, {'search': 'curry'})
+
+        self.assertEqual(res.data['results'], [])  # type:ignore
+
+    def test_search_recipes_with_tag_filter(self):
+        '''Test search combines with the tag filter'''
+        tag = sample_tag(user=self.user, name='Vegan')
+        tagged = sample_recipe(user=self.user, title='Vegetable curry')
+        tagged.tags.add(tag)
+        sample_recipe(user=self.user, title='Chicken curry')
+
+        res = self.client.get(RECIPES_URL, {'search': 'curry', 'tags': tag.id})
+
+        ids = [recipe['id'] for recipe in res.data['results']]  # type:ignore
+        self.assertEqual(ids, [tagged.id])
+
+    def test_ranked_search_ordered_by_rank(self):
+        '''Test ranked search results are paginated best match first'''
+        ranked = Recipe.objects.annotate(rank=Value(0.5, output_field=FloatField()))
+        paginator = RecipeCursorPagination()
+
+        self.assertEqual(paginator.get_ordering(None, ranked, None), ('-rank', 'id'))
+        self.assertEqual(
+            paginator.get_ordering(None, Recipe.objects.all(), None), ('id',)
+        )
+
+    @skipUnless(connection.vendor == 'postgresql', 'Ranked search needs Postgres')
+    def test_ranked_search_pages(self):
+        '''Test walking ranked search pages returns each match once, in rank order'''
+        for i in range(30):
+            # Repeating the word a varying number of times varies the rank,
+            # with ties between recipes of the same count
+            sample_recipe(user=self.user, title=' '.join(['curry'] * (i % 7 + 1)))
+
+        res = self.client.get(RECIPES_URL, {'search': 'curry', 'page_size': 200})
+        expected = [recipe['id'] for recipe in res.data['results']]  # type:ignore
+        ids = []
+        url, params = RECIPES_URL, {'search': 'curry', 'page_size': 4}
+        while url:
+            res = self.client.get(url, params)
+            ids.extend(recipe['id'] for recipe in res.data['results'])  # type:ignore
+            url, params = res.data['next'], None  # type:ignore
+
+        self.assertEqual(len(expected), 30)
+        self.assertEqual(ids, expected)
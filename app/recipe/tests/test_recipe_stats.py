@@ -0,0 +1,251 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models.signals import pre_delete
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, RecipeStats, Tag
+from core.seed import seed_user_data
+from core.stats import check_stats
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+STATS_URL = reverse('recipe:recipe-stats')
+
+
+class RecipeStatsApiTests(TestCase):
+    '''Test the /recipes/stats/ summary and its incremental upkeep'''
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(  # type:ignore
+            'test@email.com', 'pass1234'
+        )
+        self.client.force_authenticate(self.user)
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.quick = Tag.objects.create(user=self.user, name='Quick')
+        self.salt = Ingredient.objects.create(user=self.user, name='Salt')
+
+    def assertConsistent(self):
+        self.assertEqual(check_stats([self.user.pk]), [])
+
+    def test_stats_summarise_recipes(self):
+        '''Test count, averages, time distribution and top tags'''
+        soup = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=10, price=Decimal('4.00')
+        )
+        stew = Recipe.objects.create(
+            user=self.user, title='Stew', time_minutes=90, price=Decimal('9.51')
+        )
+        soup.tags.add(self.vegan, self.quick)
+        stew.tags.add(self.vegan)
+        stew.ingredients.add(self.salt)
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipe_count'], 2)
+        self.assertEqual(res.data['average_price'], '6.76')
+        self.assertEqual(res.data['average_time_minutes'], 50.0)
+        self.assertEqual(
+            [bucket['recipe_count'] for bucket in res.data['time_distribution']],
+            [1, 0, 0, 1],
+        )
+        self.assertEqual(
+            res.data['top_tags'],
+            [
+                {'id': self.vegan.pk, 'name': 'Vegan', 'recipe_count': 2},
+                {'id': self.quick.pk, 'name': 'Quick', 'recipe_count': 1},
+            ],
+        )
+        self.assertEqual(
+            res.data['top_ingredients'],
+            [{'id': self.salt.pk, 'name': 'Salt', 'recipe_count': 1}],
+        )
+
+    def test_stats_empty(self):
+        '''Test a user without recipes gets an empty summary'''
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['recipe_count'], 0)
+        self.assertIsNone(res.data['average_price'])
+        self.assertEqual(res.data['top_tags'], [])
+
+    def test_stats_limited_to_user(self):
+        '''Test other users' recipes are not counted'''
+        other = get_user_model().objects.create_user(  # type:ignore
+            'other@email.com', 'pass1234'
+        )
+        Recipe.objects.create(user=other, title='Other', time_minutes=5, price=1)
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['recipe_count'], 0)
+
+    def test_stats_top_param(self):
+        '''Test ?top= limits the top lists and is validated'''
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=10, price=4
+        )
+        recipe.tags.add(self.vegan, self.quick)
+
+        res = self.client.get(STATS_URL, {'top': 1})
+        self.assertEqual(len(res.data['top_tags']), 1)
+
+        for top in ('x', '-1', '51'):
+            res = self.client.get(STATS_URL, {'top': top})
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_stats_follow_changes(self):
+        '''Test every way of changing recipes keeps the summary exact'''
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=10, price=Decimal('4.00')
+        )
+        recipe.tags.add(self.vegan, self.quick)
+        self.assertConsistent()
+
+        recipe.price = Decimal('5.25')
+        recipe.time_minutes = 45
+        recipe.save()
+        self.assertConsistent()
+
+        # Removing a missing link changes nothing
+        recipe.ingredients.remove(self.salt)
+        recipe.tags.remove(self.quick)
+        self.assertConsistent()
+
+        self.salt.recipe_set.add(recipe)
+        self.vegan.recipe_set.clear()
+        self.assertConsistent()
+
+        deferred = Recipe.objects.only('id', 'user').get(pk=recipe.pk)
+        deferred.price = 7
+        deferred.save()
+        self.assertConsistent()
+
+        recipe.tags.set([self.quick])
+        self.quick.delete()
+        self.assertConsistent()
+
+        recipe.delete()
+        self.assertConsistent()
+        self.assertEqual(RecipeStats.objects.get(user=self.user).recipe_count, 0)
+
+    def test_stats_follow_api_changes(self):
+        '''Test bulk creates, updates and deletes through the API'''
+        payload = [
+            {
+                'title': f'Recipe {i}',
+                'time_minutes': 5 * i,
+                'price': '1.99',
+                'tags': [self.vegan.pk],
+                'ingredients': [self.salt.pk],
+            }
+            for i in range(1, 4)
+        ]
+        res = self.client.post(RECIPES_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertConsistent()
+        self.vegan.refresh_from_db()
+        self.assertEqual(self.vegan.recipe_count, 3)
+
+        recipe_id = res.data[0]['id']
+        url = reverse('recipe:recipe-detail', args=[recipe_id])
+        self.client.patch(url, {'time_minutes': 120, 'tags': [self.quick.pk]})
+        self.assertConsistent()
+
+        self.client.delete(url)
+        self.assertConsistent()
+
+        res = self.client.get(STATS_URL)
+        self.assertEqual(res.data['recipe_count'], 2)
+        self.assertEqual(res.data['top_tags'][0]['id'], self.vegan.pk)
+
+    def test_bulk_delete_batched(self):
+        '''Test deleting many recipes or tags costs the same queries as a few'''
+
+        def delete_queries(count):
+            user = get_user_model().objects.create_user(  # type:ignore
+                f'bulk{count}@email.com', 'pass1234'
+            )
+            # Every recipe has every tag, so all counts drop by the same amount
+            seed_user_data(user, recipes=count, attrs=4, attrs_per_recipe=4)
+            with CaptureQueriesContext(connection) as recipe_queries:
+                Recipe.objects.filter(user=user).delete()
+            self.assertEqual(check_stats([user.pk]), [])
+            self.assertFalse(Tag.objects.filter(user=user, recipe_count__gt=0).exists())
+            with CaptureQueriesContext(connection) as tag_queries:
+                Tag.objects.filter(user=user).delete()
+            self.assertEqual(check_stats([user.pk]), [])
+            return len(recipe_queries), len(tag_queries)
+
+        self.assertEqual(delete_queries(3), delete_queries(30))
+
+    def test_user_delete_skips_summary(self):
+        '''Test deleting a user does not update their summary row by row'''
+        seed_user_data(self.user, recipes=10, attrs=4, attrs_per_recipe=2)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.user.delete()
+
+        self.assertFalse(
+            [query for query in queries if 'UPDATE "core_recipestats"' in query['sql']]
+        )
+        self.assertFalse(RecipeStats.objects.exists())
+
+    def test_stats_after_seeding(self):
+        '''Test seeded data, inserted without signals, is summarised'''
+        seed_user_data(self.user, recipes=20, attrs=5, attrs_per_recipe=2)
+
+        self.assertConsistent()
+        self.assertEqual(RecipeStats.objects.get(user=self.user).recipe_count, 20)
+
+    def test_stats_not_modified(self):
+        '''Test an unchanged summary is answered with 304'''
+        res = self.client.get(STATS_URL)
+
+        res = self.client.get(STATS_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class RecipeStatsTransactionTests(TransactionTestCase):
+    '''Test summary upkeep around transactions that do not commit'''
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(  # type:ignore
+            'test@email.com', 'pass1234'
+        )
+
+    def test_failed_delete_not_counted(self):
+        '''Test a delete aborted before its SQL leaves the summary alone'''
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=10, price=4
+        )
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe.tags.add(tag)
+
+        def abort(sender, **kwargs):
+            raise ValueError
+
+        pre_delete.connect(abort, sender=Recipe)
+        self.addCleanup(pre_delete.disconnect, abort, sender=Recipe)
+        with self.assertRaises(ValueError):
+            Recipe.objects.filter(user=self.user).delete()
+        with transaction.atomic():
+            with self.assertRaises(ValueError), transaction.atomic():
+                recipe.delete()
+            # Nothing left over from the failed delete runs with this query
+            Tag.objects.create(user=self.user, name='Quick')
+
+        self.assertEqual(check_stats([self.user.pk]), [])
+        tag.refresh_from_db()
+        self.assertEqual(tag.recipe_count, 1)
@@ -0,0 +1,81 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+from recipe.cache import get_response_cache
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class ResponseCacheTests(TestCase):
+    '''Test caching rendered recipe API responses'''
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(  # type:ignore
+            'test@email.com', 'pass1234'
+        )
+        self.client.force_authenticate(self.user)
+        # Versions are bumped on commit, which tests only reach this way
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe = Recipe.objects.create(
+                user=self.user, title='Pancakes', time_minutes=5, price=3.00
+            )
+
+    def test_repeat_request_served_from_cache(self):
+        '''Test an identical request is a hit costing one query'''
+        first = self.client.get(RECIPES_URL)
+        hits = get_response_cache().stats()['hits']
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(res['X-Cache'], 'HIT')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.content, first.content)
+        self.assertEqual(get_response_cache().stats()['hits'], hits + 1)
+
+    def test_id_order_normalized(self):
+        '''Test filter IDs in a different order share an entry'''
+        tag_one = Tag.objects.create(user=self.user, name='Vegan')
+        tag_two = Tag.objects.create(user=self.user, name='Quick')
+        self.recipe.tags.add(tag_one)
+
+        self.client.get(RECIPES_URL, {'tags': f'{tag_one.id},{tag_two.id}'})
+        res = self.client.get(RECIPES_URL, {'tags': f'{tag_two.id}, {tag_one.id}'})
+
+        self.assertEqual(res['X-Cache'], 'HIT')
+
+    def test_write_invalidates_entries(self):
+        '''Test a new tag is visible on the next list request'''
+        self.client.get(TAGS_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(len(json.loads(res.content)['results']), 1)
+
+    def test_entries_scoped_to_user(self):
+        '''Test another user never receives a cached response'''
+        self.client.get(RECIPES_URL)
+        user_two = get_user_model().objects.create_user(  # type:ignore
+            'another@email.com', 'pass1234'
+        )
+        self.client.force_authenticate(user_two)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data['results'], [])  # type:ignore
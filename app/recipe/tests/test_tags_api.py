@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.urls import reverse
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -44,7 +46,7 @@ class PrivateTagsApiTests(TestCase):
         tags = Tag.objects.all().order_by('-name')
         serializer = TagSerializer(tags, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)  # type:ignore
+        self.assertEqual(res.data['results'], serializer.data)  # type:ignore
 
     def test_tags_limited_to_user(self):
         """Test that tags returned are for authenticated user"""
@@ -57,8 +59,8 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.get(TAGS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)  # type:ignore
-        self.assertEqual(res.data[0]['name'], tag.name)  # type:ignore
+        self.assertEqual(len(res.data['results']), 1)  # type:ignore
+        self.assertEqual(res.data['results'][0]['name'], tag.name)  # type:ignore
 
     def test_create_tag_successful(self):
         """Test creating a new tag"""
@@ -91,8 +93,8 @@ class PrivateTagsApiTests(TestCase):
 
         serializer1 = TagSerializer(tag1)
         serializer2 = TagSerializer(tag2)
-        self.assertIn(serializer1.data, res.data)  # type:ignore
-        self.assertNotIn(serializer2.data, res.data)  # type:ignore
+        self.assertIn(serializer1.data, res.data['results'])  # type:ignore
+        self.assertNotIn(serializer2.data, res.data['results'])  # type:ignore
 
     def test_retrieve_tags_assigned_unique(self):
         """Test filtering tags by assigned returns unique items"""
@@ -109,4 +111,130 @@ class PrivateTagsApiTests(TestCase):
 
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)  # type:ignore
+        self.assertEqual(len(res.data['results']), 1)  # type:ignore
+
+    def test_tags_paginated_by_cursor(self):
+        """Test walking tag pages returns every tag once in order"""
+        names = [f'Tag {i:02d}' for i in range(5)]
+        for name in names:
+            Tag.objects.create(user=self.user, name=name)
+
+        seen = []
+        res = self.client.get(TAGS_URL, {'page_size': 2})
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(res.data['results']), 2)  # type:ignore
+            seen.extend(tag['name'] for tag in res.data['results'])  # type:ignore
+            if not res.data['next']:  # type:ignore
+                break
+            res = self.client.get(res.data['next'])  # type:ignore
+
+        self.assertEqual(seen, sorted(names, reverse=True))
+
+    def test_tied_tags_paginated_without_offset(self):
+        """Test pages through tied counts and names start after the last row"""
+        tags = [Tag.objects.create(user=self.user, name='Same') for _ in range(7)]
+        recipe = Recipe.objects.create(
+            title='Pancakes', time_minutes=5, price=3.00, user=self.user
+        )
+        recipe.tags.add(tags[3])
+        expected = [tags[3].id] + [tag.id for tag in tags if tag is not tags[3]]
+
+        for ordering, order in (('-recipe_count', expected), ('-name', [t.id for t in tags])):
+            seen = []
+            res = self.client.get(TAGS_URL, {'ordering': ordering, 'page_size': 2})
+            while True:
+                seen.extend(tag['id'] for tag in res.data['results'])  # type:ignore
+                if not res.data['next']:  # type:ignore
+                    break
+                with CaptureQueriesContext(connection) as ctx:
+                    res = self.client.get(res.data['next'])  # type:ignore
+                self.assertFalse(
+                    [query for query in ctx.captured_queries if 'OFFSET' in query['sql']]
+                )
+
+            self.assertEqual(seen, order)
+            # Walking back by the previous links returns the same rows
+            back = []
+            while res.data['previous']:  # type:ignore
+                res = self.client.get(res.data['previous'])  # type:ignore
+                back[:0] = [tag['id'] for tag in res.data['results']]  # type:ignore
+            self.assertEqual(back, order[:len(back)])
+            self.assertEqual(len(back), 6)
+
+    def test_assigned_only_paginated(self):
+        """Test assigned_only filtering is kept across pages"""
+        recipe = Recipe.objects.create(
+            title='Pancakes', time_minutes=5, price=3.00, user=self.user
+        )
+        for i in range(3):
+            recipe.tags.add(Tag.objects.create(user=self.user, name=f'Used {i}'))
+        Tag.objects.create(user=self.user, name='Unused')
+
+        res = self.client.get(TAGS_URL, {'assigned_only': 1, 'page_size': 2})
+        res_next = self.client.get(res.data['next'])  # type:ignore
+
+        names = [tag['name'] for tag in res.data['results']]  # type:ignore
+        names += [tag['name'] for tag in res_next.data['results']]  # type:ignore
+        self.assertEqual(names, ['Used 2', 'Used 1', 'Used 0'])
+        self.assertIsNone(res_next.data['next'])  # type:ignore
+
+    def test_bulk_create_tags(self):
+        """Test creating several tags with one request"""
+        payload = [{'name': 'Vegan'}, {'name': 'Spicy'}, {'name': 'Quick'}]
+        res = self.client.post(TAGS_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 3)  # type:ignore
+        names = Tag.objects.filter(user=self.user).values_list('name', flat=True)
+        self.assertEqual(set(names), {'Vegan', 'Spicy', 'Quick'})
+
+    def test_bulk_create_tags_invalid(self):
+        """Test one invalid item rejects the whole batch"""
+        payload = [{'name': 'Vegan'}, {'name': ''}]
+        res = self.client.post(TAGS_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Tag.objects.exists())
+
+    def test_sparse_fieldset(self):
+        """Test ?fields= limits the tag output"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.get(TAGS_URL, {'fields': 'id'})
+
+        self.assertEqual(res.data['results'], [{'id': tag.id}])  # type:ignore
+
+    def test_sparse_fieldset_unknown_field(self):
+        """Test ?fields= with an unknown name is rejected"""
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.get(TAGS_URL, {'fields': 'id,bogus'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            res.data['fields'], 'Must be a comma separated list of: id, name.'  # type:ignore
+        )
+
+    def test_tags_ordered_by_recipe_count(self):
+        """Test ?ordering=-recipe_count lists the most used tags first"""
+        tags = [Tag.objects.create(user=self.user, name=f'Tag {i}') for i in range(3)]
+        for i in range(3):
+            recipe = Recipe.objects.create(
+                title=f'Recipe {i}', time_minutes=5, price=3.00, user=self.user
+            )
+            recipe.tags.add(*tags[i:])
+
+        res = self.client.get(
+            TAGS_URL, {'ordering': '-recipe_count', 'page_size': 2, 'fields': 'id'}
+        )
+        res_next = self.client.get(res.data['next'])  # type:ignore
+
+        ids = [tag['id'] for tag in res.data['results'] + res_next.data['results']]  # type:ignore
+        self.assertEqual(ids, [tags[2].id, tags[1].id, tags[0].id])
+
+    def test_tags_invalid_ordering(self):
+        """Test orderings without an index are rejected"""
+        res = self.client.get(TAGS_URL, {'ordering': 'user'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
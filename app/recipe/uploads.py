@@ -0,0 +1,117 @@
+import hashlib
+import os
+import tempfile
+import warnings
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+
+from PIL import Image, UnidentifiedImageError
+
+
+DEFAULT_RECIPE_IMAGE_UPLOAD = {
+    'MAX_BYTES': 10 * 2 ** 20,
+    'MAX_PIXELS': 40 * 10 ** 6,
+    'FORMATS': ('JPEG', 'PNG', 'WEBP', 'GIF'),
+    # Bytes to buffer before the image header is first inspected
+    'PROBE_BYTES': 64 * 2 ** 10,
+}
+
+
+def get_upload_options():
+    return {
+        **DEFAULT_RECIPE_IMAGE_UPLOAD,
+        **getattr(settings, 'RECIPE_IMAGE_UPLOAD', {}),
+    }
+
+
+class MediaTemporaryUploadedFile(TemporaryUploadedFile):
+    '''Uploaded file streamed to a temporary file inside MEDIA_ROOT
+
+    Keeping the temporary file on the same filesystem as the media
+    directory lets the storage backend move it into place with a rename
+    instead of copying it.
+    '''
+
+    def __init__(self, name, content_type, size, charset, content_type_extra=None):
+        directory = os.path.join(settings.MEDIA_ROOT, 'tmp')
+        os.makedirs(directory, exist_ok=True)
+        _, ext = os.path.splitext(name)
+        file = tempfile.NamedTemporaryFile(suffix='.upload' + ext, dir=directory)
+        UploadedFile.__init__(
+            self, file, name, content_type, size, charset, content_type_extra
+        )
+
+
+class StreamingImageUploadHandler(FileUploadHandler):
+    '''Stream an image upload to disk, rejecting it as early as possible
+
+    The byte limit is enforced while chunks arrive, and once enough of the
+    file is on disk only its header is read to check the format and pixel
+    dimensions, so oversized files and decompression bombs are never fully
+    decoded. The content is hashed as it streams in for the content
+    addressed storage. The reason for a rejection is left on the request as
+    upload_error.
+    '''
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.options = get_upload_options()
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = MediaTemporaryUploadedFile(
+            self.file_name, self.content_type, 0, self.charset, self.content_type_extra
+        )
+        self.received = 0
+        self.probed = False
+        self.sha256 = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.options['MAX_BYTES']:
+            self.reject(f'Image must not exceed {self.options["MAX_BYTES"]} bytes.')
+
+        self.file.write(raw_data)
+        self.sha256.update(raw_data)
+        if not self.probed and self.received >= self.options['PROBE_BYTES']:
+            self.probe(complete=False)
+
+    def file_complete(self, file_size):
+        if not self.probed:
+            self.probe(complete=True)
+        self.file.seek(0)
+        self.file.size = file_size
+        # Lets ContentAddressedStorage skip hashing the file again
+        self.file.sha256 = self.sha256.hexdigest()
+
+        return self.file
+
+    def probe(self, complete):
+        '''Check the image header without decoding the pixel data'''
+        self.file.flush()
+        try:
+            with warnings.catch_warnings():
+                # Pillow only warns below twice its own pixel limit
+                warnings.simplefilter('error', Image.DecompressionBombWarning)
+                with Image.open(self.file.temporary_file_path()) as image:
+                    image_format, (width, height) = image.format, image.size
+        except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+            self.reject('Image dimensions are too large.')
+        except (UnidentifiedImageError, OSError, SyntaxError):
+            # The header may simply not have arrived yet
+            if complete:
+                self.reject('Upload a valid image.')
+            return
+
+        self.probed = True
+        if image_format not in self.options['FORMATS']:
+            self.reject(f'Unsupported image format {image_format}.')
+        if width * height > self.options['MAX_PIXELS']:
+            self.reject(f'Image dimensions {width}x{height} are too large.')
+
+    def reject(self, message):
+        if self.request is not None:
+            self.request.upload_error = message
+        raise StopUpload(connection_reset=False)
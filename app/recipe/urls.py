@@ -1,11 +1,18 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+
+from core.concurrency import get_async_options
 from recipe import views
 
 router = DefaultRouter()
-router.register('tags', views.TagViewSet)
-router.register('ingredients', views.IngredientViewSet)
-router.register('recipes', views.RecipeViewSet)
+if get_async_options()['ENABLED']:
+    router.register('tags', views.AsyncTagViewSet)
+    router.register('ingredients', views.AsyncIngredientViewSet)
+    router.register('recipes', views.AsyncRecipeViewSet)
+else:
+    router.register('tags', views.TagViewSet)
+    router.register('ingredients', views.IngredientViewSet)
+    router.register('recipes', views.RecipeViewSet)
 
 app_name = 'recipe'
 
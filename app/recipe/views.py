@@ -1,37 +1,303 @@
+import asyncio
+import hashlib
+import tempfile
+
+from django.db import transaction
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.db.models import Count, Exists, OuterRef, Subquery, prefetch_related_objects
+from django.utils.cache import get_conditional_response
+
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
-from core.models import Tag, Ingredient, Recipe
+from core.authentication import CachedTokenAuthentication
+from core.concurrency import AsyncAPIViewMixin, run_db
+from core.models import CollectionVersion, Tag, Ingredient, Recipe, RecipeStats
+from core.renderers import CSVRenderer, NDJSONRenderer
+from core.stats import empty_stats
+from core.streaming import chunked_iterator, stream_json_array
 
 from recipe import serializers
+from recipe.autocomplete import (
+    add_similar,
+    autocomplete,
+    get_autocomplete_options,
+    get_trie_cache,
+)
+from recipe.cache import get_response_cache
+from recipe.export import ENCODERS, buffered, export_recipes
+from recipe.images import schedule_derivatives
+from recipe.uploads import StreamingImageUploadHandler
+from recipe.pagination import RecipeAttrCursorPagination, RecipeCursorPagination
+from recipe.search import search_recipes
+
+
+class BulkCreateMixin:
+    '''Accept a list payload on create and write it in a single transaction'''
+
+    max_bulk_create = 1000
+
+    def get_serializer(self, *args, **kwargs):
+        data = kwargs.get('data')
+        if self.action == 'create' and isinstance(data, list):
+            if len(data) > self.max_bulk_create:
+                raise ValidationError(
+                    f'Cannot create more than {self.max_bulk_create} objects at once.'
+                )
+            kwargs['many'] = True
+        return super().get_serializer(*args, **kwargs)
+
+    def create(self, request, *args, **kwargs):
+        with transaction.atomic():
+            return super().create(request, *args, **kwargs)
+
+
+class ConditionalGetMixin:
+    '''Answer unchanged list and detail requests with 304 Not Modified
+
+    The ETag combines the user's collection version with the request, so a
+    matching If-None-Match is answered without querying the recipe tables
+    or running the serializers. Other requests are served from the response
+    cache, keyed on the same version. No Last-Modified is sent: its one
+    second precision would let If-Modified-Since hide a write made in the
+    same second as the client's last read.
+    '''
+
+    def _validators(self, request):
+        '''Return the collection version and ETag'''
+        version = CollectionVersion.objects.current(request.user)
+        # Reused by handlers that key their own caches on the version
+        self.collection_version = version
+        digest = hashlib.md5(
+            ':'.join(
+                (
+                    str(request.user.pk),
+                    str(version.version),
+                    request.accepted_renderer.format,
+                    request.get_full_path(),
+                )
+            ).encode()
+        ).hexdigest()
+
+        return version, f'"{digest}"'
+
+    def _set_validators(self, response, etag):
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+
+        return response
+
+    def _conditional(self, request, handler, *args, **kwargs):
+        version, etag = self._validators(request)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = self._cached(request, handler, version, *args, **kwargs)
+
+        return self._set_validators(response, etag)
+
+    async def _conditional_async(self, request, handler, *args, **kwargs):
+        '''_conditional for coroutine handlers of the async viewsets'''
+
+        def lookup():
+            # One trip to the thread pool for the validators and the cache
+            version, etag = self._validators(request)
+            response = get_conditional_response(request, etag=etag)
+            key = None
+            if response is None:
+                key, response = self._cache_lookup(request, version)
+            return key, response, etag
+
+        key, response, etag = await run_db(lookup)
+        if response is None:
+            response = await handler(request, *args, **kwargs)
+            if key is not None:
+                await run_db(self._cache_store, key, request, response, *args, **kwargs)
+
+        return self._set_validators(response, etag)
+
+    def _cached(self, request, handler, version, *args, **kwargs):
+        '''Serve rendered JSON from the response cache when possible'''
+        key, response = self._cache_lookup(request, version)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            self._cache_store(key, request, response, *args, **kwargs)
+
+        return response
+
+    def _cache_lookup(self, request, version):
+        '''Return the cache key and the cached response, if any'''
+        response_cache = get_response_cache()
+        if response_cache is None or request.accepted_renderer.format != 'json':
+            return None, None
+
+        key = response_cache.key(self, request, version)
+        cached = response_cache.get(key)
+        if cached is None:
+            return key, None
+
+        content, content_type = cached
+        response = HttpResponse(content, content_type=content_type)
+        response['X-Cache'] = 'HIT'
+        return key, response
+
+    def _cache_store(self, key, request, response, *args, **kwargs):
+        if key is None:
+            return
+        if isinstance(response, Response) and response.status_code == status.HTTP_200_OK:
+            response = self.finalize_response(request, response, *args, **kwargs)
+            response.render()
+            get_response_cache().set(key, response.content, response['Content-Type'])
+        response['X-Cache'] = 'MISS'
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(request, super().list, *args, **kwargs)
+
+
+class AutocompleteMixin:
+    '''Answer ?q= (or ?autocomplete=) with the best matching names
+
+    Responds with a plain list of at most ?limit= objects instead of a page.
+    When the trie cache is enabled, prefix matches over all of the user's
+    objects are served from memory; similar names are still added from the
+    database on Postgres, so results do not depend on the cache.
+    '''
+
+    def list(self, request, *args, **kwargs):
+        params = request.query_params
+        text = (params.get('q') or params.get('autocomplete') or '').strip()
+        if not text:
+            return super().list(request, *args, **kwargs)
+
+        options = get_autocomplete_options()
+        try:
+            limit = int(params.get('limit', options['LIMIT']))
+        except ValueError:
+            raise ValidationError({'limit': 'Must be an integer.'})
+        limit = max(1, min(limit, options['MAX_LIMIT']))
+
+        matches = self._autocomplete(request, text, limit)
+        return Response(self.get_serializer(matches, many=True).data)
+
+    def _autocomplete(self, request, text, limit):
+        trie_cache = get_trie_cache()
+        assigned_only = bool(int(request.query_params.get('assigned_only', 0)))
+        if trie_cache is None or assigned_only:
+            return autocomplete(self.get_queryset(), text, limit)
+
+        model = self.queryset.model
+        version = getattr(self, 'collection_version', None)
+        if version is None:
+            version = CollectionVersion.objects.current(request.user)
+        trie = trie_cache.get(
+            (model._meta.label, request.user.pk),
+            version.version,
+            lambda: model.objects.filter(user=request.user).values_list('id', 'name'),
+        )
+        if trie is None:
+            return autocomplete(self.get_queryset(), text, limit)
+
+        matches = [
+            model(id=pk, name=name, user_id=request.user.pk)
+            for pk, name in trie.complete(text, limit)
+        ]
+        return add_similar(self.get_queryset(), text, matches, limit)
+
+
+class StreamingListMixin:
+    '''Stream the whole list as a JSON array when ?stream=1 is passed
+
+    Rows are read with a server side cursor and encoded one at a time, so
+    memory stays flat however many objects the user owns.
+    '''
+
+    stream_chunk_size = 500
+    # Django 3.2 iterates streaming bodies on the event loop under ASGI,
+    # where the lazy queries would fail, so the async viewsets turn this off
+    stream_lists = True
+
+    def list(self, request, *args, **kwargs):
+        stream = request.query_params.get('stream', '0') not in ('', '0', 'false')
+        if not (stream and self.stream_lists) or request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.paginator is not None:
+            queryset = queryset.order_by(
+                *self.paginator.get_ordering(request, queryset, self)
+            )
+        rows = stream_json_array(
+            self.get_serializer(), chunked_iterator(queryset, self.stream_chunk_size)
+        )
+
+        return StreamingHttpResponse(rows, content_type='application/json')
+
+
+class SparseFieldsetMixin:
+    '''Load only the columns and relations requested with ?fields='''
+
+    # Related objects that are prefetched when their field is requested
+    prefetch_fields = ()
+
+    def prefetch_lookups(self):
+        '''Return the related objects the requested fields need'''
+        fields = serializers.requested_fields(self.request)
+        if not fields:
+            return list(self.prefetch_fields)
+
+        return [name for name in self.prefetch_fields if name in fields]
+
+    def restrict_to_fields(self, queryset):
+        fields = serializers.requested_fields(self.request)
+        queryset = queryset.prefetch_related(*self.prefetch_lookups())
+        if not fields:
+            return queryset
+
+        model = queryset.model
+        columns = {field.name for field in model._meta.concrete_fields} & fields
+        # Pagination reads its ordering fields from the last row on the page
+        if self.paginator is not None:
+            ordering = self.paginator.get_ordering(self.request, queryset, self)
+            columns.update(name.lstrip('-') for name in ordering)
+
+        return queryset.only(model._meta.pk.name, *columns)
 
 
 class BaseRecipeAttrViewSet(
-    viewsets.GenericViewSet, mixins.ListModelMixin, mixins.CreateModelMixin
+    SparseFieldsetMixin,
+    ConditionalGetMixin,
+    AutocompleteMixin,
+    StreamingListMixin,
+    BulkCreateMixin,
+    viewsets.GenericViewSet,
+    mixins.ListModelMixin,
+    mixins.CreateModelMixin,
 ):
     """Base viewset for user owned recipe attributes"""
 
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecipeAttrCursorPagination
 
     def get_queryset(self):
         """Return objects for the current authenticated user only"""
         assigned_only = bool(
             int(self.request.query_params.get('assigned_only', 0))  # type:ignore
         )
-        queryset = self.queryset
+        queryset = self.queryset.filter(user=self.request.user)  # type:ignore
 
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)  # type:ignore
+            # A semi-join on the through table avoids joining every recipe
+            # row and then de-duplicating the result with DISTINCT
+            rel = queryset.model._meta.get_field('recipe')
+            assigned = rel.through.objects.filter(
+                **{rel.field.m2m_reverse_field_name(): OuterRef('pk')}
+            )
+            queryset = queryset.filter(Exists(assigned))
 
-        return (
-            queryset.filter(user=self.request.user)  # type:ignore
-            .order_by('-name')
-            .distinct()
-        )
+        return self.restrict_to_fields(queryset).order_by('-name')
 
     def perform_create(self, serializer):
         """Create a new object"""
@@ -52,34 +318,79 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
     serializer_class = serializers.IngredientSerializer
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    SparseFieldsetMixin,
+    ConditionalGetMixin,
+    StreamingListMixin,
+    BulkCreateMixin,
+    viewsets.ModelViewSet,
+):
     """Manage recipes in the database"""
 
     queryset = Recipe.objects.all()
     serializer_class = serializers.RecipeSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecipeCursorPagination
+    prefetch_fields = ('tags', 'ingredients')
+    # Entries in each top list of the stats action
+    stats_top = 5
+    max_stats_top = 50
+    # Recipes read per server side cursor fetch by the export action
+    export_chunk_size = 2000
 
     # prefix of _ to function name makes it a private function
     def _params_to_ints(self, qs):
         '''Convert a list of string IDs to a list of integers'''
         return [int(str_id) for str_id in qs.split(',')]
 
+    def _filter_related(self, queryset, field_name, ids, match):
+        '''Filter recipes linked to any or all of the given related IDs'''
+        field = Recipe._meta.get_field(field_name)
+        links = field.remote_field.through.objects.filter(
+            **{
+                field.m2m_field_name(): OuterRef('pk'),
+                f'{field.m2m_reverse_field_name()}__in': ids,
+            }
+        )
+
+        if match == 'any':
+            return queryset.filter(Exists(links))
+
+        # Every requested ID must be linked, so count the matching through
+        # rows per recipe instead of joining once per ID
+        matched = links.values(field.m2m_field_name()).annotate(matched=Count('*'))
+        return queryset.alias(
+            **{f'{field_name}_matched': Subquery(matched.values('matched'))}
+        ).filter(**{f'{field_name}_matched': len(ids)})
+
     # Default Actions we have overridden
     def get_queryset(self):
         '''Retrieve the recipes for authenticated user'''
 
         tags = self.request.query_params.get('tags')  # type:ignore
         ingredients = self.request.query_params.get('ingredients')  # type:ignore
-        queryset = self.queryset.filter(user=self.request.user)
+        search = self.request.query_params.get('search', '').strip()  # type:ignore
+        match = self.request.query_params.get('match', 'any')  # type:ignore
+        if match not in ('any', 'all'):
+            raise ValidationError({'match': 'Must be either "any" or "all".'})
+
+        queryset = self.restrict_to_fields(
+            self.queryset.filter(user=self.request.user)
+        )
 
         if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            tag_ids = set(self._params_to_ints(tags))
+            queryset = self._filter_related(queryset, 'tags', tag_ids, match)
 
         if ingredients:
-            ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+            ingredient_ids = set(self._params_to_ints(ingredients))
+            queryset = self._filter_related(
+                queryset, 'ingredients', ingredient_ids, match
+            )
+
+        if search:
+            queryset = search_recipes(queryset, search)
 
         return queryset
 
@@ -89,9 +400,15 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return serializers.RecipeDetailSerializer
         elif self.action == 'upload_image':
             return serializers.RecipeImageSerializer
+        elif self.action == 'stats':
+            return serializers.RecipeStatsSerializer
 
         return self.serializer_class
 
+    def retrieve(self, request, *args, **kwargs):
+        '''Retrieve a recipe, answering 304 when it has not changed'''
+        return self._conditional(request, super().retrieve, *args, **kwargs)
+
     def perform_create(self, serializer):
         '''Create a new recipe'''
         serializer.save(user=self.request.user)
@@ -101,10 +418,135 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def upload_image(self, request, pk=None):
         '''Upload an image to a recipe'''
         recipe = self.get_object()
+        request.upload_handlers = [StreamingImageUploadHandler(request)]
         serializer = self.get_serializer(recipe, data=request.data)
+        upload_error = getattr(request, 'upload_error', None)
+        if upload_error:
+            return Response({'image': [upload_error]}, status=status.HTTP_400_BAD_REQUEST)
 
         if serializer.is_valid():
-            serializer.save()
+            # Derivatives of the previous image no longer apply; new ones are
+            # rendered by the worker pool once the upload is committed
+            recipe = serializer.save(image_derivatives={})
+            transaction.on_commit(lambda: schedule_derivatives(recipe))
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(methods=['GET'], detail=False)
+    def stats(self, request):
+        '''Summarise the user's recipes, answering 304 when unchanged'''
+        return self._conditional(request, self._stats)
+
+    def _stats(self, request):
+        '''Serve the summary kept in RecipeStats, without scanning recipes'''
+        try:
+            top = int(request.query_params.get('top', self.stats_top))
+        except ValueError:
+            raise ValidationError({'top': 'Must be an integer.'})
+        if not 0 <= top <= self.max_stats_top:
+            raise ValidationError({'top': f'Must be between 0 and {self.max_stats_top}.'})
+
+        summary = RecipeStats.objects.filter(user=request.user).first()
+        if summary is None:
+            summary = RecipeStats(user=request.user, **empty_stats())
+        serializer = self.get_serializer(
+            summary, context={**self.get_serializer_context(), 'top': top}
+        )
+
+        return Response(serializer.data)
+
+    @action(
+        methods=['GET'], detail=False, renderer_classes=(NDJSONRenderer, CSVRenderer)
+    )
+    def export(self, request):
+        '''Stream every recipe with its tag and ingredient names
+
+        NDJSON by default, CSV with ?format=csv or Accept: text/csv. The
+        list filters apply, but not pagination.
+        '''
+        renderer = request.accepted_renderer
+        recipes = export_recipes(
+            self.filter_queryset(self.get_queryset()), self.export_chunk_size
+        )
+        response = StreamingHttpResponse(
+            buffered(ENCODERS[renderer.format](recipes)),
+            content_type=renderer.media_type,
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="recipes.{renderer.format}"'
+        )
+
+        return response
+
+
+class AsyncTagViewSet(AsyncAPIViewMixin, TagViewSet):
+    """Tags for ASGI deployments, with database work on the thread pool"""
+
+    stream_lists = False
+
+
+class AsyncIngredientViewSet(AsyncAPIViewMixin, IngredientViewSet):
+    """Ingredients for ASGI deployments, with database work on the thread pool"""
+
+    stream_lists = False
+
+
+class AsyncRecipeViewSet(AsyncAPIViewMixin, RecipeViewSet):
+    """Recipes for ASGI deployments, with database work on the thread pool"""
+
+    stream_lists = False
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'retrieve':
+            # Related objects are loaded concurrently by _retrieve_async
+            return queryset.prefetch_related(None)
+
+        return queryset
+
+    async def retrieve(self, request, *args, **kwargs):
+        '''Retrieve a recipe, answering 304 when it has not changed'''
+        return await self._conditional_async(
+            request, self._retrieve_async, *args, **kwargs
+        )
+
+    async def _retrieve_async(self, request, *args, **kwargs):
+        '''Load the recipe, then its tags and ingredients concurrently'''
+        recipe = await run_db(self.get_object)
+        # Created up front so the concurrent prefetches share one cache
+        recipe._prefetched_objects_cache = {}
+        await asyncio.gather(
+            *(
+                run_db(prefetch_related_objects, [recipe], lookup)
+                for lookup in self.prefetch_lookups()
+            )
+        )
+
+        return await run_db(lambda: Response(self.get_serializer(recipe).data))
+
+    # Django 3.2 iterates streaming bodies on the event loop, where the
+    # export's queries cannot run
+    @action(
+        methods=['GET'], detail=False, renderer_classes=(NDJSONRenderer, CSVRenderer)
+    )
+    async def export(self, request):
+        '''Export into a temporary file on the thread pool, then send that'''
+        return await run_db(self._spool_export, request)
+
+    # Exports up to this size stay in memory, larger ones go to disk
+    export_spool_size = 8 * 2 ** 20
+
+    def _spool_export(self, request):
+        streaming = RecipeViewSet.export(self, request)
+        spool = tempfile.SpooledTemporaryFile(max_size=self.export_spool_size)
+        for block in streaming.streaming_content:
+            spool.write(block)
+        spool.seek(0)
+
+        return FileResponse(
+            spool,
+            as_attachment=True,
+            filename=f'recipes.{request.accepted_renderer.format}',
+            content_type=streaming['Content-Type'],
+        )
@@ -0,0 +1,69 @@
+'''Benchmark login throughput with inline and pooled password hashing
+
+Logins are posted to the token endpoint from a pool of threads standing in
+for request workers. Inline hashing lets every worker run PBKDF2 at once;
+the hashing pool caps parallel hashes at PASSWORD_HASHING['WORKERS'] and
+sheds load with 503 once its queue is full.
+
+Run with: python manage.py test -p "bench_*.py" user
+'''
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TransactionTestCase
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+from core import hashers
+
+
+TOKEN_URL = reverse('user:token')
+LOGINS = 64
+CORES = os.cpu_count() or 1
+
+
+class LoginBenchmark(TransactionTestCase):
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(  # type:ignore
+            'test@email.com', 'pass1234'
+        )
+        Token.objects.create(user=user)
+
+    def _login(self, _):
+        start = time.perf_counter()
+        res = Client().post(
+            TOKEN_URL, {'email': 'test@email.com', 'password': 'pass1234'}
+        )
+        return res.status_code, time.perf_counter() - start
+
+    def _run(self, label, workers, pool):
+        with patch('core.hashers.get_hashing_pool', return_value=pool):
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(self._login, range(LOGINS)))
+            elapsed = time.perf_counter() - start
+
+        ok = [latency for code, latency in results if code == 200]
+        rejected = sum(code == 503 for code, _ in results)
+        rate = len(ok) / elapsed
+        print(
+            f'{label:<8} {workers:3} request workers  {rate:6.1f} logins/s  '
+            f'{rate / CORES:5.1f} per core  '
+            f'p50 {statistics.median(ok) * 1000:6.0f}ms  {rejected} rejected'
+        )
+
+    def test_login_throughput(self):
+        print(f'\n{LOGINS} logins, {CORES} cores')
+        for workers in (CORES, CORES * 4):
+            self._run('inline', workers, None)
+            self._run(
+                'pool', workers, hashers.HashingPool(CORES, CORES * 2, queue_timeout=5)
+            )
+        # A queue too short for the burst turns the excess away quickly
+        self._run('shedding', CORES * 4, hashers.HashingPool(CORES, 0, queue_timeout=0.05))
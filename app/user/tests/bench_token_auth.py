@@ -0,0 +1,53 @@
+'''Benchmark token authentication with and without the token cache
+
+Run with: python manage.py test -p "bench_*.py" user
+'''
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import CachedTokenAuthentication, get_token_cache
+from user.views import ManageUserView
+
+
+ME_URL = reverse('user:me')
+REQUESTS = 500
+
+
+class TokenAuthBenchmark(TestCase):
+
+    def setUp(self):
+        get_token_cache().clear()
+        user = get_user_model().objects.create_user(  # type:ignore
+            'test@email.com', 'pass1234'
+        )
+        token = Token.objects.create(user=user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def _run(self, auth_class):
+        with patch.object(ManageUserView, 'authentication_classes', (auth_class,)):
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                for _ in range(REQUESTS):
+                    self.client.get(ME_URL)
+                elapsed = time.perf_counter() - start
+
+        return len(ctx.captured_queries) / REQUESTS, elapsed / REQUESTS * 1000
+
+    def test_benchmark_token_auth(self):
+        for auth_class in (TokenAuthentication, CachedTokenAuthentication):
+            queries, latency = self._run(auth_class)
+            print(
+                f'\n{auth_class.__name__}: {queries:.2f} queries/request, '
+                f'{latency:.3f} ms/request'
+            )
@@ -1,10 +1,13 @@
-from django.test import TestCase
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
-from rest_framework.test import APIClient
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
 from rest_framework import status
 
+from user.views import AsyncManageUserView
+
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
 ME_URL = reverse('user:me')
@@ -158,3 +161,34 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+@override_settings(ASYNC_API={'THREADS': 0})
+class AsyncManageUserViewTests(TestCase):
+    '''Test the async counterpart of the me endpoint'''
+
+    def setUp(self):
+        self.user = create_user(
+            email='test@email.com', password='testpass', name='name'
+        )
+        self.view = AsyncManageUserView.as_view()
+        self.factory = APIRequestFactory()
+
+    def test_retrieve_profile(self):
+        '''Test retrieving the profile through the async view'''
+        request = self.factory.get(ME_URL)
+        force_authenticate(request, self.user)
+        res = async_to_sync(self.view)(request)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'name': self.user.name, 'email': self.user.email})
+
+    def test_update_profile(self):
+        '''Test updating the profile through the async view'''
+        request = self.factory.patch(ME_URL, {'name': 'New Name'})
+        force_authenticate(request, self.user)
+        res = async_to_sync(self.view)(request)
+        self.user.refresh_from_db()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.user.name, 'New Name')
@@ -1,4 +1,6 @@
 from django.urls import path
+
+from core.concurrency import get_async_options
 from . import views
 
 app_name = 'user'
@@ -6,5 +8,11 @@ app_name = 'user'
 urlpatterns = [
     path('create/', views.CreateUserView.as_view(), name='create'),
     path('token/', views.CreateTokenView.as_view(), name='token'),
-    path('me/', views.ManageUserView.as_view(), name='me'),
+    path(
+        'me/',
+        views.AsyncManageUserView.as_view()
+        if get_async_options()['ENABLED']
+        else views.ManageUserView.as_view(),
+        name='me',
+    ),
 ]
@@ -1,7 +1,10 @@
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
+from core.authentication import CachedTokenAuthentication
+from core.concurrency import AsyncAPIViewMixin
+
 from .serializers import UserSerializer, AuthTokenSerializer
 
 
@@ -22,9 +25,13 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
     '''Manage the authenticated user'''
 
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
         '''Retrieve and return authenticated user'''
         return self.request.user
+
+
+class AsyncManageUserView(AsyncAPIViewMixin, ManageUserView):
+    '''Manage the authenticated user, with database work on the thread pool'''